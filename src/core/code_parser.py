@@ -1,6 +1,6 @@
 import ast
 import symtable
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet, Iterator
 
 
 class CodeAnalysisError(Exception):
@@ -72,6 +72,19 @@ class CodeParser:
         if tree is None:
             return False, self.errors, self.warnings
 
+        return self.validate_tree(tree, code)
+
+    def validate_tree(self, tree: ast.AST, code: str) -> Tuple[bool, List[str], List[str]]:
+        """
+        Валидация уже разобранного кода (без повторного парсинга)
+
+        Args:
+            tree: AST дерево, полученное из parse_code
+            code: Исходный код Python
+
+        Returns:
+            Кортеж (валиден ли код, список ошибок, список предупреждений)
+        """
         # Проверяем на запрещенные конструкции
         self._check_forbidden_constructs(tree)
 
@@ -108,7 +121,7 @@ class CodeParser:
         # Проверяем, запрещена ли функция
         if func_name in self.FORBIDDEN_FUNCTIONS:
             line_num = getattr(node, 'lineno', 'неизвестно')
-            self.errors.append(f"Строка {line_num}: Функция '{func_name}' запрещена")
+            self.errors.append(f"Строка {line_num}: {forbidden_function_message(func_name)}")
 
     def _check_symbols(self, code: str):
         """Проверка символов с помощью symtable"""
@@ -142,6 +155,76 @@ class CodeParser:
 
         return functions
 
+    def get_line_effects(self, tree: ast.AST) -> Dict[int, Optional[Tuple[FrozenSet[str], bool]]]:
+        """
+        Имена, которые может прочитать или изменить каждая строка
+
+        Строке сопоставляются все имена ее инструкции (у составной
+        инструкции - только заголовка, тело разбирается отдельно) и
+        признак "непрозрачности": строка может изменить контейнер не
+        через имя, а через атрибут объекта (например, self.items.append(x)).
+        Вызовы функций пользователя здесь не учитываются - их строки
+        трассируются сами.
+
+        Args:
+            tree: AST дерево
+
+        Returns:
+            Словарь номер строки -> (имена, непрозрачна ли строка) или None,
+            если действие строки неизвестно (например, сопоставление match)
+        """
+        effects: Dict[int, Optional[Tuple[FrozenSet[str], bool]]] = {}
+
+        for node in ast.walk(tree):
+            if not isinstance(node, (ast.stmt, ast.excepthandler)):
+                continue
+
+            header = [value for field, value in ast.iter_fields(node) if field not in _BODY_FIELDS]
+            names = set()
+            opaque = False
+            first_line = last_line = node.lineno
+            unknown = isinstance(node, ast.Match)
+
+            for part in header:
+                for sub in _walk_parts(part):
+                    if isinstance(sub, ast.Name):
+                        names.add(sub.id)
+                    elif isinstance(sub, ast.alias):
+                        names.add((sub.asname or sub.name).split('.')[0])
+                    elif _changes_through_attribute(sub):
+                        opaque = True
+                    line = getattr(sub, 'lineno', None)
+                    if line is not None:
+                        first_line = min(first_line, line)
+                        last_line = max(last_line, getattr(sub, 'end_lineno', None) or line)
+
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                names.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                names.update(node.names)
+            elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Attribute):
+                # self.items += x меняет список на месте через атрибут
+                opaque = True
+            if unknown:
+                # Сопоставление связывает имена в шаблонах - строки снимаются целиком
+                last_line = max(last_line, node.end_lineno or node.lineno)
+
+            for line in range(first_line, last_line + 1):
+                if line in effects and effects[line] is None:
+                    continue
+                if unknown:
+                    effects[line] = None
+                    continue
+                known = effects.get(line)
+                if known is not None:
+                    effects[line] = (known[0] | names, known[1] or opaque)
+                else:
+                    effects[line] = (frozenset(names), opaque)
+
+        return effects
+
     def get_imports(self, tree: ast.AST) -> List[str]:
         """Получение списка импортов (для информации)"""
         imports = []
@@ -158,6 +241,42 @@ class CodeParser:
         return imports
 
 
+def forbidden_function_message(func_name: str) -> str:
+    """Текст ошибки о вызове запрещенной функции (после номера строки)"""
+    return f"Функция '{func_name}' запрещена"
+
+
+# Поля составных инструкций с вложенными инструкциями (у них свои строки)
+_BODY_FIELDS = frozenset({'body', 'orelse', 'finalbody', 'handlers', 'cases'})
+
+
+def _walk_parts(part: Any) -> Iterator[ast.AST]:
+    """Обход узлов поля инструкции (узел, список узлов или простое значение)"""
+    if isinstance(part, ast.AST):
+        yield from ast.walk(part)
+    elif isinstance(part, list):
+        for item in part:
+            yield from _walk_parts(item)
+
+
+def _root_name(node: ast.AST) -> Optional[str]:
+    """Имя, через которое достижим объект выражения вида a[i][j] (None для иных выражений)"""
+    while isinstance(node, ast.Subscript):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _changes_through_attribute(node: ast.AST) -> bool:
+    """Может ли узел изменить контейнер, недостижимый через имена строки"""
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        # Метод меняет только свой объект: a.append(x) или a[0].append(x) - через имя a
+        receiver = node.func.value
+        return not isinstance(receiver, ast.Constant) and _root_name(receiver) is None
+    if isinstance(node, ast.Subscript) and isinstance(node.ctx, (ast.Store, ast.Del)):
+        return _root_name(node.value) is None
+    return False
+
+
 # Функция для быстрой проверки кода
 def quick_validate(code: str) -> Dict[str, Any]:
     """
@@ -0,0 +1,107 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import CodeType
+from typing import List, Optional
+
+from src.core.code_parser import CodeParser
+
+
+@dataclass
+class CompiledSource:
+    """Результат анализа и компиляции исходного кода"""
+    source_hash: str
+    tree: Optional[ast.AST]  # None при синтаксической ошибке
+    is_valid: bool
+    errors: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    code_object: Optional[CodeType] = None
+    syntax_error: Optional[SyntaxError] = None  # Ошибка компиляции, если была
+
+
+class CompilationService:
+    """
+    Общий для процесса кэш разбора, валидации и компиляции кода
+
+    Исполнитель и проверка решений получают один и тот же объект кода
+    по хэшу исходника, поэтому проверка N тестов стоит одного разбора
+    и одной компиляции.
+    """
+
+    # Имя файла для compile(): по нему трассировщик отличает код пользователя
+    FILENAME = '<string>'
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.parser = CodeParser()
+        self._entries: "OrderedDict[str, CompiledSource]" = OrderedDict()
+        # Обращения идут из потока GUI и из рабочего потока исполнителя
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def source_hash(code: str) -> str:
+        """Хэш исходного кода"""
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+    def get(self, code: str) -> CompiledSource:
+        """
+        Анализ и компиляция кода (из кэша, если код уже встречался)
+
+        Args:
+            code: Исходный код Python
+
+        Returns:
+            CompiledSource с результатами валидации и объектом кода
+        """
+        key = self.source_hash(code)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                return compiled
+
+            compiled = self._analyze(code, key)
+            self._entries[key] = compiled
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return compiled
+
+    def _analyze(self, code: str, key: str) -> CompiledSource:
+        """Разбор, валидация и компиляция кода"""
+        tree = self.parser.parse_code(code)
+        if tree is None:
+            is_valid, errors, warnings = False, self.parser.errors.copy(), self.parser.warnings.copy()
+        else:
+            is_valid, errors, warnings = self.parser.validate_tree(tree, code)
+
+        compiled = CompiledSource(key, tree, is_valid, errors, warnings)
+        try:
+            # Компилируем уже разобранное дерево, а не исходник повторно
+            source = tree if tree is not None else code
+            compiled.code_object = compile(source, self.FILENAME, 'exec')
+        except SyntaxError as e:
+            compiled.syntax_error = e
+        return compiled
+
+    def compile(self, code: str) -> CodeType:
+        """
+        Объект кода для exec() (из кэша, если код уже встречался)
+
+        Raises:
+            SyntaxError: если код не компилируется
+        """
+        compiled = self.get(code)
+        if compiled.code_object is None:
+            raise SyntaxError(*compiled.syntax_error.args)
+        return compiled.code_object
+
+    def clear(self):
+        """Очистка кэша"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Глобальный экземпляр службы компиляции
+compilation_service = CompilationService()
@@ -1,6 +1,7 @@
 import sys
 import types
-from typing import Set, Dict, Any, Optional
+import contextlib
+from typing import Set, Dict, Any, Optional, Sequence
 from importlib import import_module
 
 
@@ -47,11 +48,17 @@ class SecurityManager:
         'io', 'codecs', 'locale'
     }
 
+    # Лимит операций для предотвращения зависания
+    DEFAULT_MAX_OPERATIONS = 10000
+
+    # Инструмент sys.monitoring для подсчета строк (отладчик занят трассировщиком исполнителя)
+    _MONITORING_TOOLS = ('PROFILER_ID', 'OPTIMIZER_ID')
+
     def __init__(self):
         self.original_import = None
         self.imported_modules = {}
         self.operation_count = 0
-        self.max_operations = 10000  # Лимит операций для предотвращения зависания
+        self.max_operations = self.DEFAULT_MAX_OPERATIONS
 
     def setup_secure_environment(self):
         """Настройка безопасного окружения выполнения"""
@@ -127,9 +134,96 @@ class SecurityManager:
         if self.operation_count > self.max_operations:
             raise RuntimeError("Превышен лимит операций. Возможно, бесконечный цикл.")
 
-    def reset_operation_count(self):
-        """Сброс счетчика операций"""
+    def reset_operation_count(self, max_operations: Optional[int] = None):
+        """
+        Сброс счетчика операций
+
+        Args:
+            max_operations: Лимит операций для следующего запуска
+                (по умолчанию - стандартный лимит)
+        """
         self.operation_count = 0
+        self.max_operations = max_operations or self.DEFAULT_MAX_OPERATIONS
+
+    @contextlib.contextmanager
+    def operation_limit(self, code: types.CodeType, max_operations: Optional[int] = None):
+        """
+        Детерминированный лимит выполнения кода
+
+        Операция - выполненная строка кода пользователя (модуля и его
+        функций), как и событие трассировки пошагового исполнителя.
+        В отличие от лимита по времени, результат не зависит от загрузки
+        машины. С sys.monitoring (Python 3.12+) считаются события LINE и
+        переходы назад (итерации циклов в одной строке, например включений),
+        иначе - события 'line' sys.settrace; код библиотек не учитывается.
+
+        Args:
+            code: Скомпилированный модуль пользователя
+            max_operations: Лимит операций (по умолчанию - стандартный)
+        """
+        self.reset_operation_count(max_operations)
+        user_codes = list(_nested_code_objects(code))
+
+        tool_id = self._free_monitoring_tool()
+        if tool_id is not None:
+            monitoring = sys.monitoring
+            monitoring.use_tool_id(tool_id, 'CodeVisualizer limit')
+            events = monitoring.events
+            monitoring.register_callback(tool_id, events.LINE, self._count_line)
+            monitoring.register_callback(tool_id, events.JUMP, self._count_jump)
+            for user_code in user_codes:
+                monitoring.set_local_events(tool_id, user_code, events.LINE | events.JUMP)
+            try:
+                yield
+            finally:
+                for user_code in user_codes:
+                    monitoring.set_local_events(tool_id, user_code, 0)
+                monitoring.register_callback(tool_id, events.LINE, None)
+                monitoring.register_callback(tool_id, events.JUMP, None)
+                monitoring.free_tool_id(tool_id)
+            return
+
+        user_code_ids = frozenset(map(id, user_codes))
+
+        def count_lines(frame, event, arg):
+            if event == 'line':
+                self._count_line(frame.f_code, frame.f_lineno)
+            return count_lines
+
+        def trace_calls(frame, event, arg):
+            # Локальный счетчик получают только кадры кода пользователя
+            return count_lines if id(frame.f_code) in user_code_ids else None
+
+        original_trace = sys.gettrace()
+        sys.settrace(trace_calls)
+        try:
+            yield
+        finally:
+            sys.settrace(original_trace)
+
+    def _count_line(self, code, line_number):
+        """Учет выполненной строки (обработчик события LINE)"""
+        self.operation_count += 1
+        if self.operation_count > self.max_operations:
+            raise RuntimeError("Превышен лимит операций. Возможно, бесконечный цикл.")
+
+    def _count_jump(self, code, instruction_offset, destination_offset):
+        """Учет перехода назад - итерации цикла (обработчик события JUMP)"""
+        if destination_offset > instruction_offset:
+            # Переходы вперед не учитываются - событие в этом месте отключается
+            return sys.monitoring.DISABLE
+        self._count_line(code, None)
+        return None
+
+    def _free_monitoring_tool(self) -> Optional[int]:
+        """Свободный идентификатор инструмента sys.monitoring (None если недоступен)"""
+        if not hasattr(sys, 'monitoring'):
+            return None
+        for name in self._MONITORING_TOOLS:
+            tool_id = getattr(sys.monitoring, name)
+            if sys.monitoring.get_tool(tool_id) is None:
+                return tool_id
+        return None
 
     def get_allowed_modules_info(self) -> Dict[str, Any]:
         """Получение информации о разрешенных модулях"""
@@ -142,10 +236,71 @@ class SecurityManager:
         }
 
 
+def _nested_code_objects(code: types.CodeType):
+    """Объект кода и все вложенные в него (функции, классы, включения)"""
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _nested_code_objects(const)
+
+
 # Глобальный экземпляр менеджера безопасности
 security_manager = SecurityManager()
 
 
+# Встроенные функции, доступные коду пользователя при любом способе выполнения
+# (print и input подставляет исполнитель)
+SAFE_BUILTIN_NAMES = frozenset({
+    'abs', 'all', 'any', 'bin', 'bool', 'chr', 'dict', 'divmod',
+    'enumerate', 'filter', 'float', 'format', 'frozenset', 'hex',
+    'int', 'isinstance', 'issubclass', 'len', 'list', 'map', 'max',
+    'min', 'oct', 'ord', 'pow', 'range', 'repr', 'reversed',
+    'round', 'set', 'slice', 'sorted', 'str', 'sum', 'tuple', 'type',
+    'zip', 'hasattr', 'getattr', 'setattr', 'delattr', 'dir',
+    'super', 'property', 'staticmethod', 'classmethod'
+})
+
+
+def _collect_safe_builtins() -> Dict[str, Any]:
+    """Словарь разрешенных встроенных функций (собирается один раз при импорте)"""
+    import builtins
+
+    safe_builtins = {name: getattr(builtins, name) for name in SAFE_BUILTIN_NAMES if hasattr(builtins, name)}
+    # Функции для работы с классами
+    safe_builtins['__build_class__'] = builtins.__build_class__
+    safe_builtins['__name__'] = '__main__'
+    return safe_builtins
+
+
+_SAFE_BUILTINS = _collect_safe_builtins()
+
+
+def make_safe_builtins(print_function, inputs: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Встроенные функции для выполнения кода пользователя
+
+    Args:
+        print_function: Замена print (захват вывода)
+        inputs: Строки, которые по очереди возвращает input() (None - input недоступен)
+
+    Returns:
+        Новый словарь для '__builtins__'
+    """
+    safe_builtins = dict(_SAFE_BUILTINS)
+    safe_builtins['print'] = print_function
+    if inputs is not None:
+        input_iterator = iter(inputs)
+
+        def mock_input(prompt=""):
+            try:
+                return next(input_iterator)
+            except StopIteration:
+                raise EOFError("No more input available")
+
+        safe_builtins['input'] = mock_input
+    return safe_builtins
+
+
 def create_safe_globals() -> Dict[str, Any]:
     """Создание безопасного глобального пространства имен"""
     safe_globals = {
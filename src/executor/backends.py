@@ -0,0 +1,336 @@
+"""
+Бэкенды выполнения кода пользователя
+
+Проверка решений и пошаговая визуализация выполняют код через общий
+интерфейс ExecutionBackend.run(code, inputs, limits, trace=...):
+
+- 'inprocess' - в текущем процессе (быстрее всего, но без изоляции);
+- 'subprocess' - в отдельном процессе на каждый запуск ('spawn', с
+  трассировкой - из шаблона forkserver);
+- 'pool' - в процессах, порождаемых из заранее подготовленного шаблона
+  (forkserver), по нескольку одновременно.
+
+Бэкенд выбирается по имени (create_backend) из настроек.
+"""
+import io
+import math
+import time
+import marshal
+import signal
+import threading
+import contextlib
+from dataclasses import dataclass
+from types import CodeType
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.core.security import security_manager, make_safe_builtins
+from src.core.compile_cache import compilation_service
+from src.testing.output_comparator import OutputComparator
+
+
+@dataclass
+class ExecutionLimits:
+    """Ограничения одного запуска"""
+    max_operations: Optional[int] = 1000000  # Выполненных строк (детерминированный лимит)
+    time_limit: Optional[float] = 30  # Секунд по часам (запасной лимит)
+    memory_limit: Optional[int] = None  # Байт на процесс (только бэкенды с процессами)
+    cpu_time: Optional[float] = None  # Секунд процессорного времени (только бэкенды с процессами)
+    output_margin: int = 1000  # На сколько символов вывод может превысить ожидаемый
+
+
+@dataclass
+class ExecutionResult:
+    """Результат одного запуска"""
+    output: str = ''
+    error: Optional[str] = None
+    time: float = 0.0
+    # Совпал ли вывод с ожидаемым (None - ожидаемый вывод не задан)
+    passed: Optional[bool] = None
+    mismatch: Optional[str] = None  # Первая различающаяся строка вывода
+    # Исполнитель с трассировкой (только при trace=True)
+    executor: Any = None
+
+
+# Задание пакетного запуска: код, ввод, ожидаемый вывод (None - без сравнения)
+Job = Tuple[str, Sequence[str], Optional[str]]
+
+
+class ExecutionBackend:
+    """Общий интерфейс бэкендов выполнения"""
+
+    name = ''
+
+    def run(self, code: str, inputs: Sequence[str] = (), limits: Optional[ExecutionLimits] = None,
+            trace: bool = False, expected_output: Optional[str] = None) -> ExecutionResult:
+        """
+        Выполнение кода
+
+        Args:
+            code: Исходный код Python
+            inputs: Строки, которые по очереди возвращает input()
+            limits: Ограничения запуска (None - по умолчанию)
+            trace: Записать пошаговую трассировку (result.executor)
+            expected_output: Ожидаемый вывод - вывод сверяется по мере печати
+
+        Returns:
+            ExecutionResult
+        """
+        limits = limits or ExecutionLimits()
+        if trace:
+            return self._run_traced(code, inputs, limits, expected_output)
+        return self.run_many([(code, inputs, expected_output)], limits)[0]
+
+    def run_many(self, jobs: List[Job], limits: Optional[ExecutionLimits] = None,
+                 on_result: Optional[Callable[[int, ExecutionResult], None]] = None) -> List[ExecutionResult]:
+        """
+        Выполнение набора заданий без трассировки
+
+        Args:
+            jobs: Задания (код, ввод, ожидаемый вывод)
+            limits: Ограничения каждого запуска
+            on_result: Вызывается с номером задания и результатом по мере завершения
+
+        Returns:
+            Результаты в порядке заданий
+        """
+        raise NotImplementedError
+
+    def create_executor(self):
+        """Пошаговый исполнитель этого бэкенда (для визуализации)"""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Подготовка бэкенда заранее, чтобы первый запуск ее не ждал"""
+        pass
+
+    def _run_traced(self, code: str, inputs: Sequence[str], limits: ExecutionLimits,
+                    expected_output: Optional[str]) -> ExecutionResult:
+        """Запуск с трассировкой через пошаговый исполнитель бэкенда"""
+        executor = self.create_executor()
+        executor.inputs = list(inputs)
+        executor.max_operations = limits.max_operations
+        executor.trace_cache = None
+        self._apply_limits(executor, limits)
+
+        start = time.perf_counter()
+        result = ExecutionResult(executor=executor)
+        if not executor.execute_step_by_step(code):
+            result.error = '; '.join(compilation_service.get(code).errors) or "Код не прошел проверку"
+        elif len(executor.steps):
+            last_step = executor.get_step(len(executor.steps) - 1)
+            result.output = executor.get_output_until(last_step.step_number)
+            if last_step.event_type == 'exception':
+                result.error = last_step.error
+        result.time = time.perf_counter() - start
+
+        if expected_output is not None:
+            comparator = OutputComparator(expected_output, limits.output_margin)
+            try:
+                comparator.write(result.output)
+                result.passed = comparator.finish() and result.error is None
+            except Exception:
+                result.passed = False
+            result.mismatch = comparator.mismatch
+        return result
+
+    def _apply_limits(self, executor, limits: ExecutionLimits):
+        """Ограничения запуска, которые поддерживает исполнитель бэкенда"""
+        pass
+
+
+class InProcessBackend(ExecutionBackend):
+    """
+    Выполнение в текущем процессе
+
+    Запуск не изолирован: ограничения памяти и процессорного времени
+    не действуют, а лимит времени по часам работает только в главном
+    потоке (signal.alarm).
+    """
+
+    name = 'inprocess'
+
+    def run_many(self, jobs: List[Job], limits: Optional[ExecutionLimits] = None,
+                 on_result: Optional[Callable[[int, ExecutionResult], None]] = None) -> List[ExecutionResult]:
+        """Последовательное выполнение заданий"""
+        limits = limits or ExecutionLimits()
+        results = []
+        for index, (code, inputs, expected_output) in enumerate(jobs):
+            results.append(self.execute(code, inputs, limits, expected_output))
+            if on_result is not None:
+                on_result(index, results[-1])
+        return results
+
+    def create_executor(self):
+        from src.executor.code_executor import CodeExecutor
+        return CodeExecutor()
+
+    def execute(self, code: str, inputs: Sequence[str], limits: ExecutionLimits,
+                expected_output: Optional[str] = None,
+                code_object: Optional[CodeType] = None) -> ExecutionResult:
+        """
+        Выполнение кода без трассировки (здесь же - в процессах других бэкендов)
+
+        Args:
+            code_object: Код, скомпилированный заранее (None - из compilation_service)
+        """
+        # С ожидаемым выводом вывод сверяется по мере печати: при расхождении выполнение прерывается
+        if expected_output is not None:
+            captured_output = OutputComparator(expected_output, limits.output_margin)
+        else:
+            captured_output = io.StringIO()
+
+        safe_builtins = make_safe_builtins(
+            lambda *args, **kwargs: print(*args, file=captured_output, **kwargs), inputs)
+        safe_globals = {'__builtins__': safe_builtins}
+
+        result = ExecutionResult()
+        start = time.perf_counter()
+        try:
+            compiled = code_object or compilation_service.compile(code)
+            with _time_limit(limits.time_limit), \
+                    security_manager.operation_limit(compiled, limits.max_operations):
+                exec(compiled, safe_globals)
+            if expected_output is not None:
+                result.passed = captured_output.finish()
+
+        except Exception as e:
+            if expected_output is not None:
+                result.passed = False
+            # Расхождение вывода - неверный ответ, а не ошибка программы (даже
+            # если программа перехватила исключение и упала на чем-то другом)
+            if getattr(captured_output, 'mismatch', None) is None:
+                result.error = str(e) or type(e).__name__
+
+        result.time = time.perf_counter() - start
+        result.output = captured_output.getvalue().strip()
+        result.mismatch = getattr(captured_output, 'mismatch', None)
+        return result
+
+
+class SubprocessBackend(ExecutionBackend):
+    """
+    Выполнение в отдельном процессе на каждый запуск
+
+    Задания без трассировки выполняются в процессах 'spawn': каждый -
+    новый интерпретатор, с тестами не разделяется даже шаблонный процесс,
+    и поведение одинаково на всех платформах. Это эталон изоляции для
+    сравнения с 'pool', но каждый запуск платит за старт интерпретатора.
+
+    Трассировка (ProcessExecutor, окно визуализации) выполняется в
+    процессе, скопированном из шаблона forkserver с загруженным
+    исполнителем: он тоже не наследует потоков Qt приложения, а запуск
+    не ждет импорта модулей. Результат передается через разделяемую память.
+    """
+
+    name = 'subprocess'
+
+    def __init__(self):
+        self._pool = None
+
+    def run_many(self, jobs: List[Job], limits: Optional[ExecutionLimits] = None,
+                 on_result: Optional[Callable[[int, ExecutionResult], None]] = None) -> List[ExecutionResult]:
+        """Выполнение заданий по одному, каждое - в новом процессе"""
+        limits = limits or ExecutionLimits()
+        # Решение компилируется один раз здесь, а не в каждом процессе теста
+        compiled: Dict[str, Optional[bytes]] = {}
+        for code, _, _ in jobs:
+            if code not in compiled:
+                compiled[code] = _marshal_code(code)
+        tasks = [(code, list(inputs), limits, expected_output, compiled[code])
+                 for code, inputs, expected_output in jobs]
+        return self._get_pool().run(tasks, on_result)
+
+    def create_executor(self):
+        from src.executor.process_executor import ProcessExecutor
+        return ProcessExecutor()
+
+    def warm_up(self):
+        """Запуск шаблонного процесса исполнителя с трассировкой"""
+        from src.testing.worker_pool import TestWorkerPool
+        TestWorkerPool(1).warm_up()
+
+    def _apply_limits(self, executor, limits: ExecutionLimits):
+        if limits.time_limit is not None:
+            executor.timeout = limits.time_limit
+        if limits.memory_limit is not None:
+            executor.memory_limit = limits.memory_limit
+
+    def _get_pool(self):
+        if self._pool is None:
+            from src.testing.worker_pool import TestWorkerPool
+            self._pool = TestWorkerPool(1, 'spawn')
+        return self._pool
+
+
+class PooledBackend(SubprocessBackend):
+    """
+    Выполнение в процессах из шаблона forkserver, до max_workers одновременно
+
+    Запуск процесса из шаблона с загруженными модулями занимает
+    миллисекунды. Трассировка, как у SubprocessBackend, выполняется
+    в отдельном процессе.
+    """
+
+    name = 'pool'
+
+    def __init__(self, max_workers: int = 4):
+        super().__init__()
+        self.max_workers = max_workers
+
+    def warm_up(self):
+        self._get_pool().warm_up()
+
+    def _get_pool(self):
+        if self._pool is None:
+            from src.testing.worker_pool import TestWorkerPool
+            self._pool = TestWorkerPool(self.max_workers)
+        self._pool.max_workers = max(1, self.max_workers)
+        return self._pool
+
+
+# Бэкенды по именам настроек
+BACKENDS: Dict[str, type] = {
+    InProcessBackend.name: InProcessBackend,
+    SubprocessBackend.name: SubprocessBackend,
+    PooledBackend.name: PooledBackend,
+}
+
+
+def create_backend(name: str, **options) -> ExecutionBackend:
+    """
+    Бэкенд выполнения по имени
+
+    Args:
+        name: 'inprocess', 'subprocess' или 'pool'
+        options: Параметры конструктора (например, max_workers для 'pool')
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд выполнения: {name} (доступны: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
+
+
+def _marshal_code(code: str) -> Optional[bytes]:
+    """Объект кода для передачи в процесс (None - не компилируется: ошибку сообщит процесс)"""
+    try:
+        return marshal.dumps(compilation_service.compile(code))
+    except SyntaxError:
+        return None
+
+
+@contextlib.contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Ограничение времени выполнения (только в главном потоке: signal.alarm)"""
+    if seconds is None or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def timeout_handler(signum, frame):
+        raise TimeoutError(f"Код выполнялся дольше {seconds:g} секунд")
+
+    old_handler = signal.signal(signal.SIGALRM, timeout_handler)
+    signal.alarm(max(1, math.ceil(seconds)))
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, old_handler)
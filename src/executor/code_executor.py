@@ -1,15 +1,32 @@
 import sys
+import ast
+import time
 import copy
+import inspect
 import traceback
-from typing import Dict, Any, List, Optional, Callable
-from dataclasses import dataclass
-from src.core.security import security_manager, get_safe_builtins
-from src.core.code_parser import CodeParser
-
-
-@dataclass
+import tracemalloc
+import multiprocessing
+from types import CodeType, FunctionType, BuiltinFunctionType
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from dataclasses import dataclass, replace
+from functools import partial
+from src.core.security import security_manager, make_safe_builtins
+from src.core.code_parser import CodeParser, forbidden_function_message
+from src.core.compile_cache import compilation_service
+from src.executor.trace_store import TraceStore, SpillLog
+from src.executor.heap_snapshot import HeapSnapshotter, materialize_variables
+from src.executor.replay_engine import CheckpointReplayEngine
+from src.executor.trace_cache import TraceCache, trace_cache
+from src.executor.value_preview import ValuePreview, make_preview
+
+
+@dataclass(slots=True)
 class ExecutionStep:
-    """Класс для хранения состояния одного шага выполнения"""
+    """
+    Класс для хранения состояния одного шага выполнения
+
+    Хранилище держит шаги в столбцах, объект создается при обращении к шагу.
+    """
     step_number: int
     line_number: int
     code_line: str
@@ -18,13 +35,122 @@ class ExecutionStep:
     function_name: Optional[str] = None
     error: Optional[str] = None
     output: str = ""  # Поле для хранения вывода на этом шаге
+    heap: Optional[Dict[int, Any]] = None  # Версии объектов по номерам (режим 'heap')
+    frames: Optional[Dict[int, 'StackFrame']] = None  # Кадры функций по глубине (1 - внешний)
+    iteration: Optional['LoopIteration'] = None  # Свернутая итерация цикла, завершившаяся этим шагом
+    skipped: int = 0  # Пропущенных (интерполированных) шагов перед этим снимком при выборочной записи
+    event_index: int = 0  # Номер события трассировки (по нему шаг воспроизводится повторным выполнением)
+    memory: int = 0  # Байт, выделенных кодом пользователя к этому шагу (при учете памяти)
+
+
+@dataclass(slots=True)
+class StackFrame:
+    """Кадр вызова функции пользователя на шаге выполнения"""
+    function_name: str
+    variables: Dict[str, Any]
+
+
+@dataclass(slots=True)
+class LoopIteration:
+    """Сводка итерации цикла, свернутой в один шаг (режим 'coalesce')"""
+    loop_line: int  # Строка заголовка цикла
+    iteration: int  # Номер итерации (с 1)
+    line_count: int  # Сколько шагов выполнено за итерацию
+    start_step: int  # Шаг, с которого началась итерация (предыдущая граница)
+    first_event: int  # Номера событий трассировки итерации - по ним
+    last_event: int  # итерация разворачивается повторным выполнением
+
+
+# Маркер отсутствующей переменной (None может быть значением)
+_MISSING = object()
+
+# Маркер пропуска шага внутри свернутой итерации цикла
+_SKIP_STEP = object()
+
+
+class _WindowComplete(BaseException):
+    """Остановка выполнения после конца окна шагов (не перехватывается except Exception)"""
+
+
+class _ExecutionCancelled(BaseException):
+    """Остановка выполнения по запросу пользователя (не перехватывается except Exception)"""
+
+
+class CancellationToken:
+    """
+    Запрос на остановку выполнения
+
+    Признак хранится в разделяемой памяти, поэтому токен действует и
+    в рабочем процессе исполнителя. Трассировщик проверяет его на
+    каждом событии - это одно чтение числа.
+    """
+
+    def __init__(self):
+        self._flag = multiprocessing.RawValue('b', 0)
+
+    def cancel(self):
+        """Запросить остановку (можно вызывать из любого потока)"""
+        self._flag.value = 1
+
+    def reset(self):
+        """Снять запрос перед новым запуском"""
+        self._flag.value = 0
+
+    @property
+    def cancelled(self) -> bool:
+        """Запрошена ли остановка"""
+        return bool(self._flag.value)
+
+
+# Значения этих типов меняются только присваиванием имени (контейнеры - и на месте)
+_UNCHANGED_TYPES = frozenset({int, float, str, bool, type(None), FunctionType, BuiltinFunctionType, type})
+
+# Имя, под которым в кадре показывается возвращаемое значение
+RETURN_VALUE_NAME = 'Return value'
+
+# Код включений и генераторных выражений не показывается отдельными кадрами
+_HIDDEN_CODE_NAMES = frozenset({'<listcomp>', '<dictcomp>', '<setcomp>', '<genexpr>'})
+
+# Генераторы приостанавливаются и возобновляются, это не вызов и не возврат
+_GENERATOR_FLAGS = inspect.CO_GENERATOR | inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR
 
 
 class CodeExecutor:
     """Пошаговый исполнитель Python кода"""
 
     def __init__(self):
-        self.steps: List[ExecutionStep] = []
+        # Режим хранения трассировки: 'memory', 'disk' (журнал на диске)
+        # или 'replay' (только строки + воспроизведение от контрольных точек)
+        self.trace_mode = 'memory'
+        # Интервал ключевых кадров: между ними шаги хранят только изменения
+        self.keyframe_interval = 50
+        # Сколько записей журнала на диске держать в памяти
+        self.hot_window = 256
+        # Режим снимков: 'heap' (таблица объектов) или 'shallow' (копии контейнеров)
+        self.snapshot_mode = 'heap'
+        self.heap_snapshotter = HeapSnapshotter()
+        # Бюджет элементов контейнеров на снимок пространства имен: большие
+        # значения сохраняются превью и загружаются по требованию (None - целиком)
+        self.value_budget: Optional[int] = 10000
+        # Снимать заново только имена, которые могли измениться строками
+        # на стеке предыдущего шага, остальные переносить из него
+        self.liveness_capture = True
+        # Контрольные точки режима 'replay' (None в остальных режимах)
+        self.checkpoint_interval = 100
+        self.replay: Optional[CheckpointReplayEngine] = None
+        # Режим циклов: 'full' (каждая строка - шаг) или 'coalesce'
+        # (итерация цикла сворачивается в один шаг на заголовке цикла)
+        self.loop_mode = 'full'
+        # Выборочная запись: состояние снимается на каждом sample_interval-м
+        # событии (1 - на каждом), шаги с выводом print и ошибки сохраняются всегда
+        self.sample_interval = 1
+        # Адаптивная выборка: интервал удваивается, пока снимков в секунду
+        # больше max_snapshot_rate (в режиме 'replay' не применяется)
+        self.adaptive_sampling = False
+        self.max_snapshot_rate = 2000
+        # Кэш готовых трассировок для повторных запусков (None - отключен)
+        self.trace_cache: Optional[TraceCache] = trace_cache
+        self.steps = TraceStore(self.keyframe_interval)
         self.current_step = -1
         self.code_lines: List[str] = []
         self.is_running = False
@@ -34,6 +160,82 @@ class CodeExecutor:
         self.original_trace = None
         self.step_callback: Optional[Callable] = None
         self.max_steps = 1000  # Защита от бесконечных циклов
+        self.max_disk_steps = 500000  # Лимит шагов при записи трассировки на диск
+        # Лимит операций (событий трассировки) на запуск - тот же, что у проверки
+        # тестами (security_manager.operation_limit); None - по лимиту шагов
+        self.max_operations: Optional[int] = None
+        # Входные данные для input() (None - input() запрещен, как при
+        # интерактивном запуске; список строк - запуск на данных теста)
+        self.inputs: Optional[List[str]] = None
+
+        # Бэкенд трассировки: 'auto', 'monitoring' (PEP 669) или 'settrace'
+        self.tracing_backend = 'auto'
+        self.active_backend: Optional[str] = None
+        self._module_code = None  # Объект кода модуля пользователя
+        # Объекты кода пользователя (модуль, функции, классы) и их id.
+        # Имя файла '<string>' не подходит: его же получает код,
+        # сгенерированный библиотеками (например, __init__ у dataclass)
+        self._user_codes: List[CodeType] = []
+        self._user_code_ids = frozenset()
+        # Кадры функций на стеке: id(кадр) -> (кадр, последний снимок StackFrame)
+        self._live_frames: Dict[int, Tuple[Any, StackFrame]] = {}
+        # Кадры, из которых распространяется исключение (бэкенд settrace)
+        self._unwinding_frames = set()
+        # Строки переходов назад: (id кода, смещение перехода) -> строка
+        # или None, если переход ведет на другую строку (бэкенд sys.monitoring)
+        self._jump_lines: Dict[Tuple[int, int], Optional[int]] = {}
+
+        # Номер очередного события трассировки (в режиме 'full' совпадает с номером шага)
+        self._event_index = 0
+        # Окно шагов (первое, последнее событие трассировки): до начала окна
+        # выполнение только считает строки, после конца - останавливается
+        self.step_window: Optional[Tuple[int, int]] = None
+        # Остановлено ли последнее выполнение концом окна (у программы есть еще шаги)
+        self.window_truncated = False
+        # Вывод программы до начала окна
+        self.output_before_window = ""
+        self._outputs_before_window: List[str] = []
+        # Остановка выполнения по запросу (кнопка "Стоп"): записанные шаги сохраняются
+        self.cancel_token = CancellationToken()
+        self.cancelled = False
+        # Учет памяти через tracemalloc: шаг хранит, сколько байт выделил код
+        # пользователя (память самого трассировщика не учитывается)
+        self.track_memory = False
+        # Бюджет памяти кода пользователя, байт: при превышении выполнение
+        # прерывается ошибкой MemoryError (None - без ограничения; включает учет памяти)
+        self.memory_budget: Optional[int] = None
+        # Наибольшая память кода пользователя за последнее выполнение, байт
+        self.peak_memory = 0
+        self._user_memory = 0
+        self._memory_mark = 0  # Показание tracemalloc при выходе из трассировщика
+        self._started_tracemalloc = False
+        # Строки циклов: строка заголовка -> (первая строка заголовка, начало тела, конец тела)
+        self._loop_lines: Dict[int, Tuple[int, int, int]] = {}
+        # Текущий свернутый цикл: [кадр, цикл, номер итерации, шагов в итерации,
+        # первое событие итерации, шаг начала итерации]
+        self._active_loop: Optional[list] = None
+        # Состояние выборочной записи: текущий интервал, событие последнего
+        # снимка, пропущено перед следующим снимком и всего, окно замера частоты
+        self._sample_every = 1
+        self._last_sample_event = -1
+        self._pending_skipped = 0
+        self._skipped_events = 0
+        self._rate_window_start = 0.0
+        self._rate_window_snapshots = 0
+        self._event_limit: Optional[int] = None  # Лимит событий (только при выборочной записи)
+        # Имена, которые читает или меняет каждая строка (см. CodeParser.get_line_effects)
+        self._line_effects: Dict[int, Optional[Tuple[frozenset, bool]]] = {}
+        # Событие последнего снимка и строки кадров на стеке в тот момент
+        self._last_capture_event = -1
+        self._stack_lines: Tuple[int, ...] = ()
+        # Профиль строк: число выполнений и суммарное время (нс) по номерам
+        # строк (элемент 0 - время вне строк кода пользователя), строка,
+        # выполняющаяся сейчас, и время выхода из трассировщика
+        self._line_hits: List[int] = [0]
+        self._line_times: List[int] = [0]
+        self._profile_line = 0
+        self._profile_clock = 0
+        self.source_code = ""
 
         # Парсер для валидации кода
         self.parser = CodeParser()
@@ -52,8 +254,14 @@ class CodeExecutor:
         Returns:
             True если код готов к выполнению, False при ошибках
         """
-        # Валидация кода
-        is_valid, errors, warnings = self.parser.validate_code(code)
+        # Валидация кода (результат общий с проверкой решений)
+        compiled = compilation_service.get(code)
+        is_valid, errors, warnings = compiled.is_valid, compiled.errors, compiled.warnings
+        if not is_valid and self.inputs is not None and compiled.tree is not None:
+            # Ввод задан - вызовы input() допустимы
+            input_error = forbidden_function_message('input')
+            errors = [error for error in errors if not error.endswith(input_error)]
+            is_valid = not errors
 
         if not is_valid:
             print("Ошибки в коде:")
@@ -68,10 +276,34 @@ class CodeExecutor:
 
         # Разбиваем код на строки
         self.code_lines = code.strip().split('\n')
+        self.source_code = code
 
         # Очищаем предыдущие результаты
-        self.steps.clear()
+        self._new_trace_store()
+        self.heap_snapshotter = HeapSnapshotter()
+        self.heap_snapshotter.max_items = self.value_budget
+        self._live_frames = {}
+        self._unwinding_frames.clear()
+        self._event_index = 0
+        self._active_loop = None
+        self._loop_lines = _loop_line_map(compiled.tree) if self.loop_mode == 'coalesce' else {}
+        self._line_effects = self.parser.get_line_effects(compiled.tree) \
+            if self.liveness_capture and compiled.tree is not None else {}
+        self._last_capture_event = -1
+        self._stack_lines = ()
+        self._line_hits = [0] * (len(self.code_lines) + 1)
+        self._line_times = [0] * (len(self.code_lines) + 1)
+        self._profile_line = 0
+        self._reset_sampling()
+        self.window_truncated = False
+        self.output_before_window = ""
+        self._outputs_before_window = []
+        self.cancel_token.reset()
+        self.cancelled = False
+        self.peak_memory = 0
+        self._user_memory = 0
         self.current_step = -1
+        self.current_print_output = ""
         self.print_outputs.clear()
 
         # Подготавливаем безопасное окружение
@@ -79,34 +311,61 @@ class CodeExecutor:
 
         return True
 
+    def _new_trace_store(self):
+        """Создание пустого хранилища шагов для текущего режима трассировки"""
+        self.steps.close()
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+
+        records = SpillLog(self.hot_window) if self.trace_mode == 'disk' else None
+        self.steps = TraceStore(self.keyframe_interval, records, self.code_lines)
+
+        # Без os.fork() (или в многопоточном процессе) режим 'replay' работает как 'memory'
+        if self.trace_mode == 'replay' and CheckpointReplayEngine.is_supported():
+            self.replay = CheckpointReplayEngine(self.checkpoint_interval)
+
+    def _get_step_limit(self) -> int:
+        """Максимальное количество шагов для текущего режима трассировки"""
+        if self.trace_mode == 'disk' or self.replay is not None:
+            return self.max_disk_steps
+        return self.max_steps
+
+    def is_sampling(self) -> bool:
+        """Включена ли выборочная запись шагов"""
+        return self.sample_interval > 1 or self.adaptive_sampling
+
+    def _get_event_limit(self) -> int:
+        """Максимальное количество событий трассировки (записанных и пропущенных)"""
+        limit = self._get_step_limit()
+        if self.is_sampling():
+            # Пропущенные события дешевы: лимит шагов ограничивает только снимки
+            limit = max(self.max_disk_steps, limit)
+        if self.step_window is not None:
+            # Перемотка до окна тоже не ограничена лимитом шагов
+            limit = max(self.step_window[1] + 1, limit)
+        return limit
+
+    def _reset_sampling(self):
+        """Сброс состояния выборочной записи перед запуском"""
+        self._sample_every = max(1, self.sample_interval)
+        self._last_sample_event = -1
+        self._pending_skipped = 0
+        self._skipped_events = 0
+        self._rate_window_start = time.perf_counter()
+        self._rate_window_snapshots = 0
+        self._event_limit = self._get_event_limit() if self.is_sampling() else None
+
     def _setup_execution_environment(self):
         """Настройка безопасного окружения выполнения"""
-        security_manager.reset_operation_count()
-
-        # Создаем расширенное безопасное окружение с поддержкой классов
-        import builtins
-
-        safe_builtins = {}
-        safe_names = {
-            'abs', 'all', 'any', 'bin', 'bool', 'chr', 'dict', 'divmod',
-            'enumerate', 'filter', 'float', 'format', 'frozenset', 'hex',
-            'int', 'isinstance', 'issubclass', 'len', 'list', 'map', 'max',
-            'min', 'oct', 'ord', 'pow', 'print', 'range', 'repr', 'reversed',
-            'round', 'set', 'slice', 'sorted', 'str', 'sum', 'tuple', 'type',
-            'zip', 'hasattr', 'getattr', 'setattr', 'delattr', 'dir',
-            'super', 'property', 'staticmethod', 'classmethod'
-        }
-
-        for name in safe_names:
-            if hasattr(builtins, name):
-                safe_builtins[name] = getattr(builtins, name)
+        # Лимит операций не должен срабатывать раньше лимита шагов
+        max_operations = self.max_operations
+        if max_operations is None:
+            max_operations = max(security_manager.DEFAULT_MAX_OPERATIONS, self._get_event_limit() * 10)
+        security_manager.reset_operation_count(max_operations)
 
-        # КЛЮЧЕВОЕ ДОБАВЛЕНИЕ: Функции для работы с классами
-        safe_builtins['__build_class__'] = builtins.__build_class__
-        safe_builtins['__name__'] = '__main__'
-
-        # Заменяем print на нашу версию
-        safe_builtins['print'] = self._custom_print
+        # Встроенные функции - общие для всех способов выполнения; print - наша версия
+        safe_builtins = make_safe_builtins(self._custom_print, self.inputs)
 
         self.execution_globals = {
             '__builtins__': safe_builtins,
@@ -124,11 +383,15 @@ class CodeExecutor:
         print(*args, file=output, **kwargs)
         result = output.getvalue().rstrip('\n')
 
-        # Сохраняем вывод
-        self.current_print_output = result
+        # Сохраняем вывод (несколько print до следующего шага накапливаются)
+        if self.current_print_output:
+            self.current_print_output += '\n' + result
+        else:
+            self.current_print_output = result
 
-        # Также выводим в консоль для отладки
-        print(*args, **kwargs)
+        # Также выводим в консоль для отладки (кроме повторов при воспроизведении)
+        if self.replay is None or not self.replay.is_replaying:
+            print(*args, **kwargs)
 
     def execute_step_by_step(self, code: str) -> bool:
         """
@@ -140,18 +403,27 @@ class CodeExecutor:
         Returns:
             True если выполнение началось успешно
         """
+        cache_key = self._trace_cache_key(code)
+        if cache_key is not None and self._load_cached_trace(cache_key, code):
+            return True
+
         if not self.prepare_code(code):
             return False
 
         try:
-            # Компилируем код
-            compiled_code = compile(code, '<string>', 'exec')
+            # Берем скомпилированный код из общего кэша
+            compiled_code = compilation_service.compile(code)
+            self._module_code = compiled_code
+            self._user_codes = list(_user_code_objects(compiled_code))
+            self._user_code_ids = frozenset(map(id, self._user_codes))
 
             # Устанавливаем трассировщик
-            self.original_trace = sys.gettrace()
-            sys.settrace(self._trace_function)
+            if self.is_tracking_memory():
+                self._start_memory_accounting()
+            self._install_tracer(compiled_code)
 
             self.is_running = True
+            self._profile_clock = time.perf_counter_ns()
 
             # Выполняем код
             exec(compiled_code, self.execution_globals, self.execution_locals)
@@ -159,80 +431,376 @@ class CodeExecutor:
             # НЕ ДОБАВЛЯЕМ финальный шаг - он вызывает проблемы
             # Вместо этого убеждаемся, что последний шаг содержит правильные данные
 
+        except (_WindowComplete, _ExecutionCancelled):
+            pass
+
         except Exception as e:
-            # Записываем ошибку как последний шаг
-            error_step = ExecutionStep(
-                step_number=len(self.steps),
-                line_number=getattr(e, 'lineno', len(self.code_lines)),
-                code_line="# Ошибка выполнения",
-                variables={},
-                event_type='exception',
-                error=str(e)
-            )
-            self.steps.append(error_step)
+            # Ошибка при раскрутке стека после остановки окна или по запросу
+            # (например, в выражении except кода пользователя) к шагам программы не относится
+            if not self.window_truncated and not self.cancelled:
+                # Записываем ошибку как последний шаг
+                error_step = ExecutionStep(
+                    step_number=len(self.steps),
+                    line_number=getattr(e, 'lineno', len(self.code_lines)),
+                    code_line="# Ошибка выполнения",
+                    variables={},
+                    event_type='exception',
+                    error=str(e) or type(e).__name__,
+                    skipped=self._pending_skipped,
+                    memory=max(0, self._user_memory)
+                )
+                self.steps.append(error_step)
 
         finally:
+            if self.replay is not None and self.replay.is_replaying:
+                # Копия-воспроизведение не должна вернуться в вызывающий код
+                self.replay.abort_replay()
+
             # Восстанавливаем окружение
             self.is_running = False
-            sys.settrace(self.original_trace)
+            self._remove_tracer()
+            if self._profile_clock:
+                # Время после последнего события - до завершения программы
+                self._line_times[self._profile_line] += time.perf_counter_ns() - self._profile_clock
+                self._profile_clock = 0
+            self._stop_memory_accounting()
+            # Отпускаем кадры, чтобы не удерживать их переменные
+            self._live_frames = {}
+            self._unwinding_frames.clear()
+            self._active_loop = None
+            self._user_codes = []
+            self._user_code_ids = frozenset()
+            # Шаги после последнего снимка тоже учитываются как пропущенные
+            self._skipped_events += self._pending_skipped
+            self._pending_skipped = 0
+            # Вывод последней строки программы (после него шагов уже не было)
+            if self.current_print_output and len(self.steps):
+                self.steps.append_output(self.current_print_output)
+                self.current_print_output = ""
+            self.output_before_window = '\n'.join(self._outputs_before_window)
+            self._outputs_before_window = []
+
+        if cache_key is not None and not self.cancelled:
+            self._save_cached_trace(cache_key)
 
         return True
 
-    def _trace_function(self, frame, event, arg):
-        """Функция трассировки для отслеживания выполнения"""
-        # Защита от слишком большого количества шагов
-        if len(self.steps) >= self.max_steps:
-            raise RuntimeError("Превышено максимальное количество шагов выполнения")
+    def _trace_cache_key(self, code: str) -> Optional[str]:
+        """Ключ кэша трассировок (None если трассировку нельзя кэшировать)"""
+        # Журнал на диске и контрольные точки привязаны к своему запуску
+        if self.trace_cache is None or self.trace_mode != 'memory':
+            return None
+        settings = {
+            'snapshot_mode': self.snapshot_mode,
+            'keyframe_interval': self.keyframe_interval,
+            'step_limit': self._get_step_limit(),
+            'loop_mode': self.loop_mode,
+            'sample_interval': self.sample_interval,
+            'adaptive_sampling': self.adaptive_sampling,
+            'max_snapshot_rate': self.max_snapshot_rate,
+            'value_budget': self.value_budget,
+            'step_window': self.step_window,
+            'track_memory': self.track_memory,
+            'memory_budget': self.memory_budget,
+            'max_operations': self.max_operations,
+        }
+        return self.trace_cache.make_key(code, self.inputs or (), settings)
+
+    def _save_cached_trace(self, cache_key: str):
+        """Сохранение готовой трассировки в кэше"""
+        self.trace_cache.put(cache_key, {'code_lines': self.code_lines, 'steps': self.steps,
+                                         'skipped_events': self._skipped_events,
+                                         'sample_every': self._sample_every,
+                                         'window_truncated': self.window_truncated,
+                                         'output_before_window': self.output_before_window,
+                                         'peak_memory': self.peak_memory,
+                                         'line_hits': self._line_hits,
+                                         'line_times': self._line_times})
+
+    def _load_cached_trace(self, cache_key: str, code: str) -> bool:
+        """Подстановка готовой трассировки из кэша вместо выполнения"""
+        entry = self.trace_cache.get(cache_key)
+        if entry is None:
+            return False
+
+        self._new_trace_store()
+        self.steps = entry['steps']
+        self.code_lines = entry['code_lines']
+        self.source_code = code
+        self._skipped_events = entry.get('skipped_events', 0)
+        self._sample_every = entry.get('sample_every', 1)
+        self.window_truncated = entry.get('window_truncated', False)
+        self.output_before_window = entry.get('output_before_window', "")
+        self.peak_memory = entry.get('peak_memory', 0)
+        self._line_hits = entry.get('line_hits', [0])
+        self._line_times = entry.get('line_times', [0])
+        self.heap_snapshotter = HeapSnapshotter()
+        self.current_step = -1
+        self.print_outputs.clear()
+        self.execution_globals = {}
+        self.execution_locals = {}
+        return True
+
+    def _monitoring_available(self) -> bool:
+        """Можно ли использовать sys.monitoring для трассировки"""
+        if self.tracing_backend == 'settrace' or not hasattr(sys, 'monitoring'):
+            return False
+        # Идентификатор отладчика может быть занят другим инструментом
+        return sys.monitoring.get_tool(sys.monitoring.DEBUGGER_ID) is None
+
+    def _install_tracer(self, compiled_code):
+        """Установка трассировщика выбранного бэкенда"""
+        if self._monitoring_available():
+            monitoring = sys.monitoring
+            events = monitoring.events
+            tool_id = monitoring.DEBUGGER_ID
+            monitoring.use_tool_id(tool_id, 'CodeVisualizer')
+            monitoring.register_callback(tool_id, events.LINE, self._monitoring_line)
+            monitoring.register_callback(tool_id, events.PY_START, self._monitoring_start)
+            monitoring.register_callback(tool_id, events.PY_RETURN, self._monitoring_return)
+            jump_events = 0
+            for event in _jump_events():
+                monitoring.register_callback(tool_id, event, self._monitoring_jump)
+                jump_events |= event
+            self._jump_lines = {}
+            # События включаются только для объектов кода пользователя,
+            # остальной код (библиотеки, встроенные функции) не трассируется
+            for code in self._user_codes:
+                local_events = events.LINE | jump_events
+                if _is_function_code(code):
+                    local_events |= events.PY_START | events.PY_RETURN
+                monitoring.set_local_events(tool_id, code, local_events)
+            self.active_backend = 'monitoring'
+        else:
+            self.original_trace = sys.gettrace()
+            sys.settrace(self._trace_function)
+            self.active_backend = 'settrace'
+
+    def _remove_tracer(self):
+        """Снятие трассировщика и восстановление окружения"""
+        if self.active_backend == 'monitoring':
+            monitoring = sys.monitoring
+            events = monitoring.events
+            tool_id = monitoring.DEBUGGER_ID
+            for code in self._user_codes:
+                monitoring.set_local_events(tool_id, code, 0)
+            for event in (events.LINE, events.PY_START, events.PY_RETURN, *_jump_events()):
+                monitoring.register_callback(tool_id, event, None)
+            monitoring.free_tool_id(tool_id)
+        elif self.active_backend == 'settrace':
+            sys.settrace(self.original_trace)
+        self.active_backend = None
+
+    def is_tracking_memory(self) -> bool:
+        """Включен ли учет памяти кода пользователя"""
+        return self.track_memory or self.memory_budget is not None
+
+    def _start_memory_accounting(self):
+        """Запуск tracemalloc и подсчета памяти кода пользователя"""
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        # Обработчики бэкендов вызывают self._record_step: на время выполнения
+        # его подменяет вариант с учетом памяти, без учета проверок не прибавляется
+        self._record_step = self._record_step_with_memory
+        self._memory_mark = tracemalloc.get_traced_memory()[0]
+
+    def _stop_memory_accounting(self):
+        """Остановка учета памяти (tracemalloc останавливается, только если запущен здесь)"""
+        self.__dict__.pop('_record_step', None)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _record_step_with_memory(self, frame, line_number: int, event_type: str = 'line',
+                                 return_value: Any = _MISSING) -> bool:
+        """
+        Запись шага с учетом памяти
+
+        Память, выделенная между выходом из трассировщика и следующим
+        событием, относится к коду пользователя, а выделенная при записи
+        шага (снимки, хранилище) - к трассировщику.
+        """
+        current = tracemalloc.get_traced_memory()[0]
+        self._user_memory += current - self._memory_mark
+        self._memory_mark = current
+        if self._user_memory > self.peak_memory:
+            self.peak_memory = self._user_memory
+        if self.memory_budget is not None and self._user_memory > self.memory_budget:
+            raise MemoryError(f"Превышен лимит памяти: программа заняла "
+                              f"{self._user_memory / 2 ** 20:.1f} МБ из {self.memory_budget / 2 ** 20:.1f} МБ")
+        try:
+            return CodeExecutor._record_step(self, frame, line_number, event_type, return_value)
+        finally:
+            self._memory_mark = tracemalloc.get_traced_memory()[0]
+
+    def _monitoring_line(self, code, line_number):
+        """Обработчик события LINE для бэкенда sys.monitoring"""
+        security_manager.increment_operation_count()
 
+        # Обработчик вызывается непосредственно из кадра пользовательского кода
+        frame = sys._getframe(1)
+        if not self._record_step(frame, line_number):
+            # Строка вне кода пользователя - отключаем событие для этого места
+            return sys.monitoring.DISABLE
+        return None
+
+    def _monitoring_jump(self, code, instruction_offset, destination_offset):
+        """
+        Обработчик событий JUMP и BRANCH для бэкенда sys.monitoring
+
+        Переход назад в пределах одной строки (цикл в одну строку,
+        включение) не порождает события LINE, а settrace сообщает о нем
+        строкой - такой переход записывается шагом, как событие LINE.
+        Остальные переходы отключаются: о смене строки сообщит LINE.
+        """
+        key = (id(code), instruction_offset)
+        line_number = self._jump_lines.get(key, _MISSING)
+        if line_number is _MISSING:
+            line_number = None
+            if destination_offset <= instruction_offset:
+                line_number = _offset_line(code, destination_offset)
+                if line_number != _offset_line(code, instruction_offset):
+                    line_number = None
+            self._jump_lines[key] = line_number
+        if line_number is None:
+            return sys.monitoring.DISABLE
+
+        security_manager.increment_operation_count()
+        self._record_step(sys._getframe(1), line_number)
+        return None
+
+    def _monitoring_start(self, code, instruction_offset):
+        """Обработчик события PY_START (вызов функции) для бэкенда sys.monitoring"""
+        security_manager.increment_operation_count()
+        self._record_step(sys._getframe(1), code.co_firstlineno, 'call')
+
+    def _monitoring_return(self, code, instruction_offset, return_value):
+        """Обработчик события PY_RETURN (возврат из функции) для бэкенда sys.monitoring"""
+        security_manager.increment_operation_count()
+        frame = sys._getframe(1)
+        self._record_step(frame, frame.f_lineno, 'return', return_value)
+
+    def _trace_function(self, frame, event, arg):
+        """Функция трассировки для отслеживания выполнения (бэкенд settrace)"""
         # Увеличиваем счетчик операций для защиты от зависания
         security_manager.increment_operation_count()
 
-        # КЛЮЧЕВОЕ ИСПРАВЛЕНИЕ: Игнорируем события не из нашего кода
-        if frame.f_code.co_filename != '<string>':
-            return self._trace_function
+        # Код библиотек, встроенных модулей и включений не получает
+        # локальный трассировщик и выполняется без накладных расходов
+        code = frame.f_code
+        if id(code) not in self._user_code_ids:
+            return None
+
+        if event == 'line':
+            self._unwinding_frames.discard(id(frame))
+            self._record_step(frame, frame.f_lineno)
+        elif event == 'exception':
+            # Если исключение не перехвачено в кадре, за ним последует
+            # 'return', который не является возвратом значения
+            self._unwinding_frames.add(id(frame))
+        elif event == 'call' and _is_function_code(code):
+            self._record_step(frame, code.co_firstlineno, 'call')
+        elif event == 'return':
+            unwinding = id(frame) in self._unwinding_frames
+            self._unwinding_frames.discard(id(frame))
+            if not unwinding and _is_function_code(code):
+                self._record_step(frame, frame.f_lineno, 'return', arg)
 
-        # ДОПОЛНИТЕЛЬНАЯ ФИЛЬТРАЦИЯ: Игнорируем системные вызовы
-        if frame.f_code.co_name not in ['<module>', '__main__']:
-            return self._trace_function
+        return self._trace_function
 
-        # Обрабатываем только события 'line'
-        if event != 'line':
-            return self._trace_function
+    def _record_step(self, frame, line_number: int, event_type: str = 'line',
+                     return_value: Any = _MISSING) -> bool:
+        """
+        Запись шага выполнения (строка, вызов или возврат) кода пользователя
 
-        line_number = frame.f_lineno
+        Общая часть для всех бэкендов трассировки, поэтому они
+        порождают одинаковую последовательность шагов. Попутно
+        накапливается профиль строк: время между событиями прибавляется
+        к строке, выполнявшейся после предыдущего события.
 
+        Returns:
+            False если строка не относится к коду пользователя
+        """
         # ВАЖНО: Проверяем, что номер строки в пределах нашего кода
         if line_number < 1 or line_number > len(self.code_lines):
-            return self._trace_function
+            return False
+
+        code = frame.f_code
+        in_module = code is self._module_code
+        if not in_module and event_type == 'line' and line_number == code.co_firstlineno \
+                and not code.co_flags & inspect.CO_OPTIMIZED:
+            # Строка заголовка класса уже записана шагом модуля; разные версии
+            # Python и бэкенды по-разному сообщают ее повторно из тела класса
+            return True
+
+        now = time.perf_counter_ns()
+        self._line_times[self._profile_line] += now - self._profile_clock
+        self._profile_clock = now
+        if event_type == 'return':
+            # Дальше выполняется строка вызывающего кода (0 - вне кода пользователя)
+            caller = frame.f_back
+            self._profile_line = caller.f_lineno \
+                if caller is not None and id(caller.f_code) in self._user_code_ids else 0
+        else:
+            self._profile_line = line_number
+            if event_type == 'line':
+                self._line_hits[line_number] += 1
+
+        event_index = self._event_index
+        self._event_index += 1
+        if self.cancel_token.cancelled and (self.replay is None or not self.replay.is_replaying):
+            # Остановка пользователем; копии-воспроизведения дорабатывают до своего шага
+            self.cancelled = True
+            raise _ExecutionCancelled()
+        if self._event_limit is not None and event_index >= self._event_limit:
+            raise RuntimeError("Превышено максимальное количество шагов выполнения")
+
+        window = self.step_window
+        if window is not None:
+            if event_index < window[0]:
+                # Перемотка до окна: состояние не снимается, вывод копится отдельно
+                if self.current_print_output:
+                    self._outputs_before_window.append(self.current_print_output)
+                    self.current_print_output = ""
+                return True
+            if event_index > window[1]:
+                # Окно записано - дальше выполнять незачем
+                self.window_truncated = True
+                raise _WindowComplete()
+
+        iteration = None
+        if self._loop_lines:
+            iteration = self._coalesce_loop(frame, line_number, event_type, event_index)
+            if iteration is _SKIP_STEP:
+                return True
+
+        if self._sample_every > 1 and iteration is None and not self.current_print_output \
+                and self._last_sample_event >= 0 \
+                and event_index - self._last_sample_event < self._sample_every:
+            # Выборочная запись: событие только подсчитывается, состояние не снимается
+            # (первое событие снимается всегда)
+            self._pending_skipped += 1
+            return True
+
+        # Защита от слишком большого количества шагов
+        if len(self.steps) >= self._get_step_limit():
+            raise RuntimeError("Превышено максимальное количество шагов выполнения")
 
         # Получаем строку кода
         code_line = self.code_lines[line_number - 1].strip()
 
-        # Получаем текущие переменные из frame.f_locals
-        current_vars = {}
-
-        try:
-            for name, value in frame.f_locals.items():
-                if not name.startswith('__'):
-                    try:
-                        if isinstance(value, (int, float, str, bool, type(None))):
-                            current_vars[name] = value
-                        elif isinstance(value, (list, dict, tuple, set)):
-                            # Создаем копии для сохранения состояния НА ЭТОТ МОМЕНТ
-                            if isinstance(value, list):
-                                current_vars[name] = value.copy()
-                            elif isinstance(value, dict):
-                                current_vars[name] = value.copy()
-                            elif isinstance(value, tuple):
-                                current_vars[name] = tuple(value)
-                            elif isinstance(value, set):
-                                current_vars[name] = set(value)
-                        else:
-                            current_vars[name] = str(value)
-                    except:
-                        current_vars[name] = f"<{type(value).__name__}>"
-        except:
-            current_vars = {}
+        if self.replay is not None:
+            # Записываем только строку, состояние восстановится воспроизведением
+            step_index = len(self.steps)
+            self.replay.maybe_checkpoint(step_index)
+            if self.replay.is_replaying:
+                if step_index == self.replay.replay_target:
+                    self.replay.deliver(self._capture_state(frame, return_value))
+            current_vars, frames, heap = {}, None, None
+        else:
+            # Получаем переменные модуля и кадров вызванных функций
+            current_vars, frames, heap = self._capture_state(frame, return_value)
 
         # Проверяем, есть ли вывод от print на этом шаге
         step_output = ""
@@ -246,24 +814,388 @@ class CodeExecutor:
             line_number=line_number,
             code_line=code_line,
             variables=current_vars,
-            event_type=event,
-            output=step_output
+            event_type=event_type,
+            function_name=None if in_module else code.co_name,
+            output=step_output,
+            heap=heap,
+            frames=frames,
+            iteration=iteration,
+            skipped=self._pending_skipped,
+            event_index=event_index,
+            memory=max(0, self._user_memory)
         )
 
         self.steps.append(step)
 
+        if self.is_sampling():
+            self._after_sample(event_index)
+
         # Вызываем callback если установлен
-        if self.step_callback:
+        if self.step_callback and (self.replay is None or not self.replay.is_replaying):
             self.step_callback(step)
 
-        return self._trace_function
+        # Снимок состояния и запись шага - время трассировщика, а не строки
+        self._profile_clock = time.perf_counter_ns()
+        return True
+
+    def _after_sample(self, event_index: int):
+        """Учет записанного снимка и подстройка интервала адаптивной выборки"""
+        self._skipped_events += self._pending_skipped
+        self._pending_skipped = 0
+        self._last_sample_event = event_index
+
+        # Копия-воспроизведение должна пропускать те же события, что и запись,
+        # а замер времени не воспроизводим
+        if not self.adaptive_sampling or self.replay is not None:
+            return
+        self._rate_window_snapshots += 1
+        if self._rate_window_snapshots < 100:
+            return
+        now = time.perf_counter()
+        elapsed = now - self._rate_window_start
+        if elapsed <= 0 or self._rate_window_snapshots / elapsed > self.max_snapshot_rate:
+            self._sample_every *= 2
+        self._rate_window_start = now
+        self._rate_window_snapshots = 0
+
+    def _coalesce_loop(self, frame, line_number: int, event_type: str, event_index: int):
+        """
+        Свертка итераций циклов: записываются только границы итераций
+
+        Returns:
+            _SKIP_STEP если шаг внутри итерации не записывается, LoopIteration
+            если шаг завершает итерацию, иначе None (обычный шаг)
+        """
+        active = self._active_loop
+        if active is not None:
+            loop_frame, (header_line, body_start, body_end) = active[0], active[1]
+            if frame is loop_frame:
+                if event_type == 'line' and header_line <= line_number < body_start:
+                    # Обратный переход на заголовок - граница итерации
+                    iteration = self._close_iteration(event_index)
+                    active[2] += 1
+                    active[3] = 0
+                    active[4] = event_index + 1
+                    active[5] = len(self.steps)
+                    return iteration
+                if event_type == 'line' and body_start <= line_number <= body_end:
+                    active[3] += 1
+                    return _SKIP_STEP
+            elif _frame_on_stack(loop_frame, frame):
+                # Функция, вызванная из тела цикла, - часть итерации
+                active[3] += 1
+                return _SKIP_STEP
+
+            # Выход из цикла (break, return, исключение или конец цикла)
+            iteration = self._close_iteration(event_index)
+            self._active_loop = None
+            if iteration is not None:
+                return iteration
+
+        if event_type == 'line' and line_number in self._loop_lines:
+            # Вход в цикл: сам заголовок записывается обычным шагом
+            self._active_loop = [frame, self._loop_lines[line_number], 0, 0,
+                                 event_index + 1, len(self.steps)]
+        return None
+
+    def _close_iteration(self, event_index: int) -> Optional[LoopIteration]:
+        """Сводка завершившейся итерации (None если тело еще не выполнялось)"""
+        _, (header_line, _, _), number, line_count, first_event, start_step = self._active_loop
+        if line_count == 0:
+            return None
+        return LoopIteration(header_line, number + 1, line_count, start_step,
+                             first_event, event_index - 1)
+
+    def _capture_state(self, frame, return_value: Any = _MISSING) -> Tuple[Dict[str, Any], Optional[Dict[int, StackFrame]], Optional[Dict[int, Any]]]:
+        """
+        Снимок состояния: переменные модуля и кадры функций пользователя
+
+        Кадр, переменные которого не изменились, берется из предыдущего
+        шага тем же объектом - хранилище его не запишет.
+
+        Args:
+            frame: Текущий кадр пользовательского кода
+            return_value: Возвращаемое значение (для события 'return')
+
+        Returns:
+            Кортеж (переменные модуля, кадры по глубине или None,
+            версии объектов кучи или None в режиме 'shallow')
+        """
+        heap = {} if self.snapshot_mode == 'heap' else None
+        if heap is not None and len(self.steps) % self.keyframe_interval == 0:
+            # На ключевом кадре таблица объектов отпускает недостижимые контейнеры
+            self.heap_snapshotter.collect()
+        touched = self._touched_names()
+        variables = self._capture_namespace(self.execution_locals, self.steps.head['variables'], heap, touched)
+        self._last_capture_event = self._event_index - 1
+
+        if frame.f_code is self._module_code:
+            # Шаг на уровне модуля: кадров функций на стеке нет
+            if self._live_frames:
+                self._live_frames = {}
+            self._stack_lines = (frame.f_lineno,)
+            return variables, None, heap
+
+        stack = _user_frames(frame, self._module_code, self._user_code_ids)
+        module_frame = stack[0].f_back if stack else None
+        while module_frame is not None and module_frame.f_code is not self._module_code:
+            module_frame = module_frame.f_back
+        self._stack_lines = tuple(user_frame.f_lineno for user_frame in stack) + \
+            ((module_frame.f_lineno,) if module_frame is not None else ())
+
+        frames = {}
+        live_frames = {}
+        for depth, user_frame in enumerate(stack, 1):
+            known = self._live_frames.get(id(user_frame))
+            previous = known[1] if known is not None and known[0] is user_frame else None
+
+            namespace = user_frame.f_locals
+            if return_value is not _MISSING and user_frame is frame:
+                namespace = dict(namespace)
+                namespace[RETURN_VALUE_NAME] = return_value
+
+            frame_vars = self._capture_namespace(
+                namespace, previous.variables if previous is not None else {}, heap, touched)
+
+            if previous is not None and _same_bindings(previous.variables, frame_vars):
+                stack_frame = previous
+            else:
+                stack_frame = StackFrame(user_frame.f_code.co_name, frame_vars)
+
+            frames[depth] = stack_frame
+            live_frames[id(user_frame)] = (user_frame, stack_frame)
+
+        self._live_frames = live_frames
+        return variables, frames, heap
+
+    def _touched_names(self) -> Optional[Tuple[frozenset, bool]]:
+        """
+        Имена, которые могли измениться с предыдущего снимка
+
+        Между двумя соседними событиями выполняются только строки, на которых
+        стояли кадры стека при предыдущем событии (текущая строка и строки
+        вызовов, ожидающие возврата), - изменить можно только их имена.
+
+        Returns:
+            Кортеж (имена, можно ли переносить контейнеры) или None, если
+            снимать нужно все имена (после пропущенных событий или для
+            строки с неизвестным действием)
+        """
+        if not self._line_effects or self._last_capture_event != self._event_index - 2:
+            return None
+        names = set()
+        carry_containers = True
+        for line in self._stack_lines:
+            effects = self._line_effects.get(line)
+            if effects is None:
+                return None
+            names |= effects[0]
+            carry_containers = carry_containers and not effects[1]
+        return names, carry_containers
+
+    def _capture_namespace(self, namespace, previous: Dict[str, Any],
+                           heap: Optional[Dict[int, Any]],
+                           touched: Optional[Tuple[frozenset, bool]] = None) -> Dict[str, Any]:
+        """
+        Снимок переменных одного пространства имен
+
+        Значения, не изменившиеся с предыдущего шага, берутся из него же
+        без копирования - хранилище запишет только изменившиеся переменные.
+
+        Args:
+            namespace: Переменные кадра
+            previous: Снимок этих же переменных на предыдущем шаге
+            heap: Таблица версий объектов для пополнения (None в режиме 'shallow')
+            touched: Результат _touched_names (None - снимать все имена)
+        """
+        names, carry_containers = touched if touched is not None else (None, True)
+        if heap is not None:
+            try:
+                current_vars, namespace_heap = self.heap_snapshotter.snapshot(
+                    namespace, previous, names, carry_containers)
+            except:
+                return {}
+            heap.update(namespace_heap)
+            return current_vars
+
+        current_vars = {}
+        budget = self.value_budget
+
+        try:
+            for name, value in namespace.items():
+                if not name.startswith('__'):
+                    if names is not None and name not in names and type(value) in _UNCHANGED_TYPES \
+                            and name in previous:
+                        # Имя не затронуто строкой: атом или функция остались прежними
+                        current_vars[name] = previous[name]
+                        continue
+                    try:
+                        old_value = previous.get(name, _MISSING)
+                        if budget is not None:
+                            preview = make_preview(value, budget)
+                            if preview is not None:
+                                current_vars[name] = preview
+                                continue
+                            if isinstance(value, (list, dict, tuple, set)):
+                                budget -= len(value)
+                        if old_value is not _MISSING and _is_unchanged(old_value, value):
+                            current_vars[name] = old_value
+                        else:
+                            current_vars[name] = _snapshot_value(value)
+                    except:
+                        current_vars[name] = f"<{type(value).__name__}>"
+        except:
+            current_vars = {}
+
+        return current_vars
 
     def get_step(self, step_number: int) -> Optional[ExecutionStep]:
         """Получение конкретного шага выполнения"""
         if 0 <= step_number < len(self.steps):
-            return self.steps[step_number]
+            step = self.steps[step_number]
+            if self.replay is not None and step.event_type != 'exception':
+                snapshot = self.replay.snapshot(step_number)
+                if snapshot is not None:
+                    step.variables, step.frames, step.heap = snapshot
+            if step.heap is not None:
+                # Восстанавливаем значения из таблицы объектов (с псевдонимами,
+                # в том числе между кадрами разных функций)
+                built = {}
+                step.variables = materialize_variables(step.variables, step.heap, built)
+                if step.frames:
+                    step.frames = {
+                        depth: replace(frame, variables=materialize_variables(frame.variables, step.heap, built))
+                        for depth, frame in step.frames.items()
+                    }
+            self._attach_loaders(step)
+            return step
         return None
 
+    def _attach_loaders(self, step: ExecutionStep):
+        """Подстановка загрузчиков полных значений в превью изменяемых контейнеров"""
+        if step.event_type == 'exception':
+            return
+        step.variables = self._with_loaders(step.step_number, 0, step.variables)
+        if step.frames:
+            # Кадры могут быть общими с хранилищем - заменяем, а не изменяем
+            step.frames = {depth: replace(frame, variables=self._with_loaders(step.step_number, depth, frame.variables))
+                           for depth, frame in step.frames.items()}
+
+    def _with_loaders(self, step_number: int, depth: int, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Переменные, в которых превью без значения получили загрузчик"""
+        if not any(type(value) is ValuePreview and not value.is_loadable for value in variables.values()):
+            return variables
+        return {name: replace(value, loader=partial(self.load_full_value, step_number, name, depth))
+                if type(value) is ValuePreview and not value.is_loadable else value
+                for name, value in variables.items()}
+
+    def load_full_value(self, step_number: int, name: str, depth: int = 0) -> Any:
+        """
+        Полное значение переменной, сохраненной на шаге превью
+
+        Значение восстанавливается повторным выполнением кода до события
+        шага без ограничения размера снимка (как и разворачивание итерации).
+
+        Args:
+            step_number: Номер шага
+            name: Имя переменной
+            depth: Глубина кадра функции (0 - переменные модуля)
+
+        Returns:
+            Значение или None, если восстановить его не удалось
+        """
+        if not 0 <= step_number < len(self.steps) or not self.source_code:
+            return None
+        record = self.steps.get_record(step_number)
+
+        detail = type(self)()
+        detail.snapshot_mode = self.snapshot_mode
+        detail.tracing_backend = self.tracing_backend
+        detail.trace_cache = None
+        detail.value_budget = None
+        detail.max_steps = self._get_event_limit()
+        detail.step_window = (record.event_index, record.event_index)
+        detail.execute_step_by_step(self.source_code)
+
+        step = detail.get_step(0)
+        if step is None or step.event_type == 'exception' or step.line_number != record.line_number:
+            return None
+        if depth == 0:
+            return step.variables.get(name)
+        frame = (step.frames or {}).get(depth)
+        return frame.variables.get(name) if frame is not None else None
+
+    def expand_iteration(self, step_number: int) -> List[ExecutionStep]:
+        """
+        Полные шаги свернутой итерации цикла
+
+        Итерация восстанавливается повторным выполнением кода с записью
+        только ее событий (код детерминирован: импорт и ввод запрещены).
+
+        Args:
+            step_number: Номер шага, которым завершилась итерация
+
+        Returns:
+            Шаги итерации (пустой список, если шаг не завершает итерацию)
+        """
+        if not 0 <= step_number < len(self.steps):
+            return []
+        iteration = self.steps.get_record(step_number).iteration
+        if iteration is None or not self.source_code:
+            return []
+
+        detail = type(self)()
+        detail.snapshot_mode = self.snapshot_mode
+        detail.tracing_backend = self.tracing_backend
+        detail.trace_cache = None
+        detail.value_budget = self.value_budget
+        # Тот же лимит, что и при записи, - выполнение дойдет до итерации так же
+        detail.max_steps = self._get_step_limit()
+        detail.step_window = (iteration.first_event, iteration.last_event)
+        detail.execute_step_by_step(self.source_code)
+        return [detail.get_step(i) for i in range(len(detail.steps))
+                if detail.steps.get_record(i).event_type != 'exception']
+
+    def get_line_profile(self) -> Dict[int, Tuple[int, int]]:
+        """
+        Профиль строк последнего выполнения
+
+        При выполнении окна шагов профиль охватывает программу от начала
+        до конца окна.
+
+        Returns:
+            Словарь номер строки -> (число выполнений, суммарное время в наносекундах)
+            для выполнявшихся строк
+        """
+        return {line: (self._line_hits[line], self._line_times[line])
+                for line in range(1, len(self._line_hits))
+                if self._line_hits[line] or self._line_times[line]}
+
+    def get_changed_variables(self, step_number: int) -> List[str]:
+        """Имена переменных, изменившихся за итерацию, завершившуюся шагом"""
+        step = self.get_step(step_number)
+        if step is None or step.iteration is None:
+            return []
+        start = self.get_step(step.iteration.start_step)
+
+        def visible(s: ExecutionStep) -> Dict[str, Any]:
+            # Переменные модуля и самого внутреннего кадра функции
+            names = dict(s.variables)
+            if s.frames:
+                names.update(s.frames[max(s.frames)].variables)
+            return names
+
+        before, after = visible(start), visible(step)
+        return [name for name, value in after.items()
+                if name not in before or not _values_equal(before[name], value)]
+
+    def get_output_until(self, step_number: int) -> str:
+        """Вывод программы, накопленный к указанному шагу включительно (с выводом до окна)"""
+        output = self.steps.get_output_until(step_number)
+        if self.output_before_window:
+            return self.output_before_window + '\n' + output if output else self.output_before_window
+        return output
+
     def get_current_step(self) -> Optional[ExecutionStep]:
         """Получение текущего шага"""
         return self.get_step(self.current_step)
@@ -291,7 +1223,7 @@ class CodeExecutor:
 
     def reset(self):
         """Сброс состояния исполнителя"""
-        self.steps.clear()
+        self._new_trace_store()
         self.current_step = -1
         self.code_lines.clear()
         self.is_running = False
@@ -300,22 +1232,152 @@ class CodeExecutor:
         self.execution_locals.clear()
         self.print_outputs.clear()
         self.current_print_output = ""
+        self.window_truncated = False
+        self.output_before_window = ""
+        self.cancelled = False
+        self.peak_memory = 0
+        self._user_memory = 0
+        self._line_hits = [0]
+        self._line_times = [0]
 
     def get_execution_summary(self) -> Dict[str, Any]:
-        """Получение сводки выполнения"""
+        """
+        Получение сводки выполнения
+
+        При выборочной записи total_steps - число снимков, а
+        interpolated_steps - число пропущенных между ними шагов.
+        """
         return {
             'total_steps': len(self.steps),
             'current_step': self.current_step,
-            'has_errors': any(step.error for step in self.steps),
+            'has_errors': self.steps.has_errors(),
             'variables_count': len(self.execution_locals),
-            'code_lines': len(self.code_lines)
+            'code_lines': len(self.code_lines),
+            'sampled': self._skipped_events > 0,
+            'snapshot_steps': len(self.steps),
+            'interpolated_steps': self._skipped_events,
+            'traced_steps': len(self.steps) + self._skipped_events,
+            'sample_interval': self._sample_every,
+            'window_truncated': self.window_truncated,
+            'cancelled': self.cancelled,
+            'peak_memory': self.peak_memory
         }
 
+    def cancel(self):
+        """Остановить выполнение (из другого потока); записанные шаги остаются доступны"""
+        self.cancel_token.cancel()
+
     def set_step_callback(self, callback: Callable[[ExecutionStep], None]):
         """Установка callback функции для уведомления о новых шагах"""
         self.step_callback = callback
 
 
+def _jump_events() -> Tuple[int, ...]:
+    """События переходов sys.monitoring (в Python 3.14 BRANCH разделен на два)"""
+    events = sys.monitoring.events
+    if hasattr(events, 'BRANCH_LEFT'):
+        return events.JUMP, events.BRANCH_LEFT, events.BRANCH_RIGHT
+    return events.JUMP, events.BRANCH
+
+
+def _offset_line(code: CodeType, offset: int) -> Optional[int]:
+    """Номер строки инструкции по ее смещению в объекте кода"""
+    for start, end, line in code.co_lines():
+        if start <= offset < end:
+            return line
+    return None
+
+
+def _snapshot_value(value: Any) -> Any:
+    """Снимок значения переменной на текущий момент"""
+    if isinstance(value, (int, float, str, bool, type(None))):
+        return value
+    elif isinstance(value, (list, dict, tuple, set)):
+        # Создаем копии для сохранения состояния НА ЭТОТ МОМЕНТ
+        if isinstance(value, list):
+            return value.copy()
+        elif isinstance(value, dict):
+            return value.copy()
+        elif isinstance(value, tuple):
+            return tuple(value)
+        elif isinstance(value, set):
+            return set(value)
+    return str(value)
+
+
+def _is_function_code(code: CodeType) -> bool:
+    """Код функции, вызов и возврат которой записываются шагами"""
+    # Тело класса выполняется без CO_OPTIMIZED, генераторы возобновляются многократно
+    return bool(code.co_flags & inspect.CO_OPTIMIZED) and not code.co_flags & _GENERATOR_FLAGS
+
+
+def _user_code_objects(code: CodeType):
+    """Объекты кода модуля и всех вложенных функций и классов пользователя"""
+    if code.co_name not in _HIDDEN_CODE_NAMES:
+        yield code
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from _user_code_objects(const)
+
+
+def _user_frames(frame, module_code: CodeType, user_code_ids) -> list:
+    """Кадры функций пользователя на стеке, от внешнего к внутреннему"""
+    frames = []
+    while frame is not None and frame.f_code is not module_code:
+        if id(frame.f_code) in user_code_ids:
+            frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _loop_line_map(tree: Optional[ast.AST]) -> Dict[int, Tuple[int, int, int]]:
+    """Строки заголовков циклов: строка -> (первая строка заголовка, начало тела, конец тела)"""
+    loops = {}
+    if tree is None:
+        return loops
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.For, ast.While, ast.AsyncFor)) and node.body:
+            body_start = node.body[0].lineno
+            body_end = max(getattr(item, 'end_lineno', None) or item.lineno for item in node.body)
+            for line in range(node.lineno, body_start):
+                loops[line] = (node.lineno, body_start, body_end)
+    return loops
+
+
+def _frame_on_stack(target, frame) -> bool:
+    """Находится ли кадр target на стеке вызовов кадра frame"""
+    while frame is not None:
+        if frame is target:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def _values_equal(old: Any, new: Any) -> bool:
+    """Равенство значений переменных (с учетом типов, без ошибок сравнения)"""
+    try:
+        return type(old) is type(new) and bool(old == new)
+    except Exception:
+        return False
+
+
+def _same_bindings(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+    """Связаны ли имена с теми же объектами снимка"""
+    if old.keys() != new.keys():
+        return False
+    return all(old[name] is value for name, value in new.items())
+
+
+def _is_unchanged(snapshot: Any, value: Any) -> bool:
+    """Совпадает ли сохраненный снимок с текущим значением переменной"""
+    if isinstance(value, (int, float, str, bool, type(None), list, dict, tuple, set)):
+        # Сравнение типов отличает, например, 1 от True и список от кортежа
+        return type(snapshot) is type(value) and snapshot == value
+    # Прочие объекты хранятся строкой - сравнивать их дешевле заново не выйдет
+    return False
+
+
 # Функция для быстрого тестирования
 def quick_execute(code: str) -> List[ExecutionStep]:
     """
@@ -329,5 +1391,5 @@ def quick_execute(code: str) -> List[ExecutionStep]:
     """
     executor = CodeExecutor()
     if executor.execute_step_by_step(code):
-        return executor.steps
+        return [executor.get_step(i) for i in range(len(executor.steps))]
     return []
@@ -0,0 +1,302 @@
+from dataclasses import dataclass
+from operator import is_
+from types import FunctionType, BuiltinFunctionType
+from typing import Dict, Any, Optional, Tuple, AbstractSet
+
+from src.executor.value_preview import ValuePreview, make_preview
+
+
+# Типы, значения которых хранятся в снимке как есть
+ATOMIC_TYPES = (int, float, str, bool, type(None))
+_ATOMIC_TYPE_SET = frozenset(ATOMIC_TYPES)
+
+# Контейнеры, которые попадают в таблицу объектов
+CONTAINER_TYPES = (list, dict, tuple, set)
+
+# Объекты, строковое представление которых не меняется (функции и классы)
+_STABLE_TYPES = frozenset({FunctionType, BuiltinFunctionType, type})
+
+# Маркер отсутствующей переменной (None может быть значением)
+_MISSING = object()
+
+
+@dataclass(frozen=True, slots=True)
+class HeapRef:
+    """Ссылка на объект из таблицы объектов трассировки"""
+    object_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class HeapObject:
+    """
+    Версия содержимого контейнера
+
+    Для списков, кортежей и множеств items - элементы, для словарей
+    items - значения, а keys - ключи. Вложенные контейнеры хранятся
+    как HeapRef, поэтому версия не зависит от содержимого вложенных.
+    """
+    kind: str  # 'list', 'dict', 'tuple', 'set'
+    items: Tuple[Any, ...]
+    keys: Tuple[Any, ...] = ()
+
+
+class HeapSnapshotter:
+    """
+    Снимки кучи с сохранением идентичности объектов
+
+    Каждый контейнер получает постоянный номер в таблице объектов
+    трассировки. Новая версия объекта создается только при изменении
+    его содержимого, неизменившиеся версии разделяются между шагами.
+    """
+
+    def __init__(self):
+        # id(объект) -> [объект, HeapRef, последняя версия, версия без вложенных контейнеров]
+        # Объект удерживается, чтобы его id не достался другому объекту
+        self._objects: Dict[int, list] = {}
+        self._next_object_id = 1
+        # id контейнеров, встречавшихся в снимках после последней очистки
+        self._seen = set()
+        # Бюджет элементов контейнеров на снимок пространства имен: контейнер,
+        # не помещающийся в остаток, сохраняется превью (None - без ограничения)
+        self.max_items: Optional[int] = None
+        self._budget = 0
+        # Контейнеры, перенесенные с предыдущего шага без проверки содержимого
+        self._unverified = set()
+
+    def snapshot(self, namespace: Dict[str, Any], previous: Dict[str, Any],
+                 touched: Optional[AbstractSet[str]] = None,
+                 carry_containers: bool = True) -> Tuple[Dict[str, Any], Dict[int, HeapObject]]:
+        """
+        Снимок переменных пространства имен
+
+        Если задано touched, заново снимаются только эти имена, остальные
+        переносятся из previous: атомы, функции и классы - как есть, а
+        контейнеры без вложенных контейнеров - ссылкой с прежней версией.
+        Такой контейнер проверяется, если до него дойдет обход через
+        снимаемое имя (например, через псевдоним).
+
+        Args:
+            namespace: Переменные кадра (frame.f_locals)
+            previous: Переменные предыдущего снимка для повторного использования значений
+            touched: Имена, которые могли измениться с предыдущего снимка (None - все)
+            carry_containers: Переносить ли контейнеры (False, если контейнер
+                мог измениться через атрибут объекта)
+
+        Returns:
+            Кортеж (переменные, версии достижимых объектов по номерам)
+        """
+        variables = {}
+        heap: Dict[int, HeapObject] = {}
+        visited: Dict[int, HeapRef] = {}
+        self._budget = self.max_items
+        self._unverified.clear()
+
+        for name, value in namespace.items():
+            if name.startswith('__'):
+                continue
+            if touched is not None and name not in touched:
+                old_value = previous.get(name, _MISSING)
+                if old_value is not _MISSING:
+                    carried = self._carry(value, old_value, carry_containers, visited, heap)
+                    if carried is not _MISSING:
+                        variables[name] = carried
+                        continue
+            try:
+                snapshot = self._snapshot_value(value, visited, heap)
+            except Exception:
+                snapshot = f"<{type(value).__name__}>"
+
+            # Равное атомарное значение берем из предыдущего шага тем же объектом,
+            # чтобы хранилище не считало его изменившимся
+            if type(snapshot) in _ATOMIC_TYPE_SET:
+                old_value = previous.get(name, _MISSING)
+                if type(old_value) is type(snapshot) and old_value == snapshot:
+                    snapshot = old_value
+            elif type(snapshot) is ValuePreview and snapshot.full is not None:
+                # Превью того же неизменяемого значения - тоже с предыдущего шага
+                old_value = previous.get(name, _MISSING)
+                if type(old_value) is ValuePreview and old_value.full is snapshot.full:
+                    snapshot = old_value
+            variables[name] = snapshot
+
+        self._seen.update(visited)
+        return variables, heap
+
+    def collect(self):
+        """
+        Очистка таблицы объектов
+
+        Контейнеры, не встречавшиеся в снимках с предыдущей очистки, больше
+        не удерживаются. Если такой контейнер снова станет достижим, он
+        получит новый номер.
+        """
+        if len(self._seen) < len(self._objects):
+            self._objects = {key: entry for key, entry in self._objects.items() if key in self._seen}
+        self._seen = set()
+
+    def _carry(self, value: Any, old_value: Any, carry_containers: bool,
+               visited: Dict[int, HeapRef], heap: Dict[int, HeapObject]) -> Any:
+        """Снимок предыдущего шага для неизменившегося имени (_MISSING - снимать заново)"""
+        value_type = type(value)
+        if value_type in _ATOMIC_TYPE_SET or value_type in _STABLE_TYPES:
+            return old_value
+        if not carry_containers or type(old_value) is not HeapRef:
+            return _MISSING
+
+        key = id(value)
+        ref = visited.get(key)
+        if ref is not None:
+            return ref
+        entry = self._objects.get(key)
+        if entry is None or entry[1] is not old_value or not entry[3]:
+            return _MISSING
+        if self.max_items is not None:
+            if len(value) > self._budget:
+                return _MISSING
+            self._budget -= len(value)
+
+        visited[key] = old_value
+        self._unverified.add(key)
+        heap[old_value.object_id] = entry[2]
+        return old_value
+
+    def _snapshot_value(self, value: Any, visited: Dict[int, HeapRef], heap: Dict[int, HeapObject]) -> Any:
+        """Снимок одного значения: атом, строка, ссылка на объект или превью"""
+        if isinstance(value, ATOMIC_TYPES):
+            if self.max_items is not None:
+                return make_preview(value, self._budget) or value
+            return value
+        if not isinstance(value, CONTAINER_TYPES):
+            return str(value)
+
+        key = id(value)
+        ref = visited.get(key)
+        if ref is not None:
+            # Объект уже встречался на этом шаге (псевдоним или цикл)
+            if key in self._unverified:
+                # Перенесенный контейнер достижим через имя, которое могло его изменить
+                self._unverified.discard(key)
+                self._snapshot_contents(value, self._objects[key], visited, heap)
+            return ref
+
+        if self.max_items is not None:
+            preview = make_preview(value, self._budget)
+            if preview is not None:
+                return preview
+            self._budget -= len(value)
+
+        entry = self._objects.get(key)
+        if entry is None or entry[0] is not value:
+            entry = [value, HeapRef(self._next_object_id), None, False]
+            self._next_object_id += 1
+            self._objects[key] = entry
+        ref = entry[1]
+        visited[key] = ref
+        self._snapshot_contents(value, entry, visited, heap)
+        return ref
+
+    def _snapshot_contents(self, value: Any, entry: list, visited: Dict[int, HeapRef],
+                           heap: Dict[int, HeapObject]):
+        """Версия содержимого контейнера (новая, только если содержимое изменилось)"""
+        ref = entry[1]
+        version = entry[2]
+        if version is not None and _holds_same_atoms(value, version):
+            # Содержимое не менялось - обход элементов не нужен
+            heap[ref.object_id] = version
+            return
+
+        if isinstance(value, dict):
+            keys = tuple(self._snapshot_items(value.keys(), visited, heap))
+            items = tuple(self._snapshot_items(value.values(), visited, heap))
+            kind = 'dict'
+        else:
+            keys = ()
+            items = tuple(self._snapshot_items(value, visited, heap))
+            kind = 'list' if isinstance(value, list) else \
+                'tuple' if isinstance(value, tuple) else 'set'
+
+        if version is None or version.kind != kind \
+                or not _same_items(version.items, items) or not _same_items(version.keys, keys):
+            version = HeapObject(kind, items, keys)
+            entry[2] = version
+            entry[3] = _ATOMIC_TYPE_SET.issuperset(map(type, items)) \
+                and _ATOMIC_TYPE_SET.issuperset(map(type, keys))
+
+        heap[ref.object_id] = version
+
+    def _snapshot_items(self, values, visited: Dict[int, HeapRef], heap: Dict[int, HeapObject]):
+        """Снимок элементов контейнера"""
+        values = tuple(values)
+        if set(map(type, values)) <= _ATOMIC_TYPE_SET:
+            # Быстрый путь: только атомарные значения - копируем ссылки
+            return values
+        return (self._snapshot_value(item, visited, heap) for item in values)
+
+
+def _holds_same_atoms(value: Any, version: HeapObject) -> bool:
+    """
+    Быстрая проверка: содержимое контейнера не изменилось с версии
+
+    Элементы сравниваются с учетом типов (1, True и 1.0 - разное
+    содержимое). Живой контейнер никогда не содержит HeapRef, поэтому
+    версии с вложенными контейнерами эту проверку не проходят и
+    обходятся полностью.
+    """
+    if len(value) != len(version.items):
+        return False
+    if isinstance(value, dict):
+        return _same_items(version.items, tuple(value.values())) and _same_items(version.keys, tuple(value))
+    return _same_items(version.items, tuple(value))
+
+
+def _same_items(old: Tuple[Any, ...], new: Tuple[Any, ...]) -> bool:
+    """Совпадают ли элементы двух версий (с учетом типов)"""
+    if len(old) != len(new):
+        return False
+    if all(map(is_, old, new)):
+        return True
+    # Равные, но не те же объекты (например, заново вычисленные числа)
+    return old == new and list(map(type, old)) == list(map(type, new))
+
+
+def materialize_variables(variables: Dict[str, Any], heap: Dict[int, HeapObject],
+                          built: Optional[Dict[int, Any]] = None) -> Dict[str, Any]:
+    """
+    Восстановление значений переменных из снимка кучи
+
+    Псевдонимы восстанавливаются одним и тем же объектом, поэтому
+    две переменные, ссылавшиеся на один список, ссылаются на один список.
+    Общий словарь built сохраняет это и между несколькими пространствами имен.
+    """
+    if built is None:
+        built = {}
+    return {name: _materialize(value, heap, built) for name, value in variables.items()}
+
+
+def _materialize(value: Any, heap: Dict[int, HeapObject], built: Dict[int, Any]) -> Any:
+    """Восстановление одного значения"""
+    if not isinstance(value, HeapRef):
+        return value
+
+    result = built.get(value.object_id)
+    if result is not None:
+        return result
+
+    version = heap.get(value.object_id)
+    if version is None:
+        return f"<объект {value.object_id}>"
+
+    # Изменяемые контейнеры создаются до заполнения, чтобы поддержать циклы
+    if version.kind == 'list':
+        result = built[value.object_id] = []
+        result.extend(_materialize(item, heap, built) for item in version.items)
+    elif version.kind == 'dict':
+        result = built[value.object_id] = {}
+        for key, item in zip(version.keys, version.items):
+            result[_materialize(key, heap, built)] = _materialize(item, heap, built)
+    elif version.kind == 'set':
+        result = built[value.object_id] = set()
+        result.update(_materialize(item, heap, built) for item in version.items)
+    else:
+        result = built[value.object_id] = tuple(_materialize(item, heap, built) for item in version.items)
+    return result
@@ -0,0 +1,422 @@
+import time
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+from src.executor.code_executor import CodeExecutor, ExecutionStep, CancellationToken
+from src.executor.trace_store import TraceStore, to_picklable
+from src.testing.worker_pool import sandbox_context, hidden_main_module
+
+
+# Настройки исполнителя, которые передаются в рабочий процесс
+WORKER_SETTINGS = (
+    'trace_mode', 'keyframe_interval', 'hot_window', 'snapshot_mode', 'value_budget',
+    'liveness_capture', 'loop_mode', 'sample_interval', 'adaptive_sampling',
+    'max_snapshot_rate', 'max_steps', 'max_disk_steps', 'tracing_backend', 'step_window',
+    'track_memory', 'memory_budget', 'max_operations', 'inputs',
+)
+
+# Как часто проверять, жив ли рабочий процесс, пока от него нет сообщений (секунд)
+_POLL_INTERVAL = 0.1
+
+# Сколько первых шагов передается по каналу во время выполнения (при step_callback):
+# их можно смотреть, пока записываются остальные, а вся трассировка придет
+# через разделяемую память после завершения
+STREAMED_STEPS = 1000
+# Как часто рабочий процесс отправляет накопившиеся шаги (секунд)
+_STREAM_INTERVAL = 0.05
+
+
+class _SharedBlock(shared_memory.SharedMemory):
+    """
+    Блок разделяемой памяти трассировки в читающем процессе
+
+    Блок закрывает и удаляет хранилище (SharedRecords.close), освободив
+    представления столбцов. Сборщик мусора может вызвать финализатор
+    блока раньше, чем хранилища, - тогда закрывать блок еще рано.
+    """
+
+    def __del__(self):
+        pass
+
+
+class ProcessExecutor(CodeExecutor):
+    """
+    Исполнитель, выполняющий код пользователя в отдельном процессе
+
+    Трассировка (с глобальными security_manager и sys.settrace) идет в
+    рабочем процессе, поэтому зависание, аварийное завершение или
+    исчерпание памяти не затрагивают приложение - они записываются
+    шагом с ошибкой. Готовая трассировка передается через блок
+    разделяемой памяти: столбцы шагов читаются из него без копирования,
+    а записи изменений десериализуются только при обращении к шагам.
+
+    В режиме 'replay' контрольные точки (os.fork()) создаются в рабочем
+    процессе - он однопоточный, в отличие от приложения. После записи
+    процесс не завершается, а восстанавливает состояние шагов по
+    запросам get_step (_ReplaySession) до следующего запуска.
+
+    Если задан step_callback, первые STREAMED_STEPS шагов рабочий процесс
+    отправляет по каналу по мере записи (сериализуя их), и callback
+    вызывается для каждого пришедшего шага. Шаги после них становятся
+    доступны только по завершении выполнения. В режиме 'replay' шаги
+    не передаются: их состояние доступно только после записи.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Запасное ограничение времени рабочего процесса, секунд: выполнение
+        # ограничивают лимиты шагов и операций, время - только зависание
+        # внутри встроенных функций и передачу трассировки
+        self.timeout = 30.0
+        # Ограничение памяти рабочего процесса, байт (None - без ограничения; только Unix)
+        self.memory_limit: Optional[int] = 1024 * 1024 * 1024
+        # Сколько ждать остановки по запросу, прежде чем завершить процесс принудительно
+        # (код может долго выполняться без событий трассировки, например sorted())
+        self.cancel_grace = 2.0
+        # Рабочий процесс копируется из шаблона forkserver с загруженным
+        # исполнителем (как процессы тестов), где его нет - запускается через
+        # 'spawn'. Ни то, ни другое не копирует потоки Qt приложения
+        self._context = sandbox_context()
+        self._cancel_requested = False
+
+    def _new_trace_store(self):
+        """Пустое хранилище: шаги придут из рабочего процесса"""
+        self.steps.close()
+        self._close_replay()
+        self.steps = TraceStore(self.keyframe_interval, None, self.code_lines)
+
+    def _close_replay(self):
+        """Завершение рабочего процесса предыдущего запуска в режиме 'replay'"""
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
+
+    def _get_step_limit(self) -> int:
+        """Лимит шагов рабочего процесса (у режимов 'disk' и 'replay' - max_disk_steps)"""
+        if self.trace_mode in ('disk', 'replay'):
+            return self.max_disk_steps
+        return self.max_steps
+
+    def execute_step_by_step(self, code: str) -> bool:
+        """
+        Выполнение кода пошагово в рабочем процессе
+
+        Args:
+            code: Исходный код Python
+
+        Returns:
+            True если выполнение состоялось (в том числе с ошибкой)
+        """
+        self._close_replay()
+        cache_key = self._trace_cache_key(code)
+        if cache_key is not None and self._load_cached_trace(cache_key, code):
+            return True
+
+        # Проверка кода дешевая и не выполняет его - ошибки видны сразу
+        if not self.prepare_code(code):
+            return False
+        self._cancel_requested = False
+
+        self.is_running = True
+        try:
+            error = self._run_worker(code)
+        finally:
+            self.is_running = False
+
+        if error is not None:
+            # Доступны только шаги, пришедшие по каналу до сбоя
+            self.steps.append(ExecutionStep(
+                step_number=len(self.steps),
+                line_number=len(self.code_lines),
+                code_line="# Ошибка выполнения",
+                variables={},
+                event_type='exception',
+                error=error
+            ))
+            return True
+
+        if cache_key is not None and not self.cancelled:
+            self._save_cached_trace(cache_key)
+        return True
+
+    def cancel(self):
+        """Остановить выполнение в рабочем процессе (из другого потока)"""
+        self._cancel_requested = True
+        super().cancel()
+
+    def _run_worker(self, code: str) -> Optional[str]:
+        """
+        Запуск рабочего процесса и прием трассировки
+
+        Returns:
+            None при успехе, иначе описание сбоя рабочего процесса
+        """
+        settings = {name: getattr(self, name) for name in WORKER_SETTINGS}
+        connection, worker_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_connection, code, settings, self.memory_limit, self.cancel_token,
+                  self.step_callback is not None and self.trace_mode != 'replay'),
+            daemon=True)
+        with hidden_main_module():
+            process.start()
+        worker_connection.close()
+
+        deadline = time.monotonic() + self.timeout
+        block = None
+        keep_worker = False
+        try:
+            message = self._receive(connection, process, deadline, cancellable=True)
+            while message[0] == 'steps':
+                self._append_streamed(message[1])
+                message = self._receive(connection, process, deadline, cancellable=True)
+            if message[0] == 'layout':
+                layout = message[1]
+                block = _SharedBlock(create=True, size=max(1, layout['size']))
+                connection.send(block.name)
+                message = self._receive(connection, process, deadline)
+            if message[0] == 'error':
+                return message[1]
+
+            result = message[1]
+            self.steps.close()
+            self.steps = TraceStore.from_shared(block, layout, ExecutionStep)
+            block = None  # Теперь блоком владеет хранилище
+            self.window_truncated = result['window_truncated']
+            self.output_before_window = result['output_before_window']
+            self._skipped_events = result['skipped_events']
+            self._sample_every = result['sample_every']
+            self.active_backend = result['active_backend']
+            self.cancelled = result['cancelled']
+            self.peak_memory = result['peak_memory']
+            self._line_hits = result['line_hits']
+            self._line_times = result['line_times']
+            if result['replay']:
+                # Рабочий процесс остается и восстанавливает шаги по запросам
+                self.replay = _ReplaySession(process, connection, self.timeout)
+                keep_worker = True
+            return None
+        finally:
+            if block is not None:
+                block.close()
+                block.unlink()
+            if not keep_worker:
+                connection.close()
+                if process.is_alive():
+                    process.kill()
+                process.join()
+
+    def _append_streamed(self, steps):
+        """Шаги, присланные рабочим процессом во время выполнения"""
+        for step in steps:
+            self.steps.append(step)
+            if self.step_callback:
+                self.step_callback(step)
+
+    def _receive(self, connection, process, deadline: float, cancellable: bool = False) -> Tuple[str, Any]:
+        """
+        Ожидание сообщения рабочего процесса с контролем времени и аварийного завершения
+
+        Args:
+            cancellable: Завершать ли процесс, не остановившийся за cancel_grace
+                после запроса остановки (пока он выполняет код, а не передает шаги)
+        """
+        cancel_deadline = None
+        while True:
+            if cancellable and self._cancel_requested:
+                # Рабочий процесс сбрасывает токен при подготовке - запрос повторяется
+                self.cancel_token.cancel()
+                if cancel_deadline is None:
+                    cancel_deadline = time.monotonic() + self.cancel_grace
+                elif time.monotonic() > cancel_deadline:
+                    process.kill()
+                    self.cancelled = True
+                    return 'error', "Выполнение остановлено: программа не ответила на запрос остановки"
+            if connection.poll(_POLL_INTERVAL):
+                try:
+                    return connection.recv()
+                except (EOFError, OSError):
+                    break
+            if not process.is_alive():
+                # Сообщение могло прийти перед самым завершением
+                if connection.poll(0):
+                    continue
+                break
+            if time.monotonic() > deadline:
+                process.kill()
+                return 'error', f"Превышено время выполнения ({self.timeout:g} с)"
+
+        process.join()
+        return 'error', f"Процесс выполнения аварийно завершился (код {process.exitcode})"
+
+
+def _worker_main(connection, code: str, settings: Dict[str, Any], memory_limit: Optional[int],
+                 cancel_token: CancellationToken, stream_steps: bool = False):
+    """Точка входа рабочего процесса: трассировка и передача шагов через разделяемую память"""
+    _limit_memory(memory_limit)
+
+    executor = CodeExecutor()
+    for name, value in settings.items():
+        setattr(executor, name, value)
+    executor.cancel_token = cancel_token
+    executor.trace_cache = None
+    if stream_steps:
+        executor.set_step_callback(_StepStreamer(connection))
+
+    try:
+        executor.execute_step_by_step(code)
+        executor.set_step_callback(None)
+        chunks, layout = executor.steps.shared_layout()
+        connection.send(('layout', layout))
+
+        # Блок создает родительский процесс: он же его и удалит
+        block = shared_memory.SharedMemory(name=connection.recv())
+        try:
+            position = 0
+            for chunk in chunks:
+                data = memoryview(chunk).cast('B')
+                block.buf[position:position + len(data)] = data
+                position += len(data)
+                data.release()
+        finally:
+            block.close()
+
+        connection.send(('done', {
+            'window_truncated': executor.window_truncated,
+            'output_before_window': executor.output_before_window,
+            'skipped_events': executor._skipped_events,
+            'sample_every': executor._sample_every,
+            'active_backend': executor.active_backend,
+            'cancelled': executor.cancelled,
+            'peak_memory': executor.peak_memory,
+            'line_hits': executor._line_hits,
+            'line_times': executor._line_times,
+            'replay': executor.replay is not None,
+        }))
+        if executor.replay is not None:
+            _serve_replay(connection, executor.replay)
+    except BaseException as e:
+        try:
+            connection.send(('error', f"{type(e).__name__}: {e}"))
+        except Exception:
+            pass
+    finally:
+        executor.steps.close()
+        connection.close()
+
+
+def _serve_replay(connection, replay):
+    """Восстановление шагов по запросам читающего процесса (режим 'replay')"""
+    try:
+        while True:
+            command, step_index = connection.recv()
+            if command != 'snapshot':
+                break
+            snapshot = replay.snapshot(step_index)
+            try:
+                connection.send(snapshot)
+            except Exception:
+                connection.send(to_picklable(snapshot))
+    except (EOFError, OSError):
+        pass
+    finally:
+        replay.close()
+
+
+class _ReplaySession:
+    """
+    Контрольные точки в рабочем процессе режима 'replay'
+
+    Заменяет CheckpointReplayEngine в читающем процессе: состояние шага
+    восстанавливает рабочий процесс, запросы к нему идут по каналу.
+    """
+
+    is_replaying = False
+
+    def __init__(self, process, connection, timeout: float):
+        self.process = process
+        self.connection = connection
+        self.timeout = timeout
+        # get_step может вызываться из разных потоков (GUI и выполнение)
+        self._lock = threading.Lock()
+
+    def snapshot(self, step_index: int) -> Optional[Tuple[Any, Any]]:
+        """
+        Точное состояние на шаге step_index
+
+        Returns:
+            Кортеж (переменные, кадры, куча) или None, если восстановить не удалось
+        """
+        with self._lock:
+            if self.connection is None:
+                return None
+            try:
+                self.connection.send(('snapshot', step_index))
+                if self.connection.poll(self.timeout):
+                    return self.connection.recv()
+            except (EOFError, OSError):
+                pass
+            # Ответа нет - рабочий процесс больше не используется
+            self._stop()
+            return None
+
+    def close(self):
+        """Завершение рабочего процесса"""
+        with self._lock:
+            if self.connection is None:
+                return
+            try:
+                self.connection.send(('close', None))
+            except OSError:
+                pass
+            self._stop()
+
+    def _stop(self):
+        self.connection.close()
+        self.connection = None
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class _StepStreamer:
+    """Отправка первых STREAMED_STEPS шагов из рабочего процесса пачками"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.pending = []
+        self.sent = 0
+        self.last_send = 0.0
+
+    def __call__(self, step):
+        if self.sent + len(self.pending) >= STREAMED_STEPS:
+            return
+        self.pending.append(step)
+        now = time.monotonic()
+        # Первый шаг уходит сразу, остальные - не чаще раза в _STREAM_INTERVAL
+        if now - self.last_send >= _STREAM_INTERVAL or self.sent + len(self.pending) == STREAMED_STEPS:
+            self.flush()
+            self.last_send = now
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            self.connection.send(('steps', self.pending))
+        except Exception:
+            self.connection.send(('steps', [to_picklable(step) for step in self.pending]))
+        self.sent += len(self.pending)
+        self.pending = []
+
+
+def _limit_memory(limit: Optional[int]):
+    """Ограничение адресного пространства рабочего процесса"""
+    if limit is None:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
@@ -0,0 +1,285 @@
+import os
+import sys
+import pickle
+import select
+import signal
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from src.executor.trace_store import to_picklable
+
+
+# Формат заголовков в каналах: номер шага и длина результата
+_COMMAND = struct.Struct('!q')
+_LENGTH = struct.Struct('!Q')
+
+
+class Checkpoint:
+    """Приостановленный процесс-копия выполнения на определенном шаге"""
+
+    def __init__(self, step_index: int, pid: int, command_fd: int, result_fd: int):
+        self.step_index = step_index
+        self.pid = pid
+        self.command_fd = command_fd  # Канал команд: номер шага для воспроизведения
+        self.result_fd = result_fd  # Канал результатов: снимок состояния
+
+
+class CheckpointReplayEngine:
+    """
+    Воспроизведение выполнения от контрольных точек (только Linux)
+
+    При записи сохраняется лишь последовательность строк, а каждые
+    interval шагов выполнение клонируется через os.fork() и клон
+    приостанавливается. Чтобы показать шаг N, ближайший предшествующий
+    клон порождает еще одну копию, которая продолжает выполнение до
+    шага N, снимает точное состояние и передает его по каналу.
+
+    os.fork() копирует только вызвавший поток, поэтому контрольные точки
+    создаются лишь в однопоточном процессе (процесс ProcessExecutor или
+    командная строка). Список точек защищен блокировкой: snapshot() может
+    вызываться из другого потока, пока запись добавляет и прореживает точки.
+    """
+
+    def __init__(self, interval: int = 100, max_checkpoints: int = 32, timeout: float = 10.0):
+        self.interval = max(1, interval)
+        self.max_checkpoints = max(2, max_checkpoints)
+        self.timeout = timeout
+
+        self.checkpoints: List[Checkpoint] = []
+        self._lock = threading.Lock()
+
+        # Заполняются только в процессе, воспроизводящем выполнение
+        self.replay_target: Optional[int] = None
+        self._replay_result_fd: Optional[int] = None
+
+        # Недавно восстановленные шаги
+        self._cache: "OrderedDict[int, Tuple[Any, Any]]" = OrderedDict()
+        self._cache_size = 64
+
+    @staticmethod
+    def is_supported() -> bool:
+        """
+        Доступно ли клонирование процесса
+
+        Нужны Linux и единственный поток в процессе: копия процесса с
+        другими потоками (например, Qt) может зависнуть на их блокировках.
+        """
+        return hasattr(os, 'fork') and sys.platform.startswith('linux') \
+            and threading.active_count() == 1
+
+    @property
+    def is_replaying(self) -> bool:
+        """Выполняется ли текущий процесс как воспроизведение до шага"""
+        return self.replay_target is not None
+
+    def maybe_checkpoint(self, step_index: int):
+        """
+        Создание контрольной точки перед записью шага step_index
+
+        В записывающем процессе возвращается сразу. В процессе
+        воспроизведения возвращается с установленным replay_target,
+        после чего выполнение продолжается до нужного шага.
+        """
+        if self.is_replaying:
+            return
+        with self._lock:
+            if self.checkpoints and step_index - self.checkpoints[-1].step_index < self.interval:
+                return
+
+            command_read, command_write = os.pipe()
+            result_read, result_write = os.pipe()
+            pid = os.fork()
+
+            if pid:
+                # Записывающий процесс
+                os.close(command_read)
+                os.close(result_write)
+                self.checkpoints.append(Checkpoint(step_index, pid, command_write, result_read))
+                if len(self.checkpoints) > self.max_checkpoints:
+                    self._thin_out()
+                return
+
+        # Процесс контрольной точки: блокировка скопирована захваченной
+        self._lock = threading.Lock()
+        # Чужие каналы ему не нужны
+        os.close(command_write)
+        os.close(result_read)
+        for checkpoint in self.checkpoints:
+            os.close(checkpoint.command_fd)
+            os.close(checkpoint.result_fd)
+        self.checkpoints = []
+        self._cache.clear()
+
+        self._serve_checkpoint(command_read, result_write)
+
+    def _serve_checkpoint(self, command_fd: int, result_fd: int):
+        """Ожидание команд в процессе контрольной точки"""
+        try:
+            while True:
+                data = _read_exact(command_fd, _COMMAND.size)
+                if data is None:
+                    break
+                target, = _COMMAND.unpack(data)
+                if target < 0:
+                    break
+
+                replay_pid = os.fork()
+                if replay_pid == 0:
+                    # Копия продолжает выполнение с этой точки до шага target
+                    os.close(command_fd)
+                    _limit_cpu_time(self.timeout)
+                    self.replay_target = target
+                    self._replay_result_fd = result_fd
+                    return
+                os.waitpid(replay_pid, 0)
+        except BaseException:
+            pass
+        os._exit(0)
+
+    def deliver(self, snapshot: Any):
+        """Передача снимка шага записывающему процессу и завершение копии"""
+        try:
+            try:
+                data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = pickle.dumps(to_picklable(snapshot), protocol=pickle.HIGHEST_PROTOCOL)
+            _write_all(self._replay_result_fd, _LENGTH.pack(len(data)) + data)
+        finally:
+            os._exit(0)
+
+    def abort_replay(self):
+        """Завершение копии, не дошедшей до нужного шага"""
+        try:
+            _write_all(self._replay_result_fd, _LENGTH.pack(0))
+        finally:
+            os._exit(0)
+
+    def snapshot(self, step_index: int) -> Optional[Tuple[Any, Any]]:
+        """
+        Точное состояние на шаге step_index
+
+        Returns:
+            Кортеж (переменные, куча) или None, если восстановить не удалось
+        """
+        # Точка не должна быть удалена прореживанием, пока идет обмен по ее каналам
+        with self._lock:
+            return self._snapshot(step_index)
+
+    def _snapshot(self, step_index: int) -> Optional[Tuple[Any, Any]]:
+        """Восстановление шага (под блокировкой списка точек)"""
+        if step_index in self._cache:
+            self._cache.move_to_end(step_index)
+            return self._cache[step_index]
+
+        checkpoint = None
+        for candidate in self.checkpoints:
+            if candidate.step_index <= step_index:
+                checkpoint = candidate
+        if checkpoint is None:
+            return None
+
+        try:
+            _write_all(checkpoint.command_fd, _COMMAND.pack(step_index))
+            header = _read_exact(checkpoint.result_fd, _LENGTH.size, self.timeout)
+            if header is None:
+                self._discard_checkpoint(checkpoint)
+                return None
+            length, = _LENGTH.unpack(header)
+            if length == 0:
+                # Копия не дошла до нужного шага
+                return None
+            data = _read_exact(checkpoint.result_fd, length, self.timeout)
+            if data is None:
+                self._discard_checkpoint(checkpoint)
+                return None
+            result = pickle.loads(data)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Ошибка воспроизведения шага {step_index}: {e}")
+            return None
+
+        self._cache[step_index] = result
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _thin_out(self):
+        """Прореживание контрольных точек: остается каждая вторая"""
+        kept = []
+        for position, checkpoint in enumerate(self.checkpoints):
+            if position % 2 == 0:
+                kept.append(checkpoint)
+            else:
+                self._stop_checkpoint(checkpoint)
+        self.checkpoints = kept
+        self.interval *= 2
+
+    def _discard_checkpoint(self, checkpoint: Checkpoint):
+        """Удаление точки, ответ которой не пришел вовремя: ее канал рассинхронизирован"""
+        self.checkpoints.remove(checkpoint)
+        self._stop_checkpoint(checkpoint, force=True)
+
+    def _stop_checkpoint(self, checkpoint: Checkpoint, force: bool = False):
+        """Завершение процесса контрольной точки"""
+        try:
+            if force:
+                os.kill(checkpoint.pid, signal.SIGKILL)
+            else:
+                _write_all(checkpoint.command_fd, _COMMAND.pack(-1))
+        except OSError:
+            pass
+        for fd in (checkpoint.command_fd, checkpoint.result_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        try:
+            os.waitpid(checkpoint.pid, 0)
+        except ChildProcessError:
+            pass
+
+    def close(self):
+        """Завершение всех процессов контрольных точек"""
+        if self.is_replaying:
+            return
+        with self._lock:
+            for checkpoint in self.checkpoints:
+                self._stop_checkpoint(checkpoint)
+            self.checkpoints = []
+            self._cache.clear()
+
+
+def _limit_cpu_time(seconds: float):
+    """Ограничение процессорного времени копии, чтобы она не осталась висеть"""
+    try:
+        import resource
+        limit = int(seconds) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _write_all(fd: int, data: bytes):
+    """Запись всех данных в канал"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _read_exact(fd: int, size: int, timeout: Optional[float] = None) -> Optional[bytes]:
+    """Чтение ровно size байт из канала (None при закрытии канала или таймауте)"""
+    chunks = []
+    remaining = size
+    while remaining:
+        if timeout is not None:
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                return None
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
@@ -0,0 +1,194 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+from src.executor.trace_store import to_picklable
+
+
+# Версия формата записей: меняется при изменении структуры шагов,
+# чтобы старые записи на диске не подхватывались
+CACHE_FORMAT_VERSION = 5
+
+
+class TraceCache:
+    """
+    Кэш готовых трассировок с адресацией по содержимому
+
+    Ключ - хэш SHA-256 от кода, входных данных и настроек исполнителя,
+    поэтому повторный запуск неизмененного кода сводится к поиску.
+    Записи хранятся сериализованными: в памяти по принципу LRU с
+    ограничением по размеру, а вытесненные - в каталоге на диске (если задан).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        # Ключ -> сериализованная запись
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # Статистика обращений
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(code: str, inputs: Sequence[str] = (), settings: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Ключ записи кэша
+
+        Args:
+            code: Исходный код
+            inputs: Входные данные программы (строки для input())
+            settings: Настройки исполнителя, влияющие на трассировку
+
+        Returns:
+            Шестнадцатеричный хэш SHA-256
+        """
+        payload = json.dumps({
+            'version': CACHE_FORMAT_VERSION,
+            'code': code,
+            'inputs': list(inputs),
+            'settings': settings or {},
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Получение записи по ключу (None если записи нет)"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            else:
+                data = self._read_disk(key)
+                if data is not None:
+                    # Запись с диска снова становится горячей
+                    self._store(key, data)
+
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        try:
+            return pickle.loads(data)
+        except Exception as e:
+            print(f"Ошибка чтения кэша трассировок: {e}")
+            self.discard(key)
+            return None
+
+    def put(self, key: str, entry: Any):
+        """Сохранение записи в кэше"""
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Объекты из кода пользователя заменяются строками
+            data = pickle.dumps(to_picklable(entry), protocol=pickle.HIGHEST_PROTOCOL)
+
+        if len(data) > self.max_bytes:
+            # Слишком большая трассировка вытеснила бы весь кэш
+            return
+
+        with self._lock:
+            self._store(key, data)
+
+    def _store(self, key: str, data: bytes):
+        """Помещение записи в память с вытеснением старых записей на диск"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = data
+        self._size += len(data)
+
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            old_key, old_data = self._entries.popitem(last=False)
+            self._size -= len(old_data)
+            self._write_disk(old_key, old_data)
+
+    def _disk_path(self, key: str) -> str:
+        """Путь к файлу записи на диске"""
+        return os.path.join(self.disk_dir, f"{key}.trace")
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        """Чтение записи с диска"""
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Время доступа для вытеснения по давности
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        """Запись вытесненной записи на диск"""
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            temp_path = self._disk_path(key) + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._disk_path(key))
+            self._trim_disk()
+        except OSError as e:
+            print(f"Ошибка записи кэша трассировок на диск: {e}")
+
+    def _trim_disk(self):
+        """Удаление самых давних записей, если каталог превысил лимит"""
+        files = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.trace'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def discard(self, key: str):
+        """Удаление записи из всех уровней кэша"""
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is not None:
+                self._size -= len(data)
+            if self.disk_dir:
+                try:
+                    os.remove(self._disk_path(key))
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Очистка кэша в памяти (записи на диске сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Глобальный экземпляр кэша трассировок
+trace_cache = TraceCache()
@@ -0,0 +1,525 @@
+import mmap
+import pickle
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+
+# Маркер отсутствующего значения (None может быть значением переменной)
+_MISSING = object()
+
+
+# Типы событий шага: в столбце хранится номер типа
+EVENT_TYPES = ('line', 'call', 'return', 'exception')
+_EVENT_CODES = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+
+
+class TraceStore:
+    """
+    Хранилище шагов выполнения в столбцах с дельта-кодированием состояния
+
+    Номер строки, тип события, функция и счетчики шага хранятся в
+    типизированных массивах array, строки кода - один раз на программу,
+    а редкие поля (ошибки, итерации циклов) - по номерам шагов. Объекты
+    шагов создаются только при обращении к ним.
+
+    Состояние шага хранит только изменившиеся переменные (а также версии
+    объектов кучи и кадры функций), а каждые keyframe_interval шагов сохраняется полный набор
+    (ключевой кадр). Полное состояние восстанавливается при обращении к шагу.
+    """
+
+    # Поля шага, которые хранятся в виде изменений относительно предыдущего шага
+    DELTA_FIELDS = ('variables', 'heap', 'frames')
+
+    # Типизированные столбцы шагов
+    _COLUMNS = ('_line_numbers', '_event_types', '_functions', '_event_indexes', '_skipped', '_memory')
+
+    def __init__(self, keyframe_interval: int = 50, records: Optional[Any] = None,
+                 code_lines: Optional[List[str]] = None):
+        self.keyframe_interval = max(1, keyframe_interval)
+
+        # Столбцы шагов
+        self._line_numbers = array('I')
+        self._event_types = array('B')
+        self._functions = array('H')  # Номер имени функции в _function_names (0 - модуль)
+        self._event_indexes = array('I')
+        self._skipped = array('I')
+        self._memory = array('Q')  # Байт памяти кода пользователя (0 без учета памяти)
+
+        # Имена функций и строки кода общие для всех шагов
+        self._function_names: List[Optional[str]] = [None]
+        self._function_codes: Dict[Optional[str], int] = {None: 0}
+        self._code_lines = [line.strip() for line in code_lines or ()]
+
+        # Редкие поля: номер шага -> значение
+        self._code_line_overrides: Dict[int, str] = {}
+        self._errors: Dict[int, str] = {}
+        self._iterations: Dict[int, Any] = {}
+
+        # Класс шагов запоминается при добавлении: хранилище не зависит от исполнителя
+        self._step_class = None
+
+        # Изменения состояния по шагам: кортеж изменений по полям DELTA_FIELDS
+        # (и исчезнувших ключей, если они есть) или None, если состояние не менялось.
+        # По умолчанию список в памяти, либо SpillLog для записи на диск
+        self._records = records if records is not None else []
+
+        # Полное состояние последнего записанного шага по полям
+        self.head: Dict[str, Dict[Any, Any]] = {field: {} for field in self.DELTA_FIELDS}
+
+        # Вывод print() хранится отдельно, чтобы не читать все шаги ради него
+        self._output_steps: List[int] = []
+        self._outputs: List[str] = []
+
+        # Кэш последнего восстановленного состояния для быстрой навигации
+        self._cached_index = -1
+        self._cached_state: Dict[str, Dict[Any, Any]] = {}
+
+    def append(self, step):
+        """Добавление шага с полным состоянием"""
+        index = len(self._line_numbers)
+        is_keyframe = index % self.keyframe_interval == 0
+        changes = {}
+        removed = {}
+
+        for field in self.DELTA_FIELDS:
+            state = getattr(step, field) or {}
+            if not state and not self.head[field]:
+                # Поле пустое и было пустым (например, кадры функций на уровне модуля)
+                continue
+            if is_keyframe:
+                # Ключевой кадр - храним словарь целиком (значения общие с дельтами)
+                changes[field] = dict(state)
+            else:
+                head = self.head[field]
+                # Неизменившиеся значения приходят теми же объектами, что и в head
+                delta = {key: value for key, value in state.items()
+                         if head.get(key, _MISSING) is not value}
+                if delta:
+                    changes[field] = delta
+                gone = tuple(key for key in head if key not in state)
+                if gone:
+                    removed[field] = gone
+            self.head[field] = state
+
+        if removed:
+            self._records.append(tuple(changes.get(field) for field in self.DELTA_FIELDS) + (removed,))
+        elif changes:
+            self._records.append(tuple(changes.get(field) for field in self.DELTA_FIELDS))
+        else:
+            self._records.append(None)
+
+        if self._step_class is None:
+            self._step_class = type(step)
+        self._line_numbers.append(step.line_number)
+        self._event_types.append(_EVENT_CODES[step.event_type])
+        self._functions.append(self._function_code(step.function_name))
+        self._event_indexes.append(step.event_index)
+        self._skipped.append(step.skipped)
+        self._memory.append(step.memory)
+        if step.code_line != self._code_line(step.line_number):
+            self._code_line_overrides[index] = step.code_line
+        if step.error:
+            self._errors[index] = step.error
+        if step.iteration is not None:
+            self._iterations[index] = step.iteration
+
+        if step.output:
+            self._output_steps.append(index)
+            self._outputs.append(step.output)
+
+    def _function_code(self, function_name: Optional[str]) -> int:
+        """Номер имени функции в таблице имен"""
+        code = self._function_codes.get(function_name)
+        if code is None:
+            code = self._function_codes[function_name] = len(self._function_names)
+            self._function_names.append(function_name)
+        return code
+
+    def _code_line(self, line_number: int) -> str:
+        """Строка кода без отступов по номеру строки"""
+        if 1 <= line_number <= len(self._code_lines):
+            return self._code_lines[line_number - 1]
+        return ""
+
+    def _step_output(self, index: int) -> str:
+        """Вывод print(), записанный на шаге"""
+        position = bisect_left(self._output_steps, index)
+        if position < len(self._output_steps) and self._output_steps[position] == index:
+            return self._outputs[position]
+        return ""
+
+    def _build_step(self, index: int, variables, heap, frames):
+        """Создание объекта шага по столбцам"""
+        return self._step_class(
+            step_number=index,
+            line_number=self._line_numbers[index],
+            code_line=self._code_line_overrides.get(index) or self._code_line(self._line_numbers[index]),
+            variables=variables,
+            event_type=EVENT_TYPES[self._event_types[index]],
+            function_name=self._function_names[self._functions[index]],
+            error=self._errors.get(index),
+            output=self._step_output(index),
+            heap=heap,
+            frames=frames,
+            iteration=self._iterations.get(index),
+            skipped=self._skipped[index],
+            event_index=self._event_indexes[index],
+            memory=self._memory[index]
+        )
+
+    def get_record(self, index: int):
+        """Получение шага в сохраненном виде (только изменения состояния)"""
+        record = self._records[index]
+        if record is None:
+            return self._build_step(index, {}, None, None)
+        variables, heap, frames = record[:3]
+        return self._build_step(index, variables or {}, heap, frames)
+
+    def get_state(self, index: int) -> Dict[str, Dict[Any, Any]]:
+        """Восстановление полного состояния шага по полям DELTA_FIELDS"""
+        keyframe = index - index % self.keyframe_interval
+
+        if keyframe <= self._cached_index <= index:
+            # Продолжаем от ранее восстановленного состояния
+            start = self._cached_index
+            state = {field: dict(values) for field, values in self._cached_state.items()}
+        else:
+            start = keyframe
+            record = self._records[keyframe]
+            state = {field: dict(record[position] or {}) if record is not None else {}
+                     for position, field in enumerate(self.DELTA_FIELDS)}
+
+        removed_position = len(self.DELTA_FIELDS)
+        for i in range(start + 1, index + 1):
+            record = self._records[i]
+            if record is None:
+                continue
+            removed = record[removed_position] if len(record) > removed_position else None
+            for position, field in enumerate(self.DELTA_FIELDS):
+                values = state[field]
+                if removed and field in removed:
+                    for key in removed[field]:
+                        values.pop(key, None)
+                if record[position]:
+                    values.update(record[position])
+
+        self._cached_index = index
+        self._cached_state = state
+        return {field: dict(values) for field, values in state.items()}
+
+    def get_variables(self, index: int) -> Dict[str, Any]:
+        """Восстановление полного набора переменных на шаге"""
+        return self.get_state(index)['variables']
+
+    def get_output_until(self, index: int) -> str:
+        """Вывод программы, накопленный к шагу index включительно"""
+        count = bisect_right(self._output_steps, index)
+        return '\n'.join(self._outputs[:count])
+
+    def append_output(self, text: str):
+        """Вывод, напечатанный после последнего записанного шага, - относится к нему"""
+        index = len(self._line_numbers) - 1
+        if self._output_steps and self._output_steps[-1] == index:
+            self._outputs[-1] += '\n' + text
+        else:
+            self._output_steps.append(index)
+            self._outputs.append(text)
+
+    def has_errors(self) -> bool:
+        """Есть ли среди шагов шаг с ошибкой"""
+        return bool(self._errors)
+
+    def close(self):
+        """Освобождение ресурсов хранилища (файла на диске)"""
+        if hasattr(self._records, 'close'):
+            self._records.close()
+
+    def shared_layout(self) -> Tuple[List[Any], Dict[str, Any]]:
+        """
+        Раскладка хранилища для передачи через разделяемую память
+
+        Столбцы и записи изменений (сериализованные по одной) идут подряд
+        в одном блоке, а остальные поля - в небольшом словаре раскладки.
+
+        Returns:
+            Кортеж (части блока по порядку, словарь раскладки для from_shared)
+        """
+        chunks = []
+        size = 0
+
+        def add(data) -> int:
+            nonlocal size
+            offset = size
+            chunks.append(data)
+            size += len(data) * getattr(data, 'itemsize', 1)
+            # Выравнивание следующей части по 8 байт
+            padding = -size % 8
+            if padding:
+                chunks.append(bytes(padding))
+                size += padding
+            return offset
+
+        columns = {name: (add(getattr(self, name)), len(getattr(self, name)), getattr(self, name).typecode)
+                   for name in self._COLUMNS}
+
+        if isinstance(self._records, SpillLog):
+            # Записи на диске уже сериализованы - копируем их как есть
+            record_offsets, data = self._records.raw_data()
+        else:
+            record_offsets = array('Q')
+            blobs = []
+            position = 0
+            for record in self._records:
+                try:
+                    blob = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    blob = pickle.dumps(to_picklable(record), protocol=pickle.HIGHEST_PROTOCOL)
+                record_offsets.append(position)
+                blobs.append(blob)
+                position += len(blob)
+            record_offsets.append(position)
+            data = b''.join(blobs)
+        offsets_start = add(record_offsets)
+        records_start = add(data)
+
+        layout = {
+            'size': size,
+            'columns': columns,
+            'records': (offsets_start, len(record_offsets), records_start),
+            'keyframe_interval': self.keyframe_interval,
+            'function_names': self._function_names,
+            'code_lines': self._code_lines,
+            'code_line_overrides': self._code_line_overrides,
+            'errors': self._errors,
+            'iterations': to_picklable(self._iterations),
+            'output_steps': self._output_steps,
+            'outputs': self._outputs,
+        }
+        return chunks, layout
+
+    @classmethod
+    def from_shared(cls, shared_memory, layout: Dict[str, Any], step_class) -> 'TraceStore':
+        """
+        Хранилище только для чтения поверх блока разделяемой памяти
+
+        Столбцы читаются прямо из блока без копирования, записи изменений
+        десериализуются при обращении к шагам. Блок освобождается close().
+
+        Args:
+            shared_memory: Блок multiprocessing.shared_memory.SharedMemory
+            layout: Словарь раскладки из shared_layout
+            step_class: Класс шагов (ExecutionStep)
+        """
+        records = SharedRecords(shared_memory, *layout['records'])
+        store = cls(layout['keyframe_interval'], records)
+        for name, (offset, count, typecode) in layout['columns'].items():
+            setattr(store, name, records.view(offset, count, typecode))
+        store._function_names = layout['function_names']
+        store._function_codes = {name: code for code, name in enumerate(store._function_names)}
+        store._code_lines = layout['code_lines']
+        store._code_line_overrides = layout['code_line_overrides']
+        store._errors = layout['errors']
+        store._iterations = layout['iterations']
+        store._output_steps = layout['output_steps']
+        store._outputs = layout['outputs']
+        store._step_class = step_class
+        return store
+
+    def __getstate__(self):
+        # Столбцы из разделяемой памяти и записи на диске сериализуются копией
+        state = self.__dict__.copy()
+        for name in self._COLUMNS:
+            column = state[name]
+            if isinstance(column, memoryview):
+                state[name] = array(column.format, column.tobytes())
+        if not isinstance(self._records, list):
+            state['_records'] = list(self._records)
+        return state
+
+    def __len__(self) -> int:
+        return len(self._line_numbers)
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Шаг выполнения вне диапазона")
+        state = self.get_state(index)
+        return self._build_step(index, state['variables'], state['heap'] or None, state['frames'] or None)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+class SpillLog:
+    """
+    Журнал записей трассировки на диске
+
+    Записи дописываются в конец временного файла, читаются через
+    memory-mapping, а в памяти остается только небольшое окно
+    последних записанных и прочитанных записей.
+    """
+
+    def __init__(self, hot_window: int = 256):
+        self.hot_window = max(1, hot_window)
+
+        self._file = tempfile.TemporaryFile(prefix='codevisualizer_trace_')
+        self._offsets = array('Q')  # Смещение начала каждой записи в файле
+        self._size = 0
+
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+
+        # Горячее окно: индекс записи -> запись
+        self._hot: "OrderedDict[int, Any]" = OrderedDict()
+
+        # Запись и чтение могут идти из разных потоков (исполнитель и GUI)
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        """Добавление записи в конец журнала"""
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Объекты из кода пользователя (его классы, функции) не сериализуются
+            data = pickle.dumps(to_picklable(entry), protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            self._file.write(data)
+            self._offsets.append(self._size)
+            self._size += len(data)
+            self._remember(len(self._offsets) - 1, entry)
+
+    def _remember(self, index: int, entry):
+        """Помещение записи в горячее окно"""
+        self._hot[index] = entry
+        self._hot.move_to_end(index)
+        while len(self._hot) > self.hot_window:
+            self._hot.popitem(last=False)
+
+    def _ensure_mapped(self, end: int):
+        """Отображение файла в память так, чтобы была доступна позиция end"""
+        if self._mmap is not None and end <= self._mapped_size:
+            return
+        self._file.flush()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_size = self._size
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self._offsets)
+        with self._lock:
+            entry = self._hot.get(index, _MISSING)
+            if entry is not _MISSING:
+                return entry
+
+            start = self._offsets[index]
+            end = self._offsets[index + 1] if index + 1 < len(self._offsets) else self._size
+            self._ensure_mapped(end)
+            entry = pickle.loads(self._mmap[start:end])
+            self._remember(index, entry)
+            return entry
+
+    def raw_data(self) -> Tuple[array, bytes]:
+        """Смещения записей (с концом последней) и все сериализованные записи подряд"""
+        with self._lock:
+            offsets = array('Q', self._offsets)
+            offsets.append(self._size)
+            if not self._size:
+                return offsets, b''
+            self._ensure_mapped(self._size)
+            return offsets, self._mmap[:self._size]
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def close(self):
+        """Закрытие и удаление файла журнала"""
+        with self._lock:
+            self._hot.clear()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._file.close()
+
+
+class SharedRecords:
+    """
+    Записи трассировки в блоке разделяемой памяти (только чтение)
+
+    Блок создан процессом, который читает трассировку, и заполнен
+    процессом, который ее записал. Записи десериализуются прямо из
+    блока, столбцы хранилища - представления memoryview того же блока.
+    """
+
+    def __init__(self, shared_memory, offsets_start: int, count: int, records_start: int):
+        self._shared_memory = shared_memory
+        self._views: List[memoryview] = []
+        self._offsets = self.view(offsets_start, count, 'Q')
+        self._records_start = records_start
+
+    def view(self, offset: int, count: int, typecode: str) -> memoryview:
+        """Представление части блока как массива чисел без копирования"""
+        itemsize = array(typecode).itemsize
+        view = self._shared_memory.buf[offset:offset + count * itemsize].cast(typecode)
+        self._views.append(view)
+        return view
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += len(self)
+        start = self._records_start + self._offsets[index]
+        end = self._records_start + self._offsets[index + 1]
+        return pickle.loads(self._shared_memory.buf[start:end])
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    def close(self):
+        """Освобождение и удаление блока разделяемой памяти"""
+        if self._shared_memory is None:
+            return
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._shared_memory.close()
+        try:
+            self._shared_memory.unlink()
+        except FileNotFoundError:
+            pass
+        self._shared_memory = None
+
+    def __del__(self):
+        # Блок принадлежит читающему процессу: без close() он остался бы в системе
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def to_picklable(value: Any) -> Any:
+    """Замена несериализуемых значений их строковым представлением"""
+    if isinstance(value, (list, tuple, set)):
+        return type(value)(to_picklable(item) for item in value)
+    if isinstance(value, dict):
+        return {key: to_picklable(item) for key, item in value.items()}
+    if hasattr(value, '__dataclass_fields__'):
+        return replace(value, **{name: to_picklable(getattr(value, name))
+                                 for name in value.__dataclass_fields__})
+    try:
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return value
+    except Exception:
+        return str(value)
@@ -0,0 +1,126 @@
+import math
+import reprlib
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+
+# Пороги, после которых атомарное значение показывается превью
+MAX_STRING_CHARS = 1000
+MAX_INT_DIGITS = 100
+
+# log10(2): оценка числа десятичных цифр по числу бит
+_LOG10_2 = math.log10(2)
+
+
+@dataclass(frozen=True, slots=True)
+class ValuePreview:
+    """
+    Ограниченное представление большого значения в снимке шага
+
+    Вместо копии контейнера (или строки, или длинного числа) в снимок
+    попадает короткий текст и размер, поэтому стоимость шага не зависит
+    от объема данных. Неизменяемое значение хранится в full как есть,
+    а изменяемый контейнер загружается по требованию через loader.
+    """
+    type_name: str
+    size: int  # Элементов в контейнере, символов в строке или цифр в числе
+    text: str
+    full: Any = None  # Само значение, если оно неизменяемое
+    # Загрузка полного значения (подставляется исполнителем при чтении шага)
+    loader: Optional[Callable[[], Any]] = field(default=None, compare=False, repr=False)
+
+    @property
+    def is_loadable(self) -> bool:
+        """Можно ли получить полное значение"""
+        return self.full is not None or self.loader is not None
+
+    def load(self) -> Any:
+        """Полное значение (может потребовать повторного выполнения кода)"""
+        if self.full is not None:
+            return self.full
+        if self.loader is not None:
+            return self.loader()
+        return self.text
+
+    def __str__(self) -> str:
+        return self.text
+
+
+class _PreviewRepr(reprlib.Repr):
+    """reprlib без полного преобразования длинных чисел в строку"""
+
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 2
+        self.maxlist = self.maxtuple = self.maxset = self.maxfrozenset = 10
+        self.maxdict = 6
+        self.maxstring = 60
+        self.maxother = 40
+
+    def repr_int(self, x, level):
+        if x.bit_length() > MAX_INT_DIGITS / _LOG10_2:
+            return _int_text(x)
+        return super().repr_int(x, level)
+
+
+_preview_repr = _PreviewRepr()
+
+
+def make_preview(value: Any, max_items: int) -> Optional[ValuePreview]:
+    """
+    Превью значения, если оно превышает бюджет
+
+    Args:
+        value: Значение переменной или элемента контейнера
+        max_items: Сколько элементов контейнера еще можно сохранить полностью
+
+    Returns:
+        ValuePreview или None, если значение сохраняется целиком
+    """
+    value_type = type(value)
+    if value_type is int:
+        if value.bit_length() <= MAX_INT_DIGITS / _LOG10_2:
+            return None
+        return ValuePreview('int', _int_digits(value), _int_text(value), full=value)
+    if value_type is str:
+        if len(value) <= MAX_STRING_CHARS:
+            return None
+        return ValuePreview('str', len(value), _preview_repr.repr(value), full=value)
+    if isinstance(value, (list, dict, tuple, set)):
+        if len(value) <= max_items:
+            return None
+        text = _preview_repr.repr(value)
+        return ValuePreview(value_type.__name__, len(value), text)
+    return None
+
+
+def _int_digits(value: int) -> int:
+    """Число десятичных цифр без преобразования в строку (с точностью до единицы)"""
+    return int(abs(value).bit_length() * _LOG10_2) + 1
+
+
+def _int_text(value: int) -> str:
+    """Запись длинного числа в научной нотации (str() стоит квадратичного времени)"""
+    exponent = math.log10(abs(value))
+    mantissa = 10 ** (exponent - math.floor(exponent))
+    sign = '-' if value < 0 else ''
+    return f"{sign}{mantissa:.6f}e+{math.floor(exponent)} ({_int_digits(value)} цифр)"
+
+
+def preview_text(value: Any) -> str:
+    """
+    Строка значения для отображения без полного str() больших значений
+
+    Для обычных значений совпадает с str(), большие контейнеры, строки
+    и числа сокращаются так же, как в превью.
+    """
+    value_type = type(value)
+    if value_type is ValuePreview:
+        return value.text
+    if value_type is str:
+        return value[:MAX_STRING_CHARS]
+    if value_type is int:
+        return _int_text(value) if value.bit_length() > MAX_INT_DIGITS / _LOG10_2 else str(value)
+    if value_type in (list, dict, tuple, set) and len(value) > _preview_repr.maxlist:
+        return _preview_repr.repr(value)
+    return str(value)
@@ -0,0 +1,77 @@
+import queue
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class ExecutionWorker(QObject):
+    """Выполнение кода в отдельном потоке с потоковой передачей шагов"""
+
+    # Сигнал о том, что в очереди появились новые шаги
+    steps_available = pyqtSignal()
+    # Сигнал завершения выполнения (успешно ли началось выполнение)
+    finished = pyqtSignal(bool)
+
+    def __init__(self, executor, code: str):
+        super().__init__()
+        self.executor = executor
+        self.code = code
+
+        # Номера записанных шагов, которые еще не забрал GUI
+        self.step_queue = queue.Queue()
+        self._notify_pending = False
+
+    def run(self):
+        """Запуск выполнения (вызывается в рабочем потоке)"""
+        self.executor.set_step_callback(self._on_step)
+        try:
+            success = self.executor.execute_step_by_step(self.code)
+        except Exception as e:
+            print(f"Ошибка при выполнении кода: {e}")
+            success = False
+        finally:
+            self.executor.set_step_callback(None)
+        self.finished.emit(success)
+
+    def _on_step(self, step):
+        """Callback исполнителя: передаем номер шага в очередь"""
+        self.step_queue.put(step.step_number)
+        # Сигнал отправляем только если GUI еще не знает о новых шагах,
+        # чтобы не засыпать очередь событий Qt на каждом шаге
+        if not self._notify_pending:
+            self._notify_pending = True
+            self.steps_available.emit()
+
+    def take_steps(self) -> int:
+        """
+        Забрать все накопившиеся шаги (вызывается в потоке GUI)
+
+        Returns:
+            Количество шагов, доступных для просмотра (0 если новых нет)
+        """
+        self._notify_pending = False
+        last_step = -1
+        while True:
+            try:
+                last_step = self.step_queue.get_nowait()
+            except queue.Empty:
+                break
+        return last_step + 1
+
+
+class DetailWorker(QObject):
+    """Дополнительный запрос к исполнителю (итерация, полное значение) в отдельном потоке"""
+
+    # Сигнал завершения с результатом запроса (None при ошибке)
+    finished = pyqtSignal(object)
+
+    def __init__(self, request):
+        super().__init__()
+        self.request = request
+
+    def run(self):
+        """Выполнение запроса (вызывается в рабочем потоке)"""
+        try:
+            result = self.request()
+        except Exception as e:
+            print(f"Ошибка при повторном выполнении кода: {e}")
+            result = None
+        self.finished.emit(result)
@@ -1,9 +1,12 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QSplitter, QPushButton, QLabel, QGraphicsView,
-                             QTextEdit, QFileDialog, QMessageBox)
-from PyQt6.QtCore import Qt
+                             QTextEdit, QFileDialog, QMessageBox, QCheckBox)
+from PyQt6.QtCore import Qt, QThread
 from PyQt6.QtGui import QFont, QColor, QPainter
-from PyQt6.Qsci import QsciScintilla, QsciLexerPython, QsciAPIs
-from src.executor.code_executor import CodeExecutor
+from PyQt6.Qsci import QsciScintilla, QsciLexerPython, QsciAPIs, QsciStyle
+from src.core.security import security_manager
+from src.executor.backends import create_backend
+from src.gui.execution_worker import ExecutionWorker, DetailWorker
+from src.testing.test_runner import TestRunner, TestCase
 from src.visualizer.pythontutor_widgets import PythonTutorScene
 from PyQt6.QtSvg import QSvgGenerator
 from PyQt6.QtGui import QPainter, QPixmap
@@ -13,121 +16,21 @@ import os
 import sys
 import io
 import contextlib
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import traceback
 
 
-class TestCase:
-    def __init__(self, inputs: List[str], expected_output: str, description: str = ""):
-        self.inputs = inputs
-        self.expected_output = expected_output.strip()
-        self.description = description
+# Бэкенды выполнения (см. src.executor.backends): пошаговой визуализации
+# (в отдельном процессе: зависание или сбой программы не затрагивают окно)
+# и проверки решений тестами
+VISUAL_BACKEND = 'subprocess'
+TEST_BACKEND = 'pool'
 
+# Номер поля редактора с профилем строк
+PROFILE_MARGIN = 1
 
-class TestRunner:
-    def __init__(self):
-        self.max_execution_time = 5  # секунд
-
-    def run_tests(self, code: str, test_cases: List[TestCase]) -> Dict[str, Any]:
-        """Запускает код против набора тестов"""
-        results = {
-            'passed': 0,
-            'total': len(test_cases),
-            'test_results': [],
-            'success': False,
-            'error': None
-        }
-
-        for i, test_case in enumerate(test_cases):
-            try:
-                result = self._run_single_test(code, test_case, i + 1)
-                results['test_results'].append(result)
-                if result['passed']:
-                    results['passed'] += 1
-            except Exception as e:
-                results['test_results'].append({
-                    'test_number': i + 1,
-                    'passed': False,
-                    'error': str(e),
-                    'description': test_case.description
-                })
-
-        results['success'] = results['passed'] == results['total']
-        return results
-
-    def _run_single_test(self, code: str, test_case: TestCase, test_number: int) -> Dict[str, Any]:
-        """Запускает один тест"""
-        # Создаем mock для input()
-        input_iterator = iter(test_case.inputs)
-
-        def mock_input(prompt=""):
-            try:
-                value = next(input_iterator)
-                return value
-            except StopIteration:
-                raise EOFError("No more input available")
-
-        # Перехватываем stdout
-        captured_output = io.StringIO()
-
-        # Создаем безопасное окружение
-        safe_globals = {
-            '__builtins__': {
-                'print': lambda *args, **kwargs: print(*args, file=captured_output, **kwargs),
-                'input': mock_input,
-                'len': len,
-                'range': range,
-                'int': int,
-                'float': float,
-                'str': str,
-                'list': list,
-                'dict': dict,
-                'set': set,
-                'tuple': tuple,
-                'bool': bool,
-                'abs': abs,
-                'max': max,
-                'min': min,
-                'sum': sum,
-                'sorted': sorted,
-                'reversed': reversed,
-                'enumerate': enumerate,
-                'zip': zip,
-                'map': map,
-                'filter': filter,
-            }
-        }
-
-        try:
-            # Выполняем код с ограничениями
-            exec(code, safe_globals)
-
-            # Получаем вывод
-            actual_output = captured_output.getvalue().strip()
-
-            # Сравниваем результаты
-            passed = actual_output == test_case.expected_output
-
-            return {
-                'test_number': test_number,
-                'passed': passed,
-                'input': test_case.inputs,
-                'expected_output': test_case.expected_output,
-                'actual_output': actual_output,
-                'description': test_case.description,
-                'error': None
-            }
-
-        except Exception as e:
-            return {
-                'test_number': test_number,
-                'passed': False,
-                'input': test_case.inputs,
-                'expected_output': test_case.expected_output,
-                'actual_output': captured_output.getvalue().strip(),
-                'description': test_case.description,
-                'error': str(e)
-            }
+# Цвета тепловой карты профиля: от строк без заметного времени к самым долгим
+HEAT_COLORS = ('#f8f9fa', '#fdebd0', '#fad7a0', '#f8c471', '#f5b041', '#eb984e', '#e74c3c')
 
 
 class VisualizerWindow(QWidget):
@@ -136,12 +39,39 @@ class VisualizerWindow(QWidget):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
-        self.executor = CodeExecutor()
+        visual_backend = create_backend(VISUAL_BACKEND)
+        # Шаблонный процесс исполнителя готовится заранее - первый запуск его не ждет
+        visual_backend.warm_up()
+        self.executor = visual_backend.create_executor()
         self.current_step_number = -1
         self.visualization_scene = PythonTutorScene()
+        # Полные значения превью загружаются повторным выполнением вне потока GUI
+        self.visualization_scene.run_in_background = self.run_detail
+
+        # Выполнение в фоновом потоке: шаги доступны по мере записи
+        self.execution_thread = None
+        self.execution_worker = None
+        self.execution_running = False
+        self.available_steps = 0
+
+        # Повторное выполнение для итерации или полного значения: поток и продолжение
+        self.detail_thread = None
+        self.detail_worker = None
+        self.detail_callback = None
+        self.detail_button_states = []
+
+        # Развернутая итерация свернутого цикла: ее шаги и позиция в них
+        self.expanded_steps = []
+        self.expanded_index = -1
+
+        # Окно шагов: трассировка записывает max_steps шагов начиная с window_start,
+        # соседние окна догружаются при переходе за его границу
+        self.window_start = 0
+        self.show_last_step = False
 
         # Система тестирования
-        self.test_runner = TestRunner()
+        self.test_runner = TestRunner(security_manager)
+        self.test_runner.backend = TEST_BACKEND
         self.current_task_tests = []
 
         self.init_ui()
@@ -314,6 +244,14 @@ for num in numbers:
         self.code_editor.setMarginsBackgroundColor(QColor("#f8f9fa"))
         self.code_editor.setMarginsForegroundColor(QColor("#7f8c8d"))
 
+        # Поле профиля строк: число выполнений и время, цвет - доля времени
+        # (скрыто, пока нет профиля)
+        self.code_editor.setMarginType(PROFILE_MARGIN, QsciScintilla.MarginType.TextMargin)
+        self.code_editor.setMarginWidth(PROFILE_MARGIN, 0)
+        margin_font = QFont("Courier New", 9)
+        self.heat_styles = [QsciStyle(-1, f"Профиль {level}", QColor("#2c3e50"), QColor(color), margin_font)
+                            for level, color in enumerate(HEAT_COLORS)]
+
         # Подсветка текущей строки
         self.code_editor.setCaretLineVisible(True)
         self.code_editor.setCaretLineBackgroundColor(QColor("#ecf0f1"))
@@ -520,6 +458,28 @@ for num in numbers:
         self.step_forward_btn.setEnabled(False)
         control_layout.addWidget(self.step_forward_btn)
 
+        # Кнопка "Итерация" - пошаговый просмотр свернутой итерации цикла
+        self.expand_btn = QPushButton("🔍 Итерация")
+        self.expand_btn.setStyleSheet(button_style.replace("#3498db", "#16a085"))
+        self.expand_btn.clicked.connect(self.expand_iteration)
+        self.expand_btn.setEnabled(False)
+        control_layout.addWidget(self.expand_btn)
+
+        # Переключатель свертки циклов (действует со следующего запуска)
+        self.coalesce_loops_check = QCheckBox("Сворачивать циклы")
+        self.coalesce_loops_check.setStyleSheet("color: #2c3e50; font-size: 12px;")
+        control_layout.addWidget(self.coalesce_loops_check)
+
+        # Переключатель выборочной записи для долгих программ (со следующего запуска)
+        self.sampling_check = QCheckBox("Выборочная запись")
+        self.sampling_check.setStyleSheet("color: #2c3e50; font-size: 12px;")
+        control_layout.addWidget(self.sampling_check)
+
+        # Переключатель учета памяти по шагам (со следующего запуска)
+        self.memory_check = QCheckBox("Учет памяти")
+        self.memory_check.setStyleSheet("color: #2c3e50; font-size: 12px;")
+        control_layout.addWidget(self.memory_check)
+
         # Кнопка "Сброс"
         self.reset_btn = QPushButton("🔄 Сброс")
         self.reset_btn.setStyleSheet(
@@ -527,6 +487,14 @@ for num in numbers:
         self.reset_btn.clicked.connect(self.reset_execution)
         control_layout.addWidget(self.reset_btn)
 
+        # Кнопка "Стоп" - остановка долгого выполнения (записанные шаги остаются)
+        self.stop_btn = QPushButton("⏹️ Стоп")
+        self.stop_btn.setStyleSheet(
+            button_style.replace("#3498db", "#e67e22").replace("#2980b9", "#d35400").replace("#21618c", "#a04000"))
+        self.stop_btn.clicked.connect(self.stop_execution)
+        self.stop_btn.setEnabled(False)
+        control_layout.addWidget(self.stop_btn)
+
         # Кнопка "Проверить решение"
         self.test_button = QPushButton("🧪 Проверить решение")
         self.test_button.setStyleSheet(
@@ -605,6 +573,8 @@ for num in numbers:
                     for test in task_data['test_cases']
                 ]
                 self.test_button.setText(f"🧪 Проверить решение ({len(self.current_task_tests)} тестов)")
+                # Шаблонный процесс тестов готовится, пока решение пишется
+                self.test_runner.warm_up()
             else:
                 self.current_task_tests = []
                 self.test_button.setText("🧪 Тесты не найдены")
@@ -681,6 +651,8 @@ for num in numbers:
 
             if result.get('error'):
                 output.append(f"Ошибка: {result['error']}")
+            elif result.get('mismatch'):
+                output.append(f"Расхождение: {result['mismatch']}")
 
         self.test_results_area.setText('\n'.join(output))
 
@@ -706,89 +678,366 @@ for num in numbers:
             self.line_indicator.setText("Ошибка: Код пустой")
             return
 
+        if self.is_executing():
+            return
+
         self.output_text.clear()
+        self.executor.loop_mode = 'coalesce' if self.coalesce_loops_check.isChecked() else 'full'
+        self.executor.adaptive_sampling = self.sampling_check.isChecked()
+        self.executor.track_memory = self.memory_check.isChecked()
+        self.window_start = 0
+        self.start_execution(code)
 
-        try:
-            success = self.executor.execute_step_by_step(code)
-            if success:
-                self.current_step_number = 0
-                self.update_visualization()
-                self.step_forward_btn.setEnabled(True)
-                self.step_back_btn.setEnabled(False)
-                self.line_indicator.setText(f"Выполнение начато. Шагов: {len(self.executor.steps)}")
-            else:
-                self.line_indicator.setText("Ошибка: Код содержит ошибки")
-        except Exception as e:
-            self.line_indicator.setText(f"Ошибка выполнения: {str(e)}")
-            print(f"Ошибка при выполнении кода: {e}")
+    def start_execution(self, code: str, window_end: Optional[int] = None, show_last: bool = False):
+        """
+        Запуск трассировки окна шагов в рабочем потоке
+
+        Args:
+            code: Исходный код
+            window_end: Последнее событие окна (по умолчанию - окно из max_steps шагов)
+            show_last: Показать последний шаг окна (при переходе назад)
+        """
+        self.current_step_number = -1
+        self.available_steps = 0
+        self.expanded_steps = []
+        self.expanded_index = -1
+        self.show_last_step = show_last
+        if self.executor.is_sampling():
+            # Выборочная запись сразу охватывает всю программу
+            self.executor.step_window = None
+        else:
+            if window_end is None:
+                window_end = self.window_start + self.executor.max_steps - 1
+            self.executor.step_window = (self.window_start, window_end)
+        self.step_forward_btn.setEnabled(False)
+        self.step_back_btn.setEnabled(False)
+        self.expand_btn.setEnabled(False)
+        self.run_btn.setEnabled(False)
+        self.reset_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.line_indicator.setText("Выполнение...")
+        self.execution_running = True
+
+        # Трассировка идет в рабочем потоке, GUI получает шаги через сигнал
+        self.execution_thread = QThread()
+        self.execution_worker = ExecutionWorker(self.executor, code)
+        self.execution_worker.moveToThread(self.execution_thread)
+        self.execution_thread.started.connect(self.execution_worker.run)
+        self.execution_worker.steps_available.connect(self.on_steps_available)
+        self.execution_worker.finished.connect(self.on_execution_finished)
+        self.execution_worker.finished.connect(self.execution_thread.quit)
+        self.execution_thread.start()
+
+    def is_executing(self) -> bool:
+        """Идет ли сейчас выполнение кода в рабочем потоке"""
+        return self.execution_running or self.detail_callback is not None or (
+            self.execution_thread is not None and self.execution_thread.isRunning())
+
+    def run_detail(self, request, on_done) -> bool:
+        """
+        Запрос к исполнителю, повторно выполняющий код, в рабочем потоке
+
+        Пока запрос выполняется, кнопки управления недоступны; по завершении
+        их состояние восстанавливается и в потоке GUI вызывается on_done.
+
+        Args:
+            request: Функция без аргументов, выполняемая в рабочем потоке
+            on_done: Обработчик ее результата
+
+        Returns:
+            Запущен ли запрос (False, если уже идет выполнение)
+        """
+        if self.is_executing():
+            return False
+
+        buttons = [self.run_btn, self.reset_btn, self.step_back_btn,
+                   self.step_forward_btn, self.expand_btn]
+        self.detail_button_states = [(button, button.isEnabled()) for button in buttons]
+        for button in buttons:
+            button.setEnabled(False)
+        self.detail_callback = on_done
+
+        self.detail_thread = QThread()
+        self.detail_worker = DetailWorker(request)
+        self.detail_worker.moveToThread(self.detail_thread)
+        self.detail_thread.started.connect(self.detail_worker.run)
+        # Обработчик - метод окна, поэтому вызывается в потоке GUI
+        self.detail_worker.finished.connect(self.on_detail_finished)
+        self.detail_worker.finished.connect(self.detail_thread.quit)
+        self.detail_thread.start()
+        return True
+
+    def on_detail_finished(self, result):
+        """Обработка результата повторного выполнения"""
+        on_done = self.detail_callback
+        self.detail_callback = None
+        for button, enabled in self.detail_button_states:
+            button.setEnabled(enabled)
+        on_done(result)
+
+    def on_steps_available(self):
+        """Обработка новых шагов, записанных рабочим потоком"""
+        if self.execution_worker is None:
+            return
+        self.available_steps = max(self.available_steps, self.execution_worker.take_steps())
+        self.show_available_steps()
+
+    def on_execution_finished(self, success: bool):
+        """Обработка завершения выполнения"""
+        self.execution_running = False
+        self.run_btn.setEnabled(True)
+        self.reset_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+
+        if not success:
+            self.line_indicator.setText("Ошибка: Код содержит ошибки")
+            return
+
+        # Шаг с ошибкой выполнения добавляется без callback
+        self.execution_worker.take_steps()
+        self.available_steps = len(self.executor.steps)
+        self.show_line_profile()
+        self.show_available_steps()
+        if self.current_step_number > 0 or self.window_start > 0:
+            # Убираем пометку о выполнении и обновляем доступность кнопок
+            self.update_visualization()
+        if self.current_step_number == 0 and self.executor.cancelled:
+            self.line_indicator.setText(f"Выполнение остановлено. Шагов: {self.available_steps}")
+        elif self.current_step_number == 0 and self.window_start == 0:
+            self.line_indicator.setText(f"Выполнение начато. Шагов: {self.available_steps}")
+
+    def stop_execution(self):
+        """Остановка выполнения по кнопке "Стоп" (записанные шаги остаются доступны)"""
+        if not self.execution_running:
+            return
+        self.executor.cancel()
+        self.stop_btn.setEnabled(False)
+        self.line_indicator.setText("Остановка выполнения...")
+
+    def show_available_steps(self):
+        """Обновление визуализации и кнопок по мере поступления шагов"""
+        if self.available_steps == 0:
+            return
+
+        if self.show_last_step:
+            # Переход назад в предыдущее окно: показываем его последний шаг
+            if self.execution_running:
+                return
+            self.show_last_step = False
+            self.current_step_number = self.available_steps - 1
+            self.update_visualization()
+        elif self.current_step_number < 0:
+            # Первый шаг можно смотреть, пока записываются остальные
+            self.current_step_number = 0
+            self.update_visualization()
+
+        self.step_forward_btn.setEnabled(
+            self.current_step_number < self.available_steps - 1 or self.has_next_window())
+        self.step_back_btn.setEnabled(self.current_step_number > 0 or self.window_start > 0)
+
+    def has_next_window(self) -> bool:
+        """Остались ли шаги программы после записанного окна"""
+        return not self.execution_running and self.executor.window_truncated
+
+    def load_next_window(self):
+        """Запись окна шагов, следующего за текущим"""
+        last_step = self.executor.steps.get_record(self.available_steps - 1)
+        self.window_start = last_step.event_index + 1
+        self.line_indicator.setText("Загрузка следующих шагов...")
+        self.start_execution(self.executor.source_code)
+
+    def load_previous_window(self):
+        """Запись окна шагов, предшествующего текущему"""
+        window_end = self.window_start - 1
+        self.window_start = max(0, self.window_start - self.executor.max_steps)
+        self.line_indicator.setText("Загрузка предыдущих шагов...")
+        self.start_execution(self.executor.source_code, window_end, show_last=True)
 
     def step_back(self):
         """Шаг назад"""
+        if self.expanded_steps:
+            if self.expanded_index > 0:
+                self.expanded_index -= 1
+                self.update_visualization()
+            else:
+                self.collapse_iteration()
+            return
+
+        if self.is_executing():
+            return
+
         if self.current_step_number > 0:
             self.current_step_number -= 1
             self.update_visualization()
             self.step_forward_btn.setEnabled(True)
-            if self.current_step_number <= 0:
+            if self.current_step_number <= 0 and self.window_start == 0:
                 self.step_back_btn.setEnabled(False)
+        elif self.window_start > 0:
+            self.load_previous_window()
         else:
             self.line_indicator.setText("Достигнуто начало выполнения")
 
     def step_forward(self):
         """Шаг вперед"""
-        if self.current_step_number < len(self.executor.steps) - 1:
+        if self.expanded_steps:
+            if self.expanded_index < len(self.expanded_steps) - 1:
+                self.expanded_index += 1
+                self.update_visualization()
+            else:
+                # Итерация просмотрена - возвращаемся к шагу, которым она завершилась
+                self.collapse_iteration()
+            return
+
+        if self.current_step_number < self.available_steps - 1:
             self.current_step_number += 1
             self.update_visualization()
             self.step_back_btn.setEnabled(True)
-            if self.current_step_number >= len(self.executor.steps) - 1:
+            if self.current_step_number >= self.available_steps - 1 and not self.has_next_window():
                 self.step_forward_btn.setEnabled(False)
+        elif self.has_next_window() and self.available_steps > 0:
+            self.load_next_window()
         else:
             self.line_indicator.setText("Достигнут конец выполнения")
 
+    def expand_iteration(self):
+        """Пошаговый просмотр свернутой итерации цикла на текущем шаге"""
+        if self.is_executing() or self.expanded_steps or self.current_step_number < 0:
+            return
+
+        step_number = self.current_step_number
+        if self.run_detail(lambda: self.executor.expand_iteration(step_number),
+                           self.on_iteration_expanded):
+            self.line_indicator.setText("Восстановление итерации...")
+
+    def on_iteration_expanded(self, steps):
+        """Переход к просмотру восстановленной итерации"""
+        if not steps:
+            self.update_visualization()
+            return
+
+        self.expanded_steps = steps
+        self.expanded_index = 0
+        self.expand_btn.setEnabled(False)
+        self.step_back_btn.setEnabled(True)
+        self.step_forward_btn.setEnabled(True)
+        self.update_visualization()
+
+    def collapse_iteration(self):
+        """Возврат из просмотра итерации к шагу, которым она завершилась"""
+        self.expanded_steps = []
+        self.expanded_index = -1
+        self.step_back_btn.setEnabled(self.current_step_number > 0 or self.window_start > 0)
+        self.step_forward_btn.setEnabled(
+            self.current_step_number < self.available_steps - 1 or self.has_next_window())
+        self.update_visualization()
+
     def reset_execution(self):
         """Сброс выполнения"""
+        if self.is_executing():
+            return
+
         self.executor.reset()
         self.current_step_number = -1
+        self.available_steps = 0
+        self.window_start = 0
+        self.expanded_steps = []
+        self.expanded_index = -1
         self.step_forward_btn.setEnabled(False)
         self.step_back_btn.setEnabled(False)
+        self.expand_btn.setEnabled(False)
         self.visualization_scene.clear_all()
         self.line_indicator.setText("Строка: не выполняется")
         self.output_text.clear()
         self.code_editor.clearIndicatorRange(0, 0, self.code_editor.lines(), 0, 0)
+        self.show_line_profile()
 
     def update_visualization(self):
         """Обновление визуализации на основе текущего шага"""
-        if self.current_step_number < 0 or self.current_step_number >= len(self.executor.steps):
+        if self.current_step_number < 0 or self.current_step_number >= self.available_steps:
             return
 
-        step = self.executor.steps[self.current_step_number]
+        if self.expanded_steps:
+            self.show_expanded_step()
+            return
+
+        step = self.executor.get_step(self.current_step_number)
 
         print(f"DEBUG: Шаг {self.current_step_number}, строка {step.line_number}, код: {step.code_line}")
         print(f"DEBUG: Переменные: {step.variables}")
 
-        self.line_indicator.setText(
-            f"Строка: {step.line_number} | Шаг: {step.step_number + 1}/{len(self.executor.steps)}")
+        indicator = f"Строка: {step.line_number} | Шаг: {step.step_number + 1}/{self.available_steps}"
+        if step.iteration is not None:
+            # Шаг завершает свернутую итерацию цикла - показываем ее сводку
+            changed = self.executor.get_changed_variables(self.current_step_number)
+            indicator += f" | Итерация {step.iteration.iteration}: шагов {step.iteration.line_count}"
+            if changed:
+                indicator += f", изменились: {', '.join(changed)}"
+        if step.skipped:
+            # Выборочная запись: шаги между снимками не сохранены
+            indicator += f" | Пропущено шагов: {step.skipped}"
+        if self.window_start > 0 or self.executor.window_truncated:
+            # Номер шага в программе (окно записано не с начала или не до конца)
+            indicator += f" | Шаг программы: {step.event_index + 1}"
+        if self.executor.is_tracking_memory():
+            indicator += f" | Память: {_format_memory(step.memory)}"
+        if self.execution_running:
+            indicator += " (выполняется...)"
+        self.line_indicator.setText(indicator)
+        self.expand_btn.setEnabled(step.iteration is not None and not self.execution_running)
 
         self.highlight_current_line(step.line_number)
-        self.update_variables_display(step.variables)
+        self.update_variables_display(step.variables, step.frames)
         self.update_output_display()
 
         if step.error:
             self.line_indicator.setText(f"ОШИБКА в строке {step.line_number}: {step.error}")
 
+    def show_expanded_step(self):
+        """Отображение шага развернутой итерации цикла"""
+        step = self.expanded_steps[self.expanded_index]
+        iteration = self.executor.steps.get_record(self.current_step_number).iteration
+
+        self.line_indicator.setText(
+            f"Строка: {step.line_number} | Итерация {iteration.iteration}, "
+            f"шаг {self.expanded_index + 1}/{len(self.expanded_steps)}")
+        self.highlight_current_line(step.line_number)
+        self.update_variables_display(step.variables, step.frames)
+
+        # Вывод до начала итерации и вывод ее шагов до текущего
+        outputs = [self.executor.get_output_until(iteration.start_step)]
+        outputs.extend(s.output for s in self.expanded_steps[:self.expanded_index + 1] if s.output)
+        self.output_text.setPlainText('\n'.join(o for o in outputs if o).rstrip())
+
+        if step.error:
+            self.line_indicator.setText(f"ОШИБКА в строке {step.line_number}: {step.error}")
+
     def update_output_display(self):
         """Обновление окна вывода до текущего шага"""
-        output_text = ""
-        for i in range(self.current_step_number + 1):
-            if i < len(self.executor.steps):
-                step = self.executor.steps[i]
-                if step.output:
-                    output_text += step.output + "\n"
+        output_text = self.executor.get_output_until(self.current_step_number)
 
         self.output_text.setPlainText(output_text.rstrip())
         cursor = self.output_text.textCursor()
         cursor.movePosition(cursor.MoveOperation.End)
         self.output_text.setTextCursor(cursor)
 
+    def show_line_profile(self):
+        """Тепловая карта строк на поле редактора по профилю последнего выполнения"""
+        self.code_editor.clearMarginText()
+        profile = self.executor.get_line_profile()
+        if not profile:
+            self.code_editor.setMarginWidth(PROFILE_MARGIN, 0)
+            return
+
+        max_time = max(time_ns for _, time_ns in profile.values()) or 1
+        texts = {}
+        for line_number, (hits, time_ns) in profile.items():
+            if line_number > self.code_editor.lines():
+                continue
+            level = round(time_ns / max_time * (len(HEAT_COLORS) - 1))
+            texts[line_number] = f"{hits:>7}× {time_ns / 1e6:8.2f} мс"
+            self.code_editor.setMarginText(line_number - 1, texts[line_number], self.heat_styles[level])
+        self.code_editor.setMarginWidth(PROFILE_MARGIN, max(texts.values(), key=len, default="") + " ")
+
     def highlight_current_line(self, line_number: int):
         """Подсветка текущей строки в редакторе"""
         self.code_editor.clearIndicatorRange(0, 0, self.code_editor.lines(), 0, 0)
@@ -797,13 +1046,13 @@ for num in numbers:
             self.code_editor.setSelection(line_number - 1, 0, line_number - 1,
                                           len(self.code_editor.text(line_number - 1)))
 
-    def update_variables_display(self, variables: dict):
-        """Обновление отображения переменных"""
-        if not variables:
+    def update_variables_display(self, variables: dict, frames: dict = None):
+        """Обновление отображения переменных (глобальных и кадров функций)"""
+        if not variables and not frames:
             self.visualization_scene.clear_all()
             return
 
-        self.visualization_scene.update_visualization(variables)
+        self.visualization_scene.update_visualization(variables, frames)
 
         items_rect = self.visualization_scene.itemsBoundingRect()
         if not items_rect.isEmpty():
@@ -866,3 +1115,12 @@ for num in numbers:
                 QMessageBox.information(self, "Экспорт завершен", f"Визуализация сохранена в:\n{file_path}")
             except Exception as e:
                 QMessageBox.warning(self, "Ошибка экспорта", f"Не удалось сохранить SVG:\n{str(e)}")
+
+
+def _format_memory(size: int) -> str:
+    """Размер памяти в читаемом виде"""
+    if size < 1024:
+        return f"{size} Б"
+    if size < 1024 * 1024:
+        return f"{size / 1024:.1f} КБ"
+    return f"{size / 1024 / 1024:.1f} МБ"
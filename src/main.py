@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
 from src.gui.main_window import MainWindow
 
@@ -19,4 +20,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # Рабочие процессы исполнителя в собранном приложении (PyInstaller)
+    multiprocessing.freeze_support()
     main()
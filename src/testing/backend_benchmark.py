@@ -0,0 +1,290 @@
+"""
+Сравнение бэкендов выполнения на задачах из tasks_tests.json
+
+Запуск:
+    python -m src.testing.backend_benchmark [--repeat 3] [--workers 4] [--no-gui-main]
+
+Для каждой задачи есть эталонное решение (REFERENCE_SOLUTIONS). Каждый
+бэкенд проверяет все решения всеми тестами (как пакетная проверка), а
+затем выполняет первый тест каждой задачи с трассировкой (как
+визуализация). Печатается время и число пройденных тестов (без
+трассировки и с ней): у всех бэкендов оно должно быть одинаковым.
+
+Бэкенд 'pool' замеряется еще и в процессе, главный модуль которого
+импортирует PyQt6 и окна приложения (как src/main.py): если тесты там
+заметно медленнее, процессы тестов выполняют главный модуль заново.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from typing import List, Dict, Any, Optional, Tuple
+
+from src.executor.backends import BACKENDS, ExecutionLimits, create_backend
+
+
+# Файл с тестами задач
+TESTS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'tasks_tests.json')
+
+# Корень проекта (для запуска проверки с главным модулем приложения)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Скрипт замера 'pool', главный модуль которого импортирует PyQt6 и окна, как
+# src/main.py: процессы тестов не должны выполнять его заново
+GUI_MAIN_SCRIPT = (
+    "import sys\n"
+    "sys.path.insert(0, {root!r})\n"
+    "import src.main\n"
+    "from src.testing.backend_benchmark import pool_time_per_test\n"
+    "if __name__ == '__main__':\n"
+    "    print(pool_time_per_test({repeat}, {workers}))\n"
+)
+
+# Во сколько раз замер с главным модулем GUI может быть медленнее обычного
+GUI_MAIN_SLOWDOWN = 2.0
+
+# Эталонные решения задач из tasks_tests.json
+REFERENCE_SOLUTIONS = {
+    'Наибольший общий делитель': (
+        "a = int(input())\n"
+        "b = int(input())\n"
+        "while b:\n"
+        "    a, b = b, a % b\n"
+        "print(a)\n"
+    ),
+    'Цифры числа': (
+        "n = int(input())\n"
+        "while n > 0:\n"
+        "    print(n % 10)\n"
+        "    n //= 10\n"
+    ),
+    'Простые множители': (
+        "n = int(input())\n"
+        "d = 2\n"
+        "while n > 1:\n"
+        "    while n % d == 0:\n"
+        "        print(d)\n"
+        "        n //= d\n"
+        "    d += 1\n"
+    ),
+    'Сумма цифр числа': (
+        "n = int(input())\n"
+        "while n > 9:\n"
+        "    s = 0\n"
+        "    while n > 0:\n"
+        "        s += n % 10\n"
+        "        n //= 10\n"
+        "    n = s\n"
+        "print(n)\n"
+    ),
+    'Число-палиндром': (
+        "n = int(input())\n"
+        "m = n\n"
+        "r = 0\n"
+        "while m > 0:\n"
+        "    r = r * 10 + m % 10\n"
+        "    m //= 10\n"
+        "print('Палиндром' if r == n else 'Не палиндром')\n"
+    ),
+    'Простое число': (
+        "n = int(input())\n"
+        "if n < 2:\n"
+        "    print('Не простое и не составное')\n"
+        "else:\n"
+        "    prime = True\n"
+        "    for d in range(2, int(n ** 0.5) + 1):\n"
+        "        if n % d == 0:\n"
+        "            prime = False\n"
+        "            break\n"
+        "    print('Простое' if prime else 'Составное')\n"
+    ),
+    'Таблица умножения': (
+        "n = int(input())\n"
+        "for i in range(1, 11):\n"
+        "    print(f'{n} x {i} = {n * i}')\n"
+    ),
+    'Факториал': (
+        "n = int(input())\n"
+        "f = 1\n"
+        "for i in range(2, n + 1):\n"
+        "    f *= i\n"
+        "print(f)\n"
+    ),
+    'Последовательность Фибоначчи': (
+        "n = int(input())\n"
+        "a, b = 1, 1\n"
+        "for i in range(n):\n"
+        "    print(a)\n"
+        "    a, b = b, a + b\n"
+    ),
+    'Совершенное число': (
+        "limit = int(input())\n"
+        "for n in range(2, limit + 1):\n"
+        "    total = 1\n"
+        "    for d in range(2, n):\n"
+        "        if n % d == 0:\n"
+        "            total += d\n"
+        "    if total == n:\n"
+        "        print(n)\n"
+    ),
+}
+
+
+def load_jobs(tests_file: str = TESTS_FILE) -> List[Tuple[str, List[str], str]]:
+    """Задания (код, ввод, ожидаемый вывод) по всем тестам задач с эталонным решением"""
+    with open(tests_file, 'r', encoding='utf-8') as f:
+        tests_data = json.load(f)
+
+    jobs = []
+    for tasks in tests_data.values():
+        for task_name, task_data in tasks.items():
+            code = REFERENCE_SOLUTIONS.get(task_name)
+            if code is None:
+                print(f"Нет эталонного решения: {task_name}")
+                continue
+            for test in task_data['test_cases']:
+                jobs.append((code, test['inputs'], test['expected_output'].strip()))
+    return jobs
+
+
+def benchmark_backend(name: str, jobs: List[Tuple[str, List[str], str]], repeat: int = 3,
+                      workers: int = 4, trace: bool = True) -> Dict[str, Any]:
+    """
+    Замер одного бэкенда
+
+    Returns:
+        Словарь: лучшее время проверки всех тестов, время трассировки
+        первых тестов задач (None без trace), число пройденных тестов
+        и пройденных с трассировкой
+    """
+    backend = create_backend(name, max_workers=workers) if name == 'pool' else create_backend(name)
+    backend.warm_up()
+    limits = ExecutionLimits(memory_limit=512 * 1024 * 1024, cpu_time=10)
+
+    grading_times = []
+    passed = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = backend.run_many(jobs, limits)
+        grading_times.append(time.perf_counter() - start)
+        passed = sum(1 for result in results if result.passed)
+
+    trace_time: Optional[float] = None
+    trace_passed = 0
+    if trace:
+        # Первый тест каждой задачи - как запуск в окне визуализации
+        first_jobs = list({code: (code, inputs, expected) for code, inputs, expected in reversed(jobs)}.values())
+        start = time.perf_counter()
+        with _quiet_stdout():
+            for code, inputs, expected_output in first_jobs:
+                result = backend.run(code, inputs, limits, trace=True, expected_output=expected_output)
+                result.executor.steps.close()
+                trace_passed += bool(result.passed)
+        trace_time = time.perf_counter() - start
+
+    return {
+        'backend': name,
+        'grading_time': min(grading_times),
+        'trace_time': trace_time,
+        'trace_passed': trace_passed,
+        'passed': passed,
+        'total': len(jobs),
+    }
+
+
+def pool_time_per_test(repeat: int, workers: int) -> float:
+    """Лучшее время проверки одного теста бэкендом 'pool', мс"""
+    jobs = load_jobs()
+    stats = benchmark_backend('pool', jobs, repeat, workers, trace=False)
+    return stats['grading_time'] / len(jobs) * 1000
+
+
+def gui_main_time_per_test(repeat: int, workers: int) -> Optional[float]:
+    """
+    Время теста бэкенда 'pool' в процессе с главным модулем приложения, мс
+
+    Returns:
+        None, если замер не удался (например, не установлен PyQt6)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, 'gui_main.py')
+        with open(script, 'w', encoding='utf-8') as f:
+            f.write(GUI_MAIN_SCRIPT.format(root=PROJECT_ROOT, repeat=repeat, workers=workers))
+        completed = subprocess.run([sys.executable, script], capture_output=True, text=True)
+    lines = completed.stdout.split()
+    if completed.returncode != 0 or not lines:
+        print(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+              f"Код завершения {completed.returncode}")
+        return None
+    return float(lines[-1])
+
+
+@contextlib.contextmanager
+def _quiet_stdout():
+    """Скрытие вывода программ, который исполнитель дублирует в консоль (и в рабочих процессах)"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов выполнения")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS),
+                        help="Бэкенды для сравнения")
+    parser.add_argument('--repeat', type=int, default=3, help="Повторов проверки (берется лучшее время)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Процессов бэкенда 'pool'")
+    parser.add_argument('--no-trace', action='store_true', help="Не замерять трассировку")
+    parser.add_argument('--no-gui-main', action='store_true',
+                        help="Не замерять 'pool' с главным модулем приложения")
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs()
+    # Шаблонный процесс forkserver наследует stdout при запуске, а от него -
+    # процессы трассировки, дублирующие вывод программ в консоль
+    with _quiet_stdout():
+        create_backend('subprocess').warm_up()
+    print(f"Тестов: {len(jobs)}, задач: {len({job[0] for job in jobs})}, повторов: {args.repeat}")
+    print(f"{'Бэкенд':<12}{'Проверка, с':>14}{'На тест, мс':>14}{'Трассировка, с':>17}{'Пройдено':>11}"
+          f"{'С трассировкой':>16}")
+    pool_time = None
+    for name in args.backends:
+        stats = benchmark_backend(name, jobs, args.repeat, args.workers, not args.no_trace)
+        if name == 'pool':
+            pool_time = stats['grading_time'] / len(jobs) * 1000
+        if stats['trace_time'] is not None:
+            trace_time = f"{stats['trace_time']:.3f}"
+            trace_passed = f"{stats['trace_passed']}/{len({job[0] for job in jobs})}"
+        else:
+            trace_time = trace_passed = '-'
+        print(f"{name:<12}{stats['grading_time']:>14.3f}{stats['grading_time'] / len(jobs) * 1000:>14.2f}"
+              f"{trace_time:>17}{stats['passed']:>6}/{stats['total']}{trace_passed:>16}")
+
+    if pool_time is not None and not args.no_gui_main:
+        gui_time = gui_main_time_per_test(args.repeat, args.workers)
+        if gui_time is None:
+            print("Замер 'pool' с главным модулем GUI не удался")
+            return 0
+        print(f"pool с главным модулем GUI: {gui_time:.2f} мс на тест")
+        if gui_time > pool_time * GUI_MAIN_SLOWDOWN:
+            print(f"Процессы тестов медленнее в {gui_time / pool_time:.1f} раза: "
+                  f"похоже, они заново выполняют главный модуль")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
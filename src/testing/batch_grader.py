@@ -0,0 +1,270 @@
+"""
+Пакетная проверка решений класса без графического интерфейса
+
+Запуск:
+    python -m src.testing.batch_grader <папка с решениями> --task "Факториал"
+
+Все решения задачи проверяются через общий пул процессов тестов.
+Результат каждого решения сразу дописывается в файл состояния, поэтому
+прерванную проверку можно запустить снова: решения, уже проверенные
+для этой задачи (по хешу содержимого файла), повторно не выполняются.
+"""
+import os
+import sys
+import csv
+import json
+import fnmatch
+import hashlib
+import argparse
+from typing import List, Dict, Any, Tuple, Optional
+
+from src.core.security import security_manager
+from src.executor.backends import BACKENDS
+from src.testing.test_runner import TestRunner, TestCase
+
+
+# Файл с тестами задач по умолчанию
+DEFAULT_TESTS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'tasks_tests.json')
+
+# Имена файлов в папке отчета
+STATE_FILE = 'grading_state.jsonl'
+REPORT_JSON = 'report.json'
+REPORT_CSV = 'report.csv'
+
+# Столбцы CSV отчета (одна строка на тест решения)
+REPORT_COLUMNS = ['file', 'hash', 'theme', 'task', 'test_number', 'status', 'time', 'error']
+
+
+def load_task_tests(tests_file: str, task_name: str, theme: Optional[str] = None) -> Tuple[str, List[TestCase]]:
+    """
+    Загрузка тестов задачи из файла тестов
+
+    Args:
+        tests_file: Путь к tasks_tests.json
+        task_name: Название задачи
+        theme: Тема задачи (нужна, если задача с таким названием есть в нескольких темах)
+
+    Returns:
+        Кортеж (тема, список тестов)
+    """
+    with open(tests_file, 'r', encoding='utf-8') as f:
+        tests_data = json.load(f)
+
+    themes = [name for name, tasks in tests_data.items()
+              if task_name in tasks and (theme is None or name == theme)]
+    if not themes:
+        raise ValueError(f"Задача не найдена: {task_name}")
+    if len(themes) > 1:
+        raise ValueError(f"Задача '{task_name}' есть в нескольких темах ({', '.join(themes)}) - укажите --theme")
+
+    task_data = tests_data[themes[0]][task_name]
+    test_cases = [
+        TestCase(
+            inputs=test['inputs'],
+            expected_output=test['expected_output'],
+            description=test['description']
+        )
+        for test in task_data['test_cases']
+    ]
+    return themes[0], test_cases
+
+
+def find_submissions(directory: str, pattern: str = '*.py') -> List[str]:
+    """Файлы решений в папке (без вложенных папок), по алфавиту"""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if fnmatch.fnmatch(name, pattern) and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def read_submission(path: str) -> Tuple[str, str]:
+    """
+    Чтение решения
+
+    Returns:
+        Кортеж (хеш содержимого, исходный код)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha256(data).hexdigest(), data.decode('utf-8-sig', errors='replace')
+
+
+def load_state(state_path: str) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    """
+    Чтение файла состояния: (хеш решения, тема, задача) -> запись с результатами
+
+    Задачи с одним названием могут быть в разных темах, поэтому записи без
+    темы не используются. Недописанная последняя строка (проверку прервали
+    во время записи) пропускается.
+    """
+    state: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    if not os.path.exists(state_path):
+        return state
+    with open(state_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'theme' in record:
+                state[(record['hash'], record['theme'], record['task'])] = record
+    return state
+
+
+def grade(submissions_dir: str, task_name: str, theme: Optional[str] = None,
+          tests_file: str = DEFAULT_TESTS_FILE, output_dir: Optional[str] = None,
+          workers: Optional[int] = None, pattern: str = '*.py',
+          backend: str = 'pool') -> List[Dict[str, Any]]:
+    """
+    Проверка всех решений папки тестами задачи
+
+    Args:
+        submissions_dir: Папка с файлами решений
+        task_name: Название задачи из файла тестов
+        theme: Тема задачи
+        tests_file: Путь к файлу тестов
+        output_dir: Папка для отчета и файла состояния (по умолчанию <папка>/report)
+        workers: Сколько тестов выполнять одновременно (по умолчанию - число ядер)
+        pattern: Шаблон имен файлов решений
+        backend: Бэкенд выполнения тестов
+
+    Returns:
+        Строки отчета (по одной на тест решения)
+    """
+    theme, test_cases = load_task_tests(tests_file, task_name, theme)
+    output_dir = output_dir or os.path.join(submissions_dir, 'report')
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, STATE_FILE)
+    state = load_state(state_path)
+
+    submissions = []
+    for path in find_submissions(submissions_dir, pattern):
+        file_hash, code = read_submission(path)
+        submissions.append((os.path.basename(path), file_hash, code))
+
+    # Одинаковые файлы проверяются один раз
+    pending: Dict[str, Tuple[str, str]] = {}
+    for name, file_hash, code in submissions:
+        if (file_hash, theme, task_name) not in state and file_hash not in pending:
+            pending[file_hash] = (name, code)
+
+    print(f"Задача: {theme} / {task_name}, тестов: {len(test_cases)}")
+    graded = sum(1 for _, file_hash, _ in submissions if (file_hash, theme, task_name) in state)
+    print(f"Решений: {len(submissions)}, уже проверено: {graded}, к проверке: {len(pending)}")
+
+    if pending:
+        runner = TestRunner(security_manager)
+        runner.backend = backend
+        runner.max_workers = workers or os.cpu_count() or 1
+        hashes = list(pending)
+        done = 0
+
+        with open(state_path, 'a', encoding='utf-8') as state_file:
+            if _has_partial_line(state_path):
+                # Недописанная строка прерванной проверки не должна склеиться с новой записью
+                state_file.write('\n')
+
+            def on_complete(index: int, results: Dict[str, Any]):
+                nonlocal done
+                file_hash = hashes[index]
+                record = {
+                    'hash': file_hash,
+                    'theme': theme,
+                    'task': task_name,
+                    'file': pending[file_hash][0],
+                    'passed': results['passed'],
+                    'total': results['total'],
+                    'tests': [_test_record(result) for result in results['test_results']],
+                }
+                state[(file_hash, theme, task_name)] = record
+                # Запись сразу попадает на диск - прерванная проверка ее не потеряет
+                state_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                state_file.flush()
+                done += 1
+                print(f"[{done}/{len(hashes)}] {record['file']}: {record['passed']}/{record['total']}")
+
+            runner.run_batch([pending[file_hash][1] for file_hash in hashes], test_cases, on_complete)
+
+    rows = []
+    for name, file_hash, _ in submissions:
+        for test in state[(file_hash, theme, task_name)]['tests']:
+            rows.append({'file': name, 'hash': file_hash, 'theme': theme, 'task': task_name, **test})
+    _write_report(output_dir, rows)
+
+    solved = sum(1 for _, file_hash, _ in submissions if _is_solved(state[(file_hash, theme, task_name)]))
+    print(f"Решили задачу: {solved}/{len(submissions)}. Отчет: {output_dir}")
+    return rows
+
+
+def _has_partial_line(path: str) -> bool:
+    """Оканчивается ли файл недописанной строкой (без перевода строки)"""
+    with open(path, 'rb') as f:
+        if f.seek(0, os.SEEK_END) == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+
+def _test_record(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись теста для отчета: статус, время и ошибка"""
+    if result['passed']:
+        status = 'passed'
+    elif result.get('error'):
+        status = 'error'
+    else:
+        status = 'failed'
+    return {
+        'test_number': result['test_number'],
+        'status': status,
+        'time': round(result.get('time', 0.0), 6),
+        # У неверного ответа - первая различающаяся строка вывода
+        'error': result.get('error') or result.get('mismatch') or '',
+    }
+
+
+def _is_solved(record: Dict[str, Any]) -> bool:
+    """Прошло ли решение все тесты"""
+    return record['total'] > 0 and record['passed'] == record['total']
+
+
+def _write_report(output_dir: str, rows: List[Dict[str, Any]]):
+    """Запись отчета в JSON и CSV"""
+    with open(os.path.join(output_dir, REPORT_JSON), 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, REPORT_CSV), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Пакетная проверка решений задачи")
+    parser.add_argument('submissions_dir', help="Папка с файлами решений")
+    parser.add_argument('--task', required=True, help="Название задачи из файла тестов")
+    parser.add_argument('--theme', help="Тема задачи (если название встречается в нескольких темах)")
+    parser.add_argument('--tests', default=DEFAULT_TESTS_FILE, help="Файл тестов задач")
+    parser.add_argument('--output', help="Папка отчета (по умолчанию <папка решений>/report)")
+    parser.add_argument('--workers', type=int, help="Число одновременно выполняемых тестов")
+    parser.add_argument('--pattern', default='*.py', help="Шаблон имен файлов решений")
+    parser.add_argument('--backend', default='pool', choices=sorted(BACKENDS),
+                        help="Бэкенд выполнения тестов")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.submissions_dir):
+        print(f"Папка не найдена: {args.submissions_dir}")
+        return 1
+    try:
+        grade(args.submissions_dir, args.task, args.theme, args.tests, args.output,
+              args.workers, args.pattern, args.backend)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("Проверка прервана - при повторном запуске она продолжится")
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
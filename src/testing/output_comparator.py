@@ -0,0 +1,137 @@
+from typing import Optional
+
+
+# Сколько символов строки показывать в описании расхождения
+_LINE_PREVIEW = 80
+
+
+class OutputMismatch(Exception):
+    """Вывод решения разошелся с ожидаемым - тест прерывается"""
+    pass
+
+
+class OutputComparator:
+    """
+    Потоковое сравнение вывода решения с ожидаемым
+
+    Заменяет буфер вывода (print(..., file=comparator)): каждая запись
+    сразу сверяется с ожидаемым текстом, а вывод не накапливается.
+    Как только вывод разошелся с ожидаемым или превысил его длину больше
+    чем на margin символов, запись бросает OutputMismatch, и тест
+    завершается, не дожидаясь конца программы.
+
+    Результат совпадает со сравнением actual.strip() == expected:
+    пробельные символы в начале вывода пропускаются, а в конце
+    откладываются, пока за ними не последует остальной вывод.
+    """
+
+    def __init__(self, expected: str, margin: int = 1000):
+        """
+        Args:
+            expected: Ожидаемый вывод (без пробельных символов по краям)
+            margin: На сколько символов вывод может быть длиннее ожидаемого
+        """
+        self.expected = expected
+        self.limit = len(expected) + margin
+        # Описание первого расхождения (None - расхождений нет)
+        self.mismatch: Optional[str] = None
+        self._position = 0  # Сколько символов ожидаемого вывода совпало
+        self._written = 0
+        self._started = False
+        self._pending_space = ''
+        self._diverged = ''
+
+    def write(self, text: str) -> int:
+        """Сверка очередной части вывода"""
+        if self.mismatch is not None:
+            # Программа перехватила исключение и продолжила печатать
+            raise OutputMismatch(self.mismatch)
+
+        self._written += len(text)
+        if self._written > self.limit:
+            self._fail(self._pending_space + text,
+                       f"Вывод длиннее ожидаемого (больше {self.limit} символов)")
+
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return 0
+            self._started = True
+
+        body = text.rstrip()
+        if not body:
+            self._pending_space += text
+            return len(text)
+
+        chunk = self._pending_space + body
+        self._pending_space = text[len(body):]
+        end = self._position + len(chunk)
+        if self.expected[self._position:end] != chunk:
+            self._fail(chunk)
+        self._position = end
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def finish(self) -> bool:
+        """
+        Проверка после завершения программы
+
+        Returns:
+            True если вывод совпал с ожидаемым целиком
+        """
+        if self.mismatch is None and self._position < len(self.expected):
+            # Вывод оборвался: расхождение - в первой недостающей строке
+            self._describe(self._pending_space)
+        return self.mismatch is None
+
+    def getvalue(self) -> str:
+        """Вывод решения: совпавшая часть и часть, на которой нашлось расхождение"""
+        return self.expected[:self._position] + self._diverged
+
+    def _fail(self, chunk: str, reason: Optional[str] = None):
+        """Запоминание расхождения и прерывание теста"""
+        self._describe(chunk[:self.limit - self._position], reason)
+        raise OutputMismatch(self.mismatch)
+
+    def _describe(self, chunk: str, reason: Optional[str] = None):
+        """Описание первой различающейся строки вывода"""
+        self._diverged = chunk
+        if self._position == len(self.expected) and chunk[:1].isspace():
+            # Ожидаемый вывод совпал целиком, дальше - лишние строки
+            leading_space = chunk[:len(chunk) - len(chunk.lstrip())]
+            line_number = self.expected.count('\n') + 1 + max(1, leading_space.count('\n'))
+            extra_line = chunk.strip().split('\n', 1)[0]
+            description = f"Строка {line_number}: ожидалось '' (лишний вывод), получено '{_preview(extra_line)}'"
+            self.mismatch = f"{reason}. {description}" if reason else description
+            return
+
+        expected_rest = self.expected[self._position:]
+        common = 0
+        for expected_char, actual_char in zip(expected_rest, chunk):
+            if expected_char != actual_char:
+                break
+            common += 1
+        offset = self._position + common
+        if common == len(chunk):
+            # Вывод закончился раньше: пропускаем переводы строк до недостающего текста
+            while offset < len(self.expected) and self.expected[offset].isspace():
+                offset += 1
+        actual = self.expected[:self._position] + chunk
+
+        line_number = self.expected.count('\n', 0, offset) + 1
+        line_start = self.expected.rfind('\n', 0, offset) + 1
+        expected_line = self.expected[line_start:].split('\n', 1)[0]
+        actual_line = actual[line_start:].split('\n', 1)[0]
+
+        description = (f"Строка {line_number}: ожидалось '{_preview(expected_line)}', "
+                       f"получено '{_preview(actual_line)}'")
+        self.mismatch = f"{reason}. {description}" if reason else description
+
+
+def _preview(line: str) -> str:
+    """Строка для описания расхождения (длинная - с многоточием)"""
+    if len(line) > _LINE_PREVIEW:
+        return line[:_LINE_PREVIEW] + '...'
+    return line
@@ -1,9 +1,7 @@
-import sys
-import io
-import contextlib
-from typing import List, Dict, Any, Tuple
-import json
-import traceback
+import os
+from typing import List, Dict, Any, Optional, Callable
+
+from src.executor.backends import ExecutionBackend, ExecutionLimits, ExecutionResult, create_backend
 
 
 class TestCase:
@@ -16,122 +14,117 @@ class TestCase:
 class TestRunner:
     def __init__(self, security_manager):
         self.security_manager = security_manager
-        self.max_execution_time = 5  # секунд
+        # Лимит операций (выполненных строк) на тест: в отличие от времени
+        # не зависит от загрузки машины
+        self.max_operations = 1000000
+        # Запасной лимит времени для кода, который долго работает внутри
+        # встроенных функций (строки кода при этом не выполняются)
+        self.max_execution_time = 30  # секунд
+        # На сколько символов вывод может превысить ожидаемый, прежде чем тест прервется
+        self.output_margin = 1000
+        # Бэкенд выполнения тестов (см. src.executor.backends): 'pool' - параллельно,
+        # каждый тест в своем процессе; max_workers - сколько одновременно
+        # (на серверах с большим числом ядер можно больше)
+        self.backend = 'pool'
+        self.max_workers = min(4, os.cpu_count() or 1)
+        # Ограничения ядра для процессов тестов: память (байт) и процессорное время теста (секунд)
+        self.memory_limit: Optional[int] = 512 * 1024 * 1024
+        self.max_cpu_time: Optional[float] = 10
+        self._backend: Optional[ExecutionBackend] = None
 
     def run_tests(self, code: str, test_cases: List[TestCase]) -> Dict[str, Any]:
-        """Запускает код против набора тестов"""
-        results = {
-            'passed': 0,
-            'total': len(test_cases),
-            'test_results': [],
-            'success': False,
-            'error': None
-        }
-
-        for i, test_case in enumerate(test_cases):
-            try:
-                result = self._run_single_test(code, test_case, i + 1)
-                results['test_results'].append(result)
-                if result['passed']:
-                    results['passed'] += 1
-            except Exception as e:
-                results['test_results'].append({
-                    'test_number': i + 1,
-                    'passed': False,
-                    'error': str(e),
-                    'description': test_case.description
-                })
-
-        results['success'] = results['passed'] == results['total']
-        return results
-
-    def _run_single_test(self, code: str, test_case: TestCase, test_number: int) -> Dict[str, Any]:
-        """Запускает один тест"""
-        # Создаем mock для input()
-        input_iterator = iter(test_case.inputs)
-
-        def mock_input(prompt=""):
-            try:
-                value = next(input_iterator)
-                return value
-            except StopIteration:
-                raise EOFError("No more input available")
-
-        # Перехватываем stdout
-        captured_output = io.StringIO()
-
-        # Создаем безопасное окружение
-        safe_globals = {
-            '__builtins__': {
-                'print': lambda *args, **kwargs: print(*args, file=captured_output, **kwargs),
-                'input': mock_input,
-                'len': len,
-                'range': range,
-                'int': int,
-                'float': float,
-                'str': str,
-                'list': list,
-                'dict': dict,
-                'set': set,
-                'tuple': tuple,
-                'bool': bool,
-                'abs': abs,
-                'max': max,
-                'min': min,
-                'sum': sum,
-                'sorted': sorted,
-                'reversed': reversed,
-                'enumerate': enumerate,
-                'zip': zip,
-                'map': map,
-                'filter': filter,
-            }
-        }
-
-        try:
-            # Выполняем код с ограничениями
-            with self._time_limit(self.max_execution_time):
-                exec(code, safe_globals)
-
-            # Получаем вывод
-            actual_output = captured_output.getvalue().strip()
-
-            # Сравниваем результаты
-            passed = actual_output == test_case.expected_output
-
-            return {
-                'test_number': test_number,
-                'passed': passed,
-                'input': test_case.inputs,
-                'expected_output': test_case.expected_output,
-                'actual_output': actual_output,
-                'description': test_case.description,
-                'error': None
-            }
-
-        except Exception as e:
-            return {
-                'test_number': test_number,
-                'passed': False,
-                'input': test_case.inputs,
-                'expected_output': test_case.expected_output,
-                'actual_output': captured_output.getvalue().strip(),
-                'description': test_case.description,
-                'error': str(e)
-            }
-
-    @contextlib.contextmanager
-    def _time_limit(self, seconds):
-        """Ограничение времени выполнения"""
-        import signal
-
-        def timeout_handler(signum, frame):
-            raise TimeoutError(f"Код выполнялся дольше {seconds} секунд")
-
-        old_handler = signal.signal(signal.SIGALRM, timeout_handler)
-        signal.alarm(seconds)
-        try:
-            yield
-        finally:
-            signal.alarm(0)
-            signal.signal(signal.SIGALRM, old_handler)
+        """
+        Запускает код против набора тестов
+
+        С бэкендом 'pool' каждый тест выполняется в своем процессе, и набор
+        выполняется примерно за время самого долгого теста.
+        """
+        return self.run_batch([code], test_cases)[0]
+
+    def run_batch(self, codes: List[str], test_cases: List[TestCase],
+                  on_complete: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """
+        Проверка нескольких решений одним набором тестов
+
+        Тесты всех решений передаются бэкенду одним набором, поэтому
+        заняты все max_workers процессов, даже если тестов у задачи меньше.
+
+        Args:
+            codes: Исходные коды решений
+            test_cases: Тесты задачи
+            on_complete: Вызывается с номером решения и его результатами
+                (как у run_tests), как только проверены все его тесты
+
+        Returns:
+            Результаты run_tests по решениям
+        """
+        if not test_cases:
+            summaries = [_summarize([]) for _ in codes]
+            if on_complete is not None:
+                for index, summary in enumerate(summaries):
+                    on_complete(index, summary)
+            return summaries
+
+        jobs = [(code, test_case.inputs, test_case.expected_output) for code in codes for test_case in test_cases]
+        remaining = [len(test_cases)] * len(codes)
+        test_results: List[List[Optional[Dict[str, Any]]]] = [[None] * len(test_cases) for _ in codes]
+
+        def on_result(job_index: int, result: ExecutionResult):
+            index, test_index = divmod(job_index, len(test_cases))
+            test_results[index][test_index] = _test_result(test_cases[test_index], test_index + 1, result)
+            remaining[index] -= 1
+            if remaining[index] == 0 and on_complete is not None:
+                on_complete(index, _summarize(test_results[index]))
+
+        self._get_backend().run_many(jobs, self._limits(), on_result)
+        return [_summarize(results) for results in test_results]
+
+    def _limits(self) -> ExecutionLimits:
+        """Ограничения запуска одного теста"""
+        return ExecutionLimits(
+            max_operations=self.max_operations,
+            time_limit=self.max_execution_time,
+            memory_limit=self.memory_limit,
+            cpu_time=self.max_cpu_time,
+            output_margin=self.output_margin
+        )
+
+    def _get_backend(self) -> ExecutionBackend:
+        """Бэкенд выполнения с текущими настройками"""
+        if self._backend is None or self._backend.name != self.backend:
+            options = {'max_workers': self.max_workers} if self.backend == 'pool' else {}
+            self._backend = create_backend(self.backend, **options)
+        elif hasattr(self._backend, 'max_workers'):
+            self._backend.max_workers = self.max_workers
+        return self._backend
+
+    def warm_up(self):
+        """Подготовка бэкенда тестов заранее (например, при открытии задачи)"""
+        self._get_backend().warm_up()
+
+
+def _test_result(test_case: TestCase, test_number: int, result: ExecutionResult) -> Dict[str, Any]:
+    """Результат теста из результата запуска"""
+    return {
+        'test_number': test_number,
+        'passed': bool(result.passed),
+        'input': test_case.inputs,
+        'expected_output': test_case.expected_output,
+        'actual_output': result.output,
+        'description': test_case.description,
+        'error': result.error,
+        'mismatch': result.mismatch,
+        'time': result.time
+    }
+
+
+def _summarize(test_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Сводка результатов тестов одного решения"""
+    passed = sum(1 for result in test_results if result['passed'])
+    return {
+        'passed': passed,
+        'total': len(test_results),
+        'test_results': test_results,
+        'success': passed == len(test_results),
+        'error': None
+    }
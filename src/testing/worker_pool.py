@@ -0,0 +1,240 @@
+import sys
+import time
+import types
+import signal
+import marshal
+import contextlib
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core.security import SecurityManager
+
+
+# Модули, загружаемые в шаблонный процесс: тесты порождаются копиями
+# шаблона, и импорт не повторяется в каждом тесте. Главный модуль ('__main__')
+# forkserver не предзагружает (не получает его путь) - см. hidden_main_module
+PRELOAD_MODULES = ['src.executor.backends', 'src.executor.process_executor'] + \
+    sorted(SecurityManager.ALLOWED_MODULES)
+
+
+class TestWorkerPool:
+    """
+    Пул изолированных процессов для параллельного запуска тестов
+
+    Каждый тест выполняется в отдельном дочернем процессе, который
+    порождается копированием (fork) заранее подготовленного шаблона -
+    процесса forkserver с загруженными модулями исполнителя тестов и
+    разрешенными модулями. Запуск теста занимает миллисекунды, а
+    состояние одного теста не переходит в другой.
+
+    В процессе теста действуют ограничения ядра: адресного пространства
+    (RLIMIT_AS) и процессорного времени (RLIMIT_CPU: мягкий предел
+    прерывает тест исключением, жесткий - завершает процесс, даже если
+    он занят во встроенной функции). Родительский процесс дополнительно
+    следит за временем по часам. Одновременно выполняется не больше
+    max_workers тестов.
+
+    Где forkserver недоступен (Windows), процессы запускаются через 'spawn'.
+    """
+
+    def __init__(self, max_workers: int = 4, start_method: Optional[str] = None):
+        """
+        Args:
+            max_workers: Наибольшее число одновременно выполняемых тестов
+            start_method: Способ запуска процессов (None - forkserver, если доступен)
+        """
+        self.max_workers = max(1, max_workers)
+        self._context = sandbox_context(start_method)
+
+    def warm_up(self):
+        """Запуск шаблонного процесса заранее, чтобы первый запуск тестов его не ждал"""
+        if self._context.get_start_method() == 'forkserver':
+            from multiprocessing import forkserver
+            forkserver.ensure_running()
+
+    def run(self, tasks: List[Any],
+            on_result: Optional[Callable[[int, Any], None]] = None) -> List[Any]:
+        """
+        Выполнение задач тестов в дочерних процессах
+
+        Ограничения памяти и времени берутся из ExecutionLimits задачи;
+        время по часам (time_limit) отсчитывает родительский процесс.
+
+        Args:
+            tasks: Задачи (код, ввод, ограничения, ожидаемый вывод, объект кода
+                в формате marshal или None)
+            on_result: Вызывается с номером задачи и результатом по мере завершения
+
+        Returns:
+            Результаты (ExecutionResult) в порядке задач
+        """
+        results: List[Any] = [None] * len(tasks)
+        pending = deque(range(len(tasks)))
+        # Соединение процесса теста -> (номер задачи, процесс, время запуска)
+        running: Dict[Any, Tuple[int, Any, float]] = {}
+
+        def finish(connection, result):
+            index, process, _ = running.pop(connection)
+            connection.close()
+            if process.is_alive():
+                process.kill()
+            process.join()
+            results[index] = result
+            if on_result is not None:
+                on_result(index, result)
+
+        try:
+            while pending or running:
+                while pending and len(running) < self.max_workers:
+                    index = pending.popleft()
+                    connection, child_connection = self._context.Pipe(duplex=False)
+                    process = self._context.Process(
+                        target=_run_test,
+                        args=(child_connection, tasks[index]),
+                        daemon=True)
+                    with hidden_main_module():
+                        process.start()
+                    child_connection.close()
+                    running[connection] = (index, process, time.monotonic())
+
+                deadlines = [started + _time_limit(tasks[index])
+                             for index, _, started in running.values() if _time_limit(tasks[index]) is not None]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                for connection in wait(list(running), timeout=timeout):
+                    index, process, started = running[connection]
+                    try:
+                        result = connection.recv()
+                    except (EOFError, OSError):
+                        process.join()
+                        result = _failed_result(tasks[index], _exit_reason(tasks[index], process.exitcode),
+                                                time.monotonic() - started)
+                    finish(connection, result)
+
+                now = time.monotonic()
+                for connection, (index, _, started) in list(running.items()):
+                    limit = _time_limit(tasks[index])
+                    if limit is not None and now >= started + limit:
+                        finish(connection, _failed_result(
+                            tasks[index], f"Превышено время выполнения ({limit:g} с)", now - started))
+        finally:
+            # Прерванный запуск (например, KeyboardInterrupt) не оставляет процессов
+            for connection in list(running):
+                index, process, _ = running.pop(connection)
+                connection.close()
+                process.kill()
+                process.join()
+
+        return results
+
+
+@contextlib.contextmanager
+def hidden_main_module():
+    """
+    Запуск процесса без повторного выполнения главного модуля
+
+    Процесс 'spawn' или forkserver перед вызовом функции заново выполняет
+    главный модуль родителя - у приложения это src/main.py с импортом PyQt6
+    и окон (десятки миллисекунд на каждый тест). Функциям процессов тестов
+    и исполнителя он не нужен, поэтому на время start() multiprocessing
+    видит пустой главный модуль. Их аргументы не должны ссылаться на
+    объекты из главного модуля.
+    """
+    main_module = sys.modules['__main__']
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main_module
+
+
+def sandbox_context(start_method: Optional[str] = None):
+    """
+    Контекст multiprocessing для процессов тестов и исполнителя
+
+    forkserver (если есть) - шаблонный процесс запускается как новый
+    интерпретатор и не наследует потоков Qt, а процессы копируются из
+    него с уже загруженными модулями. Иначе - 'spawn'.
+    """
+    if start_method is None and 'forkserver' in multiprocessing.get_all_start_methods():
+        start_method = 'forkserver'
+    context = multiprocessing.get_context(start_method or 'spawn')
+    if context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload(PRELOAD_MODULES)
+    return context
+
+
+def _time_limit(task: Tuple[Any, ...]) -> Optional[float]:
+    """Время на задачу по часам, секунд (None - без ограничения)"""
+    return task[2].time_limit
+
+
+def _exit_reason(task: Tuple[Any, ...], exitcode: Optional[int]) -> str:
+    """Описание завершения процесса теста, не приславшего результат"""
+    cpu_time = task[2].cpu_time
+    if cpu_time is not None and exitcode in (-signal.SIGKILL, -getattr(signal, 'SIGXCPU', 0)):
+        # Жесткий предел RLIMIT_CPU: тест не вышел из встроенной функции
+        return f"Превышено процессорное время теста ({cpu_time:g} с)"
+    return f"Процесс теста аварийно завершился (код {exitcode})"
+
+
+def _failed_result(task: Tuple[Any, ...], error: str, elapsed: float):
+    """Результат теста, процесс которого пришлось завершить"""
+    from src.executor.backends import ExecutionResult
+    expected_output = task[3]
+    return ExecutionResult(error=error, time=elapsed,
+                           passed=False if expected_output is not None else None)
+
+
+def _run_test(connection, task: Tuple[Any, ...]):
+    """Точка входа процесса теста: выполнение одного теста"""
+    # Модуль уже загружен в шаблон; импорт здесь - из-за взаимной зависимости модулей
+    from dataclasses import replace
+    from src.executor.backends import InProcessBackend
+
+    code, inputs, limits, expected_output, marshalled = task
+    # Код скомпилирован родительским процессом - разбор и компиляция не повторяются
+    code_object = marshal.loads(marshalled) if marshalled is not None else None
+    _limit_memory(limits.memory_limit)
+    _limit_cpu_time(limits.cpu_time)
+
+    # Время по часам контролирует родительский процесс, процессорное - ядро
+    limits = replace(limits, time_limit=None)
+    connection.send(InProcessBackend().execute(code, inputs, limits, expected_output, code_object))
+    connection.close()
+
+
+def _limit_memory(limit: Optional[int]):
+    """Ограничение адресного пространства процесса теста"""
+    if limit is None:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _limit_cpu_time(seconds: Optional[float]):
+    """
+    Ограничение процессорного времени процесса теста
+
+    По мягкому пределу приходит SIGXCPU - тест прерывается исключением.
+    Через секунду после него жесткий предел завершает процесс: обработчик
+    сигнала не выполняется, пока идет долгий вызов встроенной функции.
+    """
+    if seconds is None:
+        return
+    try:
+        import resource
+
+        def cpu_time_exceeded(signum, frame):
+            raise TimeoutError(f"Превышено процессорное время теста ({seconds:g} с)")
+
+        signal.signal(signal.SIGXCPU, cpu_time_exceeded)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 1))
+    except (ImportError, AttributeError, ValueError, OSError):
+        pass
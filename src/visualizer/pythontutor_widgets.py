@@ -3,6 +3,8 @@ from PyQt6.QtCore import Qt, QPointF, QRectF
 from PyQt6.QtGui import QPen, QBrush, QColor, QFont, QPainterPath
 from typing import Any, Dict, List, Optional, Tuple
 
+from src.executor.value_preview import ValuePreview, preview_text
+
 
 class FrameWidget:
     """Виджет для отображения фрейма (области переменных)"""
@@ -77,7 +79,7 @@ class FrameWidget:
             connection_point = (dot_x + 6, dot_y + 3)  # Правый край точки
         else:
             # Простое значение - отображаем его
-            value_str = str(value)
+            value_str = preview_text(value)
             if len(value_str) > 15:
                 value_str = value_str[:12] + "..."
 
@@ -89,6 +91,13 @@ class FrameWidget:
             self.scene.addItem(value_text)
             self.elements.append(value_text)
 
+            if isinstance(value, ValuePreview):
+                # Большое значение сохранено превью - полное загружается по клику
+                indicator = LazyValueIndicator(value, self.x + self.width - 10, var_y + 10,
+                                               6, 6, QColor("#f39c12"), self.scene)
+                self.scene.addItem(indicator)
+                self.elements.append(indicator)
+
         self.variables[name] = {
             'value': value,
             'is_reference': is_reference,
@@ -192,7 +201,7 @@ class ObjectWidget:
             line_rect.setBrush(QBrush(QColor("#bdc3c7")))
 
             # Значение
-            value_str = str(items[i])
+            value_str = preview_text(items[i])
             if len(value_str) > 4:
                 value_str = value_str[:3] + ".."
 
@@ -259,7 +268,7 @@ class ObjectWidget:
             key_text.setFont(QFont("Arial", 8, QFont.Weight.Bold))
 
             # Значение
-            value_str = str(value)
+            value_str = preview_text(value)
             if len(value_str) > 8:
                 value_str = value_str[:6] + ".."
 
@@ -284,7 +293,7 @@ class ObjectWidget:
         obj_rect.setBrush(QBrush(QColor("#2ecc71")))
 
         # Значение
-        value_str = str(self.content)
+        value_str = preview_text(self.content)
         if len(value_str) > 10:
             value_str = value_str[:8] + ".."
 
@@ -374,7 +383,7 @@ class ObjectWidget:
                 self.elements.append(indicator)
             else:
                 # Простое значение
-                value_str = str(value)
+                value_str = preview_text(value)
                 if len(value_str) > 6:
                     value_str = value_str[:5] + ".."
                 value_color = QColor("#2c3e50")
@@ -466,7 +475,7 @@ class ObjectWidget:
                 self.elements.append(indicator)
             else:
                 # Простое значение
-                value_str = str(value)
+                value_str = preview_text(value)
                 if len(value_str) > 10:
                     value_str = value_str[:8] + ".."
                 value_color = QColor("#7f8c8d")
@@ -565,6 +574,10 @@ class PythonTutorScene(QGraphicsScene):
         self.object_start_x = 400
         self.object_start_y = 50
 
+        # Запуск долгих запросов вне потока GUI: run_in_background(request, on_done);
+        # задается окном, без него запросы выполняются сразу
+        self.run_in_background = None
+
         # Создаем заголовки секций
         self.create_section_headers()
 
@@ -602,69 +615,98 @@ class PythonTutorScene(QGraphicsScene):
             arrow.remove_from_scene()
         self.arrows.clear()
 
-    def update_visualization(self, variables: Dict[str, Any]):
-        """Обновление визуализации"""
+    def update_visualization(self, variables: Dict[str, Any], frames: Optional[Dict[int, Any]] = None):
+        """
+        Обновление визуализации
+
+        Args:
+            variables: Переменные модуля (глобальный фрейм)
+            frames: Кадры вызванных функций по глубине (StackFrame), если есть
+        """
         self.clear_all()
 
-        # Создаем глобальный фрейм
-        global_frame = FrameWidget(self, "Global frame", self.frame_start_x, self.frame_start_y)
-        self.frames["global"] = global_frame
+        # Глобальный фрейм, под ним кадры функций от внешнего к внутреннему
+        frame_list = [("Global frame", variables)]
+        for stack_frame in (frames or {}).values():
+            frame_list.append((stack_frame.function_name, stack_frame.variables))
 
         # Анализируем переменные
         complex_objects = {}
         object_counter = 0
+        # id(значение) -> obj_id: псевдонимы указывают на один объект (в том числе из разных фреймов)
+        seen_objects = {}
+
+        frame_y = self.frame_start_y
+        for frame_index, (frame_name, frame_vars) in enumerate(frame_list):
+            frame_widget = FrameWidget(self, frame_name, self.frame_start_x, frame_y)
+            self.frames["global" if frame_index == 0 else f"frame_{frame_index}"] = frame_widget
+
+            # Обрабатываем все переменные фрейма
+            for name, value in frame_vars.items():
+                if id(value) in seen_objects:
+                    # Переменная - псевдоним уже показанного объекта, рисуем еще одну стрелку
+                    obj_id = seen_objects[id(value)]
+                    connection_point = frame_widget.add_variable(name, value, is_reference=True)
+                    complex_objects[obj_id]['alias_points'].append(connection_point)
+                    continue
+
+                # Проверяем, является ли значение функцией
+                if callable(value) and hasattr(value, '__name__') and not isinstance(value, type):
+                    # Это пользовательская функция
+                    obj_id = f"obj_{object_counter}"
+                    complex_objects[obj_id] = {
+                        'name': name,
+                        'type': 'function',
+                        'content': value,
+                        'var_name': name
+                    }
+                    object_counter += 1
+
+                    # Добавляем переменную как ссылку
+                    connection_point = frame_widget.add_variable(name, value, is_reference=True)
+                    complex_objects[obj_id]['connection_point'] = connection_point
+                    complex_objects[obj_id]['alias_points'] = []
+                    seen_objects[id(value)] = obj_id
+
+                elif isinstance(value, (list, dict)):
+                    # Сложный объект - создаем ссылку
+                    obj_id = f"obj_{object_counter}"
+                    obj_type = 'list' if isinstance(value, list) else 'dict'
+                    complex_objects[obj_id] = {
+                        'name': name,
+                        'type': obj_type,
+                        'content': value,
+                        'var_name': name
+                    }
+                    object_counter += 1
+
+                    # Добавляем переменную как ссылку
+                    connection_point = frame_widget.add_variable(name, value, is_reference=True)
+                    complex_objects[obj_id]['connection_point'] = connection_point
+                    complex_objects[obj_id]['alias_points'] = []
+                    seen_objects[id(value)] = obj_id
+
+                elif hasattr(value, '__dict__') and not isinstance(value, (int, float, str, bool, type(None), type)):
+                    # Пользовательский объект (экземпляр класса)
+                    obj_id = f"obj_{object_counter}"
+                    complex_objects[obj_id] = {
+                        'name': name,
+                        'type': 'class_instance',
+                        'content': value,
+                        'var_name': name
+                    }
+                    object_counter += 1
+
+                    # Добавляем переменную как ссылку
+                    connection_point = frame_widget.add_variable(name, value, is_reference=True)
+                    complex_objects[obj_id]['connection_point'] = connection_point
+                    complex_objects[obj_id]['alias_points'] = []
+                    seen_objects[id(value)] = obj_id
+                else:
+                    # Простая переменная - отображаем значение
+                    frame_widget.add_variable(name, value, is_reference=False)
 
-        # Сначала обрабатываем все переменные
-        for name, value in variables.items():
-            # Проверяем, является ли значение функцией
-            if callable(value) and hasattr(value, '__name__') and not isinstance(value, type):
-                # Это пользовательская функция
-                obj_id = f"obj_{object_counter}"
-                complex_objects[obj_id] = {
-                    'name': name,
-                    'type': 'function',
-                    'content': value,
-                    'var_name': name
-                }
-                object_counter += 1
-
-                # Добавляем переменную как ссылку
-                connection_point = global_frame.add_variable(name, value, is_reference=True)
-                complex_objects[obj_id]['connection_point'] = connection_point
-
-            elif isinstance(value, (list, dict)):
-                # Сложный объект - создаем ссылку
-                obj_id = f"obj_{object_counter}"
-                obj_type = 'list' if isinstance(value, list) else 'dict'
-                complex_objects[obj_id] = {
-                    'name': name,
-                    'type': obj_type,
-                    'content': value,
-                    'var_name': name
-                }
-                object_counter += 1
-
-                # Добавляем переменную как ссылку
-                connection_point = global_frame.add_variable(name, value, is_reference=True)
-                complex_objects[obj_id]['connection_point'] = connection_point
-
-            elif hasattr(value, '__dict__') and not isinstance(value, (int, float, str, bool, type(None), type)):
-                # Пользовательский объект (экземпляр класса)
-                obj_id = f"obj_{object_counter}"
-                complex_objects[obj_id] = {
-                    'name': name,
-                    'type': 'class_instance',
-                    'content': value,
-                    'var_name': name
-                }
-                object_counter += 1
-
-                # Добавляем переменную как ссылку
-                connection_point = global_frame.add_variable(name, value, is_reference=True)
-                complex_objects[obj_id]['connection_point'] = connection_point
-            else:
-                # Простая переменная - отображаем значение
-                global_frame.add_variable(name, value, is_reference=False)
+            frame_y += frame_widget.height + 20
 
         # Теперь создаем объекты и стрелки
         for obj_id, obj_info in complex_objects.items():
@@ -706,6 +748,9 @@ class PythonTutorScene(QGraphicsScene):
                 arrow = ArrowWidget(self, connection_point, target_point)
                 self.arrows.append(arrow)
 
+                for alias_point in obj_info['alias_points']:
+                    self.arrows.append(ArrowWidget(self, alias_point, target_point))
+
 
 class NestedStructureTooltip(QGraphicsRectItem):
     """Всплывающее окно для отображения содержимого вложенных структур"""
@@ -774,7 +819,8 @@ class NestedStructureTooltip(QGraphicsRectItem):
                 row_bg.setPen(QPen(Qt.PenStyle.NoPen))
 
             # Индекс и значение
-            text = f"[{i}] = {str(item)[:20]}{'...' if len(str(item)) > 20 else ''}"
+            item_str = preview_text(item)
+            text = f"[{i}] = {item_str[:20]}{'...' if len(item_str) > 20 else ''}"
             item_text = QGraphicsTextItem(text, self)
             item_text.setPos(10, y_offset)
             item_text.setFont(QFont("Arial", 9))
@@ -808,7 +854,8 @@ class NestedStructureTooltip(QGraphicsRectItem):
 
             # Ключ и значение
             key_str = str(key)[:15] + ('...' if len(str(key)) > 15 else '')
-            value_str = str(value)[:20] + ('...' if len(str(value)) > 20 else '')
+            value_str = preview_text(value)
+            value_str = value_str[:20] + ('...' if len(value_str) > 20 else '')
             text = f"{key_str}: {value_str}"
 
             item_text = QGraphicsTextItem(text, self)
@@ -827,7 +874,7 @@ class NestedStructureTooltip(QGraphicsRectItem):
 
     def create_simple_value(self):
         """Простое отображение значения"""
-        value_str = str(self.content)
+        value_str = preview_text(self.content)
         if len(value_str) > 30:
             value_str = value_str[:27] + "..."
 
@@ -922,6 +969,36 @@ class HoverableNestedIndicator(QGraphicsRectItem):
         super().mousePressEvent(event)
 
 
+class LazyValueIndicator(HoverableNestedIndicator):
+    """Индикатор значения, сохраненного превью: полное значение загружается по клику"""
+
+    loading = False
+
+    def mousePressEvent(self, event):
+        """Загрузка полного значения (может потребовать повторного выполнения)"""
+        if isinstance(self.content, ValuePreview) and self.content.is_loadable and not self.loading:
+            run_in_background = getattr(self.parent_scene, 'run_in_background', None)
+            if self.content.full is not None or run_in_background is None:
+                self.on_value_loaded(self.content.load())
+            else:
+                # Повторное выполнение кода идет в рабочем потоке
+                self.loading = run_in_background(self.content.load, self.on_value_loaded)
+
+        super().mousePressEvent(event)
+
+    def on_value_loaded(self, full_value):
+        """Замена превью загруженным значением"""
+        self.loading = False
+        # Пока значение загружалось, индикатор мог быть убран со сцены
+        if full_value is None or self.scene() is None:
+            return
+        self.content = full_value
+        # Подсказка с превью заменяется подсказкой с полным значением
+        if self.tooltip:
+            self.tooltip.remove_from_scene()
+            self.tooltip = None
+
+
 class ClassInstanceWidget:
     """Виджет для отображения экземпляра класса"""
 
@@ -1008,7 +1085,7 @@ class ClassInstanceWidget:
                 self.elements.append(dot)
             else:
                 # Простое значение
-                value_str = str(attr_value)
+                value_str = preview_text(attr_value)
                 if len(value_str) > 12:
                     value_str = value_str[:10] + ".."
                 value_color = QColor("#7f8c8d")
@@ -0,0 +1,111 @@
+"""Пакетная проверка продолжается с места остановки по файлу состояния"""
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from src.testing.batch_grader import grade, load_state, STATE_FILE, REPORT_CSV
+
+
+TESTS = {
+    "Ввод": {
+        "Сумма": {
+            "test_cases": [
+                {"inputs": ["2", "3"], "expected_output": "5", "description": "2 + 3"},
+                {"inputs": ["10", "-4"], "expected_output": "6", "description": "10 - 4"},
+            ]
+        }
+    }
+}
+
+SUBMISSIONS = {
+    'correct.py': "a = int(input())\nb = int(input())\nprint(a + b)\n",
+    'wrong.py': "a = int(input())\nb = int(input())\nprint(a * b)\n",
+    # Тот же файл, что и correct.py: проверяется один раз
+    'copy.py': "a = int(input())\nb = int(input())\nprint(a + b)\n",
+}
+
+
+class BatchGraderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='batch_grader_test_')
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.tests_file = os.path.join(self.directory, 'tests.json')
+        with open(self.tests_file, 'w', encoding='utf-8') as f:
+            json.dump(TESTS, f, ensure_ascii=False)
+        self.submissions = os.path.join(self.directory, 'submissions')
+        os.mkdir(self.submissions)
+        for name, code in SUBMISSIONS.items():
+            self.write_submission(name, code)
+        self.report = os.path.join(self.directory, 'report')
+        self.state_path = os.path.join(self.report, STATE_FILE)
+
+    def write_submission(self, name: str, code: str):
+        with open(os.path.join(self.submissions, name), 'w', encoding='utf-8') as f:
+            f.write(code)
+
+    def grade(self):
+        """Проверка решений: (строки отчета, напечатанный текст)"""
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            rows = grade(self.submissions, "Сумма", tests_file=self.tests_file,
+                         output_dir=self.report, workers=2, backend='inprocess')
+        return rows, printed.getvalue()
+
+    def state_records(self):
+        """Записи, которые увидит следующий запуск проверки"""
+        return list(load_state(self.state_path).values())
+
+    def statuses(self, rows):
+        return {(row['file'], row['test_number']): row['status'] for row in rows}
+
+    def test_report(self):
+        rows, printed = self.grade()
+        self.assertEqual(self.statuses(rows), {
+            ('copy.py', 1): 'passed', ('copy.py', 2): 'passed',
+            ('correct.py', 1): 'passed', ('correct.py', 2): 'passed',
+            ('wrong.py', 1): 'failed', ('wrong.py', 2): 'failed',
+        })
+        self.assertEqual(len(self.state_records()), 2)
+        self.assertIn("Решили задачу: 2/3", printed)
+        with open(os.path.join(self.report, REPORT_CSV), encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 1 + len(rows))
+
+    def test_rerun_grades_nothing(self):
+        first_rows, _ = self.grade()
+        rows, printed = self.grade()
+        self.assertIn("уже проверено: 3, к проверке: 0", printed)
+        self.assertEqual(rows, first_rows)
+        self.assertEqual(len(self.state_records()), 2)
+
+    def test_resume_after_interruption(self):
+        self.grade()
+        records = self.state_records()
+        correct = next(record for record in records if record['file'] in ('correct.py', 'copy.py'))
+        # Проверку прервали после первого решения, во время записи второго
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(correct, ensure_ascii=False) + '\n')
+            f.write('{"hash": "')
+        self.write_submission('new.py', "print(int(input()) + int(input()))\n")
+
+        rows, printed = self.grade()
+        self.assertIn("уже проверено: 2, к проверке: 2", printed)
+        self.assertEqual(self.statuses(rows)[('wrong.py', 1)], 'failed')
+        self.assertEqual(self.statuses(rows)[('new.py', 2)], 'passed')
+        self.assertEqual(sorted(record['file'] for record in self.state_records()),
+                         sorted([correct['file'], 'wrong.py', 'new.py']))
+
+    def test_changed_file_is_graded_again(self):
+        self.grade()
+        self.write_submission('wrong.py', SUBMISSIONS['correct.py'].replace('a + b', 'b + a'))
+        rows, printed = self.grade()
+        self.assertIn("к проверке: 1", printed)
+        self.assertEqual(self.statuses(rows)[('wrong.py', 1)], 'passed')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Бэкенды выполнения записывают одинаковые шаги и дают одинаковые результаты"""
+import re
+import unittest
+
+from src.executor.backends import BACKENDS, ExecutionLimits, create_backend
+
+
+# Программы без значений, которые отличаются от запуска к запуску
+PROGRAMS = {
+    'loop_with_output': (
+        "total = 0\n"
+        "for i in range(4):\n"
+        "    total += i\n"
+        "    print(i, total)\n"
+    ),
+    'function_calls': (
+        "def square(n):\n"
+        "    result = n * n\n"
+        "    return result\n"
+        "values = []\n"
+        "for k in range(3):\n"
+        "    values.append(square(k))\n"
+        "data = {'values': values, 'pair': (1, 2)}\n"
+    ),
+    'input': "a = int(input())\nb = int(input())\nprint(a + b)\n",
+    'exception': "x = 1\ny = x / 0\n",
+}
+
+INPUTS = ['2', '3']
+
+
+def steps_of(result):
+    """Шаги трассировки: (строка, событие, функция, переменные, вывод, ошибка)"""
+    executor = result.executor
+    steps = [executor.get_step(index) for index in range(len(executor.steps))]
+    executor.steps.close()
+    # Адреса функций в их строковом представлении у запусков разные
+    return [(step.line_number, step.event_type, step.function_name,
+             re.sub(r' at 0x[0-9a-f]+', '', repr(step.variables)),
+             step.output, step.error)
+            for step in steps]
+
+
+class ExecutionBackendsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backends = {name: create_backend(name) for name in BACKENDS}
+
+    def test_same_steps(self):
+        for program, code in PROGRAMS.items():
+            expected = steps_of(self.backends['inprocess'].run(code, INPUTS, trace=True))
+            self.assertTrue(expected)
+            for name, backend in self.backends.items():
+                with self.subTest(program=program, backend=name):
+                    self.assertEqual(steps_of(backend.run(code, INPUTS, trace=True)), expected)
+
+    def test_same_results(self):
+        jobs = [
+            (PROGRAMS['loop_with_output'], [], "0 0\n1 1\n2 3\n3 6"),
+            (PROGRAMS['input'], INPUTS, "5"),
+            (PROGRAMS['input'], ['2', '2'], "5"),
+            (PROGRAMS['exception'], [], None),
+            ("print(", [], None),
+        ]
+        expected = self.backends['inprocess'].run_many(jobs, ExecutionLimits())
+        self.assertEqual([result.passed for result in expected], [True, True, False, None, None])
+        for name, backend in self.backends.items():
+            with self.subTest(backend=name):
+                results = backend.run_many(jobs, ExecutionLimits())
+                self.assertEqual([(result.output, result.error, result.passed, result.mismatch)
+                                  for result in results],
+                                 [(result.output, result.error, result.passed, result.mismatch)
+                                  for result in expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""Потоковое сравнение вывода дает тот же ответ, что и сравнение actual.strip() == expected"""
+import random
+import unittest
+
+from src.testing.output_comparator import OutputComparator, OutputMismatch
+
+
+# Символы, из которых собираются случайные выводы: пробельные - чаще
+ALPHABET = 'ab1 \n\n  \t'
+
+
+def compare(expected: str, chunks, margin: int = 1000) -> OutputComparator:
+    """Запись вывода по частям, как ее делает print()"""
+    comparator = OutputComparator(expected.strip(), margin)
+    try:
+        for chunk in chunks:
+            comparator.write(chunk)
+        comparator.finish()
+    except OutputMismatch:
+        pass
+    return comparator
+
+
+def split(text: str, rng: random.Random):
+    """Случайное разбиение текста на части (включая пустые)"""
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 4)))
+    bounds = [0] + cuts + [len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+class OutputComparatorTest(unittest.TestCase):
+
+    def test_matches_strip_equality(self):
+        rng = random.Random(2024)
+        for _ in range(5000):
+            expected = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 8)))
+            if rng.random() < 0.5:
+                # Почти совпадающий вывод: отличается только пробельными символами по краям
+                actual = rng.choice(['', ' ', '\n', '\n\n ']) + expected.strip() + rng.choice(['', '\n', ' \n'])
+            else:
+                actual = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 8)))
+            chunks = split(actual, rng)
+            with self.subTest(expected=expected, chunks=chunks):
+                comparator = compare(expected, chunks)
+                self.assertEqual(comparator.mismatch is None, actual.strip() == expected.strip())
+
+    def test_print_calls(self):
+        comparator = compare("1 2\n3", ["1", " ", "2", "\n", "3", "\n"])
+        self.assertIsNone(comparator.mismatch)
+        self.assertEqual(comparator.getvalue(), "1 2\n3")
+
+    def test_mismatch_aborts_write(self):
+        comparator = OutputComparator("1\n2\n3")
+        comparator.write("1\n")
+        with self.assertRaises(OutputMismatch):
+            comparator.write("5\n")
+        self.assertEqual(comparator.mismatch, "Строка 2: ожидалось '2', получено '5'")
+        # Программа, перехватившая исключение, дальше печатать не может
+        with self.assertRaises(OutputMismatch):
+            comparator.write("3\n")
+        self.assertFalse(comparator.finish())
+
+    def test_missing_and_extra_lines(self):
+        self.assertEqual(compare("1\n2", ["1\n"]).mismatch, "Строка 2: ожидалось '2', получено ''")
+        self.assertEqual(compare("1", ["1\n", "2\n"]).mismatch,
+                         "Строка 2: ожидалось '' (лишний вывод), получено '2'")
+
+    def test_output_cap(self):
+        # Пустые строки не расходятся с ожидаемым выводом - их останавливает лимит
+        comparator = OutputComparator("x", margin=10)
+        comparator.write("x")
+        with self.assertRaises(OutputMismatch):
+            for _ in range(100):
+                comparator.write("\n")
+        self.assertTrue(comparator.mismatch.startswith("Вывод длиннее ожидаемого (больше 11 символов)"))
+        # Накопленный вывод ограничен лимитом, а не всем напечатанным
+        self.assertLessEqual(len(comparator.getvalue()), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import pickle
+import unittest
+from multiprocessing import shared_memory
+
+from src.executor.code_executor import ExecutionStep, StackFrame
+from src.executor.trace_store import TraceStore, SpillLog
+
+
+# Каждые KEYFRAME шагов хранилище сохраняет полное состояние
+KEYFRAME = 4
+
+
+def make_steps(count: int = 23):
+    """
+    Шаги программы, похожие на записанные исполнителем
+
+    Неизменившиеся значения передаются теми же объектами, что и на
+    предыдущем шаге, переменная 'tmp' появляется и исчезает, а часть
+    шагов выполняется внутри функции.
+    """
+    steps = []
+    variables = {'items': [0]}
+    for index in range(count):
+        variables = dict(variables)
+        variables['i'] = index
+        if index % 3 == 0:
+            variables['items'] = variables['items'] + [index]
+        if index == 5:
+            variables['tmp'] = 'временная'
+        if index == 11:
+            del variables['tmp']
+        frames = None
+        if 7 <= index <= 9:
+            frames = {1: StackFrame('inner', {'x': index * 10})}
+        steps.append(ExecutionStep(
+            step_number=index,
+            line_number=index % 5 + 1,
+            code_line=f"line {index % 5 + 1}",
+            variables=variables,
+            event_type='call' if index == 7 else 'line',
+            function_name='inner' if frames else None,
+            error="ValueError: ошибка" if index == count - 1 else None,
+            output=f"out {index}" if index % 4 == 1 else "",
+            frames=frames,
+            event_index=index * 2,
+        ))
+    return steps
+
+
+def fill(store: TraceStore, steps) -> TraceStore:
+    for step in steps:
+        store.append(step)
+    return store
+
+
+class TraceStoreTest(unittest.TestCase):
+    """Восстановление шагов из дельт и ключевых кадров"""
+
+    def setUp(self):
+        self.steps = make_steps()
+        self.store = fill(TraceStore(keyframe_interval=KEYFRAME,
+                                     code_lines=[f"line {n}" for n in range(1, 6)]), self.steps)
+
+    def assertSameStep(self, restored, original):
+        self.assertEqual(restored.step_number, original.step_number)
+        self.assertEqual(restored.line_number, original.line_number)
+        self.assertEqual(restored.code_line, original.code_line)
+        self.assertEqual(restored.variables, original.variables)
+        self.assertEqual(restored.event_type, original.event_type)
+        self.assertEqual(restored.function_name, original.function_name)
+        self.assertEqual(restored.error, original.error)
+        self.assertEqual(restored.output, original.output)
+        self.assertEqual(restored.frames, original.frames)
+        self.assertEqual(restored.event_index, original.event_index)
+
+    def assertSameTrace(self, store):
+        self.assertEqual(len(store), len(self.steps))
+        # Порядок обращения важен: кэш состояния продолжает от последнего шага
+        orders = (range(len(self.steps)), reversed(range(len(self.steps))), [3, 17, 4, 22, 0, 11, 10, 12])
+        for order in orders:
+            for index in order:
+                with self.subTest(step=index):
+                    self.assertSameStep(store[index], self.steps[index])
+
+    def test_round_trip(self):
+        self.assertSameTrace(self.store)
+        self.assertEqual(self.store[-1].step_number, len(self.steps) - 1)
+        self.assertEqual(self.store.get_output_until(5), "out 1\nout 5")
+        self.assertTrue(self.store.has_errors())
+
+    def test_keyframes_hold_full_state(self):
+        for index in range(0, len(self.steps), KEYFRAME):
+            with self.subTest(step=index):
+                self.assertEqual(self.store.get_record(index).variables, self.steps[index].variables)
+
+    def test_deltas_hold_only_changes(self):
+        # Между ключевыми кадрами меняется только 'i' (и 'items' на каждом третьем шаге)
+        self.assertEqual(self.store.get_record(2).variables, {'i': 2})
+        self.assertEqual(set(self.store.get_record(3).variables), {'i', 'items'})
+        self.assertEqual(self.store.get_record(5).variables, {'i': 5, 'tmp': 'временная'})
+        self.assertNotIn('tmp', self.store[11].variables)
+        self.assertIn('tmp', self.store[10].variables)
+
+    def test_pickle_round_trip(self):
+        self.assertSameTrace(pickle.loads(pickle.dumps(self.store)))
+
+
+class SpillLogTraceStoreTest(TraceStoreTest):
+    """Те же проверки для записей на диске с маленьким горячим окном"""
+
+    def setUp(self):
+        self.steps = make_steps()
+        self.store = fill(TraceStore(keyframe_interval=KEYFRAME, records=SpillLog(hot_window=2),
+                                     code_lines=[f"line {n}" for n in range(1, 6)]), self.steps)
+        self.addCleanup(self.store.close)
+
+
+class SharedTraceStoreTest(TraceStoreTest):
+    """Те же проверки для хранилища, переданного через разделяемую память"""
+
+    def setUp(self):
+        super().setUp()
+        for records in (None, SpillLog(hot_window=2)):
+            source = fill(TraceStore(keyframe_interval=KEYFRAME, records=records,
+                                     code_lines=[f"line {n}" for n in range(1, 6)]), self.steps)
+            self.addCleanup(source.close)
+        # Записи на диске передаются как есть, записи в памяти - сериализуются
+        self.store = self.share(self.store)
+        self.spilled = self.share(source)
+
+    def share(self, store: TraceStore) -> TraceStore:
+        chunks, layout = store.shared_layout()
+        block = shared_memory.SharedMemory(create=True, size=max(1, layout['size']))
+        position = 0
+        for chunk in chunks:
+            data = memoryview(chunk).cast('B')
+            block.buf[position:position + len(data)] = data
+            position += len(data)
+            data.release()
+        shared = TraceStore.from_shared(block, layout, ExecutionStep)
+        self.addCleanup(shared.close)
+        return shared
+
+    def test_spilled_round_trip(self):
+        self.assertSameTrace(self.spilled)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Бэкенды трассировки sys.monitoring и settrace записывают одинаковые шаги"""
+import re
+import sys
+import unittest
+
+from src.executor.code_executor import CodeExecutor
+
+
+# Программы, на которых бэкенды расходились: циклы в одну строку и включения
+PROGRAMS = {
+    'while_one_line': "i = 0\nwhile i < 5: i += 1\nprint(i)\n",
+    'for_one_line': "s = 0\nfor k in range(4): s += k\n",
+    'list_comprehension': "a = 1\nl = [i * i for i in range(3)]\nb = 2\n",
+    'comprehension_in_function': (
+        "def f(n):\n"
+        "    l = [i * i for i in range(n)]\n"
+        "    return l\n"
+        "x = f(3)\n"
+        "y = {k: k for k in 'ab'}\n"
+    ),
+    'nested_loops': (
+        "total = 0\n"
+        "for i in range(3):\n"
+        "    j = 0\n"
+        "    while j < i: j += 1\n"
+        "    total += j\n"
+    ),
+    'exception': "try:\n    1 / 0\nexcept ZeroDivisionError:\n    x = 1\n",
+}
+
+
+def trace(code: str, backend: str):
+    """Шаги выполнения: (строка, событие, переменные, вывод)"""
+    executor = CodeExecutor()
+    executor.tracing_backend = backend
+    executor.trace_cache = None
+    executor.execute_step_by_step(code)
+    steps = [executor.get_step(index) for index in range(len(executor.steps))]
+    executor.steps.close()
+    # Адреса функций в их строковом представлении у запусков разные
+    return [(step.line_number, step.event_type, re.sub(r' at 0x[0-9a-f]+', '', repr(step.variables)),
+             step.output, step.error)
+            for step in steps]
+
+
+@unittest.skipUnless(hasattr(sys, 'monitoring'), "sys.monitoring появился в Python 3.12")
+class TracingBackendsTest(unittest.TestCase):
+
+    def test_same_steps(self):
+        for name, code in PROGRAMS.items():
+            with self.subTest(program=name):
+                self.assertEqual(trace(code, 'monitoring'), trace(code, 'settrace'))
+
+    def test_single_line_loop_hits_step_limit(self):
+        for backend in ('monitoring', 'settrace'):
+            with self.subTest(backend=backend):
+                executor = CodeExecutor()
+                executor.tracing_backend = backend
+                executor.trace_cache = None
+                executor.max_steps = 100
+                executor.execute_step_by_step("i = 0\nwhile True: i += 1\n")
+                last = executor.get_step(len(executor.steps) - 1)
+                self.assertEqual(last.event_type, 'exception')
+                self.assertIn("максимальное количество шагов", last.error)
+                executor.steps.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
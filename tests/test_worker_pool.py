@@ -0,0 +1,56 @@
+"""Ограничения процессов тестов пула: время по часам, память и процессорное время"""
+import sys
+import time
+import unittest
+
+from src.executor.backends import ExecutionLimits, create_backend
+
+
+# Лимит операций, который тесты ограничений не достигают
+NO_OPERATION_LIMIT = 10 ** 12
+
+ENDLESS_LOOP = "while True:\n    pass\n"
+# Долгий вызов встроенной функции: обработчики сигналов в нем не выполняются
+ENDLESS_BUILTIN = "x = sum(range(10 ** 12))\n"
+HUGE_LIST = "x = [0] * 10 ** 9\nprint(len(x))\n"
+SUM_PROGRAM = ("a = int(input())\nb = int(input())\nprint(a + b)\n", ['2', '3'], "5")
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "ограничения ядра проверяются в Linux")
+class WorkerPoolLimitsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = create_backend('pool', max_workers=4)
+
+    def run_jobs(self, jobs, **limits):
+        limits.setdefault('max_operations', NO_OPERATION_LIMIT)
+        start = time.monotonic()
+        results = self.backend.run_many(jobs, ExecutionLimits(**limits))
+        return results, time.monotonic() - start
+
+    def test_time_limit(self):
+        (looping, correct), elapsed = self.run_jobs([(ENDLESS_LOOP, [], "1"), SUM_PROGRAM], time_limit=0.5)
+        self.assertEqual(looping.error, "Превышено время выполнения (0.5 с)")
+        self.assertFalse(looping.passed)
+        # Зависший тест не задерживает остальные
+        self.assertTrue(correct.passed)
+        self.assertLess(elapsed, 5)
+
+    def test_memory_limit(self):
+        (huge, correct), _ = self.run_jobs([(HUGE_LIST, [], None), SUM_PROGRAM],
+                                           memory_limit=512 * 1024 * 1024)
+        self.assertEqual(huge.error, "MemoryError")
+        self.assertEqual(huge.output, "")
+        self.assertTrue(correct.passed)
+
+    def test_cpu_time_limit(self):
+        (looping, builtin), elapsed = self.run_jobs(
+            [(ENDLESS_LOOP, [], None), (ENDLESS_BUILTIN, [], None)], time_limit=30, cpu_time=1)
+        # Цикл прерывается исключением по мягкому пределу, встроенная функция - жестким
+        self.assertEqual(looping.error, "Превышено процессорное время теста (1 с)")
+        self.assertEqual(builtin.error, "Превышено процессорное время теста (1 с)")
+        self.assertLess(elapsed, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()